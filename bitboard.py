@@ -0,0 +1,114 @@
+"""
+Bitboard helpers for the 32 playable (dark) squares of a checkers board.
+
+A board position (col, row) is playable when col + row is even. Playable positions are numbered 0..31 row by row,
+i.e. square = row * 4 + col // 2, and a bitboard is an int in which bit `square` is set when that square is part of
+the set. Black moves towards the higher rows and red towards the lower rows.
+"""
+from __future__ import annotations
+
+FULL = 0xFFFFFFFF
+
+EVEN_ROWS = 0x0F0F0F0F  # rows 0, 2, 4, 6 (squares on columns 0, 2, 4, 6)
+ODD_ROWS = 0xF0F0F0F0  # rows 1, 3, 5, 7 (squares on columns 1, 3, 5, 7)
+LEFT_EDGE = 0x01010101  # squares on column 0
+RIGHT_EDGE = 0x80808080  # squares on column 7
+
+BOTTOM_ROW = 0x0000000F  # row 0, where red stones are promoted
+TOP_ROW = 0xF0000000  # row 7, where black stones are promoted
+
+POSITIONS: tuple[tuple[int, int], ...] = tuple(
+    (2 * (square % 4) + (square // 4) % 2, square // 4) for square in range(32)
+)
+
+# SQUARES[col][row] is the square of the position, or None for the light (unplayable) positions
+SQUARES: list[list[int | None]] = [
+    [(row * 4 + col // 2) if (col + row) % 2 == 0 else None for row in range(8)] for col in range(8)
+]
+
+
+def square_of(pos: tuple[int, int]) -> int | None:
+    """
+    Returns the square of the given (col, row) position, or None if the position is a light square.
+
+    Raises an IndexError if the position lies outside the 8-by-8 board.
+    """
+    col, row = pos
+    if not ((0 <= col < 8) and (0 <= row < 8)):
+        raise IndexError(f"The position {pos} is not on the board.")
+    return SQUARES[col][row]
+
+
+def squares_of(bb: int):
+    """
+    Yields the squares set in the given bitboard, lowest first.
+    """
+    while bb:
+        low = bb & -bb
+        yield low.bit_length() - 1
+        bb ^= low
+
+
+def up_right(bb: int) -> int:
+    """Shifts every stone of the bitboard one step towards (col + 1, row + 1)."""
+    return (((bb & EVEN_ROWS) << 4) | ((bb & ODD_ROWS & ~RIGHT_EDGE) << 5)) & FULL
+
+
+def up_left(bb: int) -> int:
+    """Shifts every stone of the bitboard one step towards (col - 1, row + 1)."""
+    return (((bb & EVEN_ROWS & ~LEFT_EDGE) << 3) | ((bb & ODD_ROWS) << 4)) & FULL
+
+
+def down_right(bb: int) -> int:
+    """Shifts every stone of the bitboard one step towards (col + 1, row - 1)."""
+    return ((bb & EVEN_ROWS) >> 4) | ((bb & ODD_ROWS & ~RIGHT_EDGE) >> 3)
+
+
+def down_left(bb: int) -> int:
+    """Shifts every stone of the bitboard one step towards (col - 1, row - 1)."""
+    return ((bb & EVEN_ROWS & ~LEFT_EDGE) >> 5) | ((bb & ODD_ROWS) >> 4)
+
+
+# The directions a man of each colour moves in. Kings move in the directions of both colours.
+FORWARD = {
+    'B': (up_right, up_left),
+    'R': (down_right, down_left),
+}
+BACKWARD = {
+    'B': FORWARD['R'],
+    'R': FORWARD['B'],
+}
+
+OPPOSITE = {
+    up_right: down_left,
+    up_left: down_right,
+    down_right: up_left,
+    down_left: up_right,
+}
+
+
+# The row on which the men of each colour are promoted
+PROMOTION_ROW = {
+    'B': TOP_ROW,
+    'R': BOTTOM_ROW,
+}
+
+# Every byte with its bits in reverse order
+_REVERSED_BYTES = bytes(int(f'{byte:08b}'[::-1], 2) for byte in range(256))
+
+
+def mirror(bb: int) -> int:
+    """
+    Rotates the bitboard by 180 degrees: the stone on square s moves to square 31 - s.
+
+    Rotating the board and swapping the colours of the stones (and the side to move) gives an equivalent position,
+    since black and red move in opposite directions and are promoted on opposite rows.
+    """
+    return int.from_bytes(bb.to_bytes(4, 'little').translate(_REVERSED_BYTES), 'big')
+
+
+def mirror_squares(squares) -> tuple[int, ...]:
+    """
+    Returns the squares of a path on the board rotated by 180 degrees.
+    """
+    return tuple(31 - square for square in squares)
@@ -0,0 +1,164 @@
+"""
+An opening book: engine answers to the common opening positions, computed offline.
+
+The builder walks every position reachable from the start within a number of plies and searches each of them to a
+fixed depth. It writes the answers to a file of fixed-size records sorted by the Zobrist key of the position
+(GameBoard.canonical_key(), which is the same in every process and shared by a position and its mirror, so that only
+one of the two is searched and stored), after an 8-byte header. The reader memory-maps the file and binary-searches
+it, so a lookup costs a few page reads and the book is shared by the page cache rather than loaded into the heap of
+every server process.
+
+Every record holds the key, the score and depth of the search and the path of the best move as squares, in the
+orientation of the position the key belongs to:
+
+    python book.py -o opening_book.bin --plies 6 --depth 12
+"""
+from __future__ import annotations
+
+import argparse
+import mmap
+import struct
+import time
+
+import bitboard
+import engine
+from structure import GameBoard, Move, opponent
+
+MAGIC = b'CKBOOK02'
+
+# The longest path a record can hold; longer moves are left out of the book
+MAX_PATH = 10
+
+RECORD = struct.Struct(f'<QiBB{MAX_PATH}s')
+
+DEFAULT_PLIES = 6
+DEFAULT_DEPTH = 10
+
+
+def positions(plies: int):
+    """
+    Yields the (gameboard, side to move) of every distinct position reachable from the start within the given number
+    of plies, the start included. Of a position and its mirror, only the first one reached is yielded.
+    """
+    frontier = [(GameBoard.start(), 'B')]
+    seen = {frontier[0][0].canonical_key('B')[0]}
+
+    for ply in range(plies + 1):
+        yield from frontier
+        if ply == plies:
+            break
+
+        following = []
+        for board, color in frontier:
+            for move in board.legal_moves(color):
+                child = board.copy_and_make_move(move)
+                key = child.canonical_key(opponent(color))[0]
+                if key not in seen:
+                    seen.add(key)
+                    following.append((child, opponent(color)))
+        frontier = following
+
+
+def build(path: str, plies: int = DEFAULT_PLIES, depth: int = DEFAULT_DEPTH, verbose: bool = False) -> int:
+    """
+    Searches every position within plies of the start to the given depth and writes the book to path. Returns the
+    number of records written.
+    """
+    searcher = engine.Engine(max_depth=depth)
+    records = []
+    start = time.perf_counter()
+
+    for board, color in positions(plies):
+        result = searcher.search(board, color)
+        if result.best_move is None or len(result.best_move.squares) > MAX_PATH:
+            continue
+        key, mirrored = board.canonical_key(color)
+        squares = result.best_move.squares
+        squares = bytes(bitboard.mirror_squares(squares) if mirrored else squares)
+        records.append((key, result.score, result.depth, len(squares), squares))
+
+        if verbose and len(records) % 100 == 0:
+            print(f"{len(records)} positions, {time.perf_counter() - start:.1f} s")
+
+    records.sort()
+    with open(path, 'wb') as file:
+        file.write(MAGIC)
+        for record in records:
+            file.write(RECORD.pack(*record))
+
+    return len(records)
+
+
+class OpeningBook:
+    """
+    A read-only, memory-mapped opening book written by build().
+    """
+    path: str
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._map[:len(MAGIC)] != MAGIC or (len(self._map) - len(MAGIC)) % RECORD.size:
+            self._map.close()
+            raise ValueError(f"{path} is not an opening book.")
+        self._count = (len(self._map) - len(MAGIC)) // RECORD.size
+
+    def __len__(self) -> int:
+        return self._count
+
+    def close(self):
+        self._map.close()
+
+    def lookup(self, key: int) -> tuple[int, int, list[int]] | None:
+        """
+        Returns the (score, depth, squares of the best move) recorded for the canonical position key, or None if the
+        position is not in the book.
+        """
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            record_key = struct.unpack_from('<Q', self._map, len(MAGIC) + middle * RECORD.size)[0]
+            if record_key < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        if low == self._count:
+            return None
+        record_key, score, depth, length, squares = RECORD.unpack_from(self._map, len(MAGIC) + low * RECORD.size)
+        if record_key != key:
+            return None
+        return score, depth, list(squares[:length])
+
+    def probe(self, board: GameBoard, color: str) -> engine.SearchResult | None:
+        """
+        Returns the book answer for the side to move as a search result without nodes, or None if neither the position
+        nor its mirror is in the book (or its recorded move is not legal there, which only a key collision can cause).
+        """
+        start = time.perf_counter()
+        key, mirrored = board.canonical_key(color)
+        entry = self.lookup(key)
+        if entry is None:
+            return None
+
+        score, depth, squares = entry
+        squares = bitboard.mirror_squares(squares) if mirrored else tuple(squares)
+        move: Move | None = next((m for m in board.legal_moves(color) if m.squares == squares), None)
+        if move is None:
+            return None
+        return engine.SearchResult(move, [move], score, depth, 0, time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Builds an opening book from the start position.")
+    parser.add_argument('-o', '--output', default='opening_book.bin', help="the file to write the book to")
+    parser.add_argument('-p', '--plies', type=int, default=DEFAULT_PLIES,
+                        help="how many plies from the start the book covers")
+    parser.add_argument('-d', '--depth', type=int, default=DEFAULT_DEPTH, help="the search depth of every position")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    count = build(args.output, args.plies, args.depth, verbose=True)
+    print(f"Wrote {count} positions to {args.output} in {time.perf_counter() - started:.1f} s")
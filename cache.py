@@ -0,0 +1,120 @@
+"""
+A response cache for the work the API repeats across games.
+
+Many games reach the same positions, so legal-move lists and finished searches are cached under the packed position
+(GameBoard.to_bytes(), which holds the bitboards, the kings and the side to move but no stone ids). Entries are kept
+in a bounded in-process LRU and expire after a time to live. The cache can also be backed by an SQLite file, which
+lets several server processes share what any of them computed; entries found there are copied into the in-process
+LRU. Values have to be JSON-serializable for that reason.
+"""
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 10_000
+DEFAULT_TTL = 60 * 60
+
+
+class ResponseCache:
+    """
+    Maps byte keys to JSON-serializable values, keeping at most max_entries of them in memory, each for ttl seconds.
+    When a path is given, every entry is also written to the SQLite database at that path.
+    """
+    max_entries: int
+    ttl: float
+    path: str | None
+    hits: int
+    misses: int
+    disk_hits: int
+    evictions: int
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL, path: str | None = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+
+        self._entries: OrderedDict[bytes, tuple[float, object]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('CREATE TABLE IF NOT EXISTS responses (key BLOB PRIMARY KEY, value TEXT, expires REAL)')
+            self._db.commit()
+
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key: bytes):
+        """
+        Returns the value cached for the key, or None if there is none or it has expired.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute('SELECT value, expires FROM responses WHERE key = ?', (key,)).fetchone()
+                if row is not None and row[1] > now:
+                    value = json.loads(row[0])
+                    self._remember(key, row[1], value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return value
+
+            self.misses += 1
+            return None
+
+    def put(self, key: bytes, value):
+        expires = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, expires, value)
+            if self._db is not None:
+                self._db.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?)', (key, json.dumps(value), expires))
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute('DELETE FROM responses')
+                self._db.commit()
+            self.hits = 0
+            self.misses = 0
+            self.disk_hits = 0
+            self.evictions = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'diskHits': self.disk_hits,
+                'evictions': self.evictions,
+                'hitRate': self.hits / lookups if lookups else 0.0,
+            }
+
+    def _remember(self, key: bytes, expires: float, value):
+        self._entries[key] = (expires, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
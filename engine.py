@@ -0,0 +1,398 @@
+"""
+An alpha-beta search over positions.
+
+The search is a negamax alpha-beta with iterative deepening over a transposition table. Moves are ordered with the
+principal variation of the previous iteration first, then the transposition table's best move, then the longest
+captures, then the killer moves of the ply and finally by the history heuristic. A position and its mirror share their
+transposition table entry (see Position.canonical_key()). Optionally, the quiet positions at the horizon are gathered
+per frontier node and scored in one batch by the evaluation module. Every search runs under a
+wall-clock and/or node budget, and can be stopped from another thread; once it has to stop, it reports the result of
+the deepest iteration it completed.
+
+The search runs on an identity-free Position (see the structure module) copied from the board it is given; the moves
+of its results get the stone ids of that board back before they are reported.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable
+
+from evaluation import evaluate, evaluate_batch
+from instrumentation import SearchProfile
+from structure import Position, Move, opponent
+from tablebase import Tablebase, WIN as TB_WIN, LOSS as TB_LOSS
+from transposition import TranspositionTable, DEFAULT_MAX_BYTES, EXACT, LOWER, UPPER, NO_MOVE, mirror_move
+
+WIN = 1_000_000
+# Any score beyond this is a forced win or loss
+WIN_THRESHOLD = WIN - 1000
+
+MAX_DEPTH = 64
+
+# How many nodes are searched between two checks of the clock
+CHECK_INTERVAL = 1024
+
+
+def _score_to_tt(score: int, ply: int) -> int:
+    # Forced wins and losses are stored as distances from the position itself rather than from the root
+    if score >= WIN_THRESHOLD:
+        return score + ply
+    if score <= -WIN_THRESHOLD:
+        return score - ply
+    return score
+
+
+def _score_from_tt(score: int, ply: int) -> int:
+    if score >= WIN_THRESHOLD:
+        return score - ply
+    if score <= -WIN_THRESHOLD:
+        return score + ply
+    return score
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside the search when its budget is exhausted.
+    """
+
+
+class SearchResult:
+    """
+    The outcome of a search: the best move found at the deepest completed depth, its principal variation and score
+    (from the point of view of the side to move), together with the number of nodes searched and the time it took.
+    """
+    best_move: Move | None
+    pv: list[Move]
+    score: int
+    depth: int
+    nodes: int
+    elapsed: float
+
+    def __init__(self, best_move: Move | None, pv: list[Move], score: int, depth: int, nodes: int, elapsed: float):
+        self.best_move = best_move
+        self.pv = pv
+        self.score = score
+        self.depth = depth
+        self.nodes = nodes
+        self.elapsed = elapsed
+
+    @property
+    def nps(self) -> int:
+        return int(self.nodes / self.elapsed) if self.elapsed > 0 else 0
+
+    def to_dict(self) -> dict:
+        return {
+            'move': self.best_move.to_list() if self.best_move is not None else None,
+            'pv': [move.to_list() for move in self.pv],
+            'score': self.score,
+            'depth': self.depth,
+            'nodes': self.nodes,
+            'time': self.elapsed,
+            'nps': self.nps,
+        }
+
+
+class Engine:
+    """
+    Searches for the best move of a side under a budget. Any of max_depth, time_limit (in seconds) and max_nodes can
+    be used to bound the search.
+
+    The transposition table is kept between searches. Either pass a table to share, or the memory cap in bytes of the
+    table that the engine creates for itself.
+
+    Setting the stop event, from any thread, ends the search as if its budget had run out. A checkpoint function is
+    called with the nodes searched so far every CHECK_INTERVAL nodes, which lets a scheduler (see the jobs module)
+    count them or pause the search while other searches use the CPU.
+
+    With an endgame tablebase, the positions it covers are scored from it instead of being searched.
+
+    With batch_leaves, every frontier node scores all of its quiet replies in one evaluate_batch() call before
+    searching them. This pays off with wide nodes; with the usual branching factor and good move ordering, most of
+    those evaluations are cut off anyway, so it is off by default.
+
+    With a profile, the search counts and times its work into it (see the instrumentation module).
+    """
+    max_depth: int
+    time_limit: float | None
+    max_nodes: int | None
+    tt: TranspositionTable
+    stop: threading.Event | None
+    tablebase: Tablebase | None
+    batch_leaves: bool
+    profile: SearchProfile | None
+    checkpoint: Callable[[int], None] | None
+    iterations: list[SearchResult]
+
+    def __init__(self, max_depth: int = MAX_DEPTH, time_limit: float | None = None, max_nodes: int | None = None,
+                 tt: TranspositionTable | None = None, tt_bytes: int = DEFAULT_MAX_BYTES,
+                 stop: threading.Event | None = None, tablebase: Tablebase | None = None,
+                 batch_leaves: bool = False, profile: SearchProfile | None = None,
+                 checkpoint: Callable[[int], None] | None = None):
+        self.max_depth = max_depth
+        self.time_limit = time_limit
+        self.max_nodes = max_nodes
+        self.tt = tt if tt is not None else TranspositionTable(tt_bytes)
+        self.stop = stop
+        self.tablebase = tablebase
+        self.batch_leaves = batch_leaves
+        self.profile = profile
+        self.checkpoint = checkpoint
+
+        self.nodes = 0
+        self.iterations = []
+        self._deadline = None
+        self._next_check = CHECK_INTERVAL
+        self._killers = []
+        self._history = {}
+        self._pv = []
+        self._evaluate = evaluate
+
+    def search(self, board: Position, color: str, moves: list[Move] | None = None,
+               pv: list[Move] | None = None,
+               on_iteration: Callable[[SearchResult], None] | None = None) -> SearchResult:
+        """
+        Searches the position with the given side to move. The board is not modified.
+
+        The search can be restricted to some of the legal moves of the position by passing them as moves. A principal
+        variation expected from an earlier search (e.g. the rest of the previous PV once the predicted reply was
+        played) can be passed as pv, to be searched first. The result of every completed iteration is kept in
+        `iterations`, and passed to on_iteration as soon as the iteration completes.
+        """
+        # The search works on its own copy so that running out of budget can abandon it halfway through a line, and
+        # on a position without stone ids, which only the reported moves get back
+        original, board = board, board.position()
+
+        profile = self.profile
+        if profile is not None:
+            board = profile.instrument(board)
+            self._evaluate = profile.timed('evaluate', evaluate)
+            tt_probes, tt_hits = self.tt.probes, self.tt.hits
+        else:
+            self._evaluate = evaluate
+
+        start = time.perf_counter()
+        self.nodes = 0
+        self.iterations = []
+        self._deadline = start + self.time_limit if self.time_limit is not None else None
+        self._next_check = 0
+        self._killers = [[None, None] for _ in range(MAX_DEPTH + 1)]
+        self._history = {}
+        self._pv = [[] for _ in range(MAX_DEPTH + 2)]
+
+        root_moves = board.legal_moves(color) if moves is None else list(moves)
+        if not root_moves:
+            return SearchResult(None, [], -WIN, 0, 0, time.perf_counter() - start)
+
+        first = original.move_of(root_moves[0])
+        result = SearchResult(first, [first], 0, 0, 0, 0.0)
+        pv = list(pv) if pv else []
+
+        for depth in range(1, self.max_depth + 1):
+            try:
+                score = self._search_root(board, color, root_moves, depth, pv)
+            except SearchTimeout:
+                break
+
+            pv = list(self._pv[0])
+            line = self._identified(original, pv)
+            result = SearchResult(line[0], line, score, depth, self.nodes, time.perf_counter() - start)
+            self.iterations.append(result)
+            if on_iteration is not None:
+                on_iteration(result)
+
+            # Nothing left to find once the game is decided or there is a single reply
+            if abs(score) >= WIN_THRESHOLD or (moves is None and len(root_moves) == 1):
+                break
+
+        result.nodes = self.nodes
+        result.elapsed = time.perf_counter() - start
+
+        if profile is not None:
+            profile.searches += 1
+            profile.nodes += self.nodes
+            profile.tt_probes += self.tt.probes - tt_probes
+            profile.tt_hits += self.tt.hits - tt_hits
+            profile.times['search'] += result.elapsed
+        return result
+
+    @staticmethod
+    def _identified(board: Position, pv: list[Move]) -> list[Move]:
+        # The moves of the line with the ids of the stones they move on the board the search was given
+        board = board.copy()
+        line = []
+        for move in pv:
+            move = board.move_of(move)
+            board.make_move(move)
+            line.append(move)
+        return line
+
+    def _check_budget(self):
+        if self.checkpoint is not None:
+            self.checkpoint(self.nodes)
+        if self.stop is not None and self.stop.is_set():
+            raise SearchTimeout()
+        if self._deadline is not None and time.perf_counter() >= self._deadline:
+            raise SearchTimeout()
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            raise SearchTimeout()
+
+        self._next_check = self.nodes + CHECK_INTERVAL
+        if self.max_nodes is not None:
+            self._next_check = min(self._next_check, self.max_nodes)
+
+    def _search_root(self, board: Position, color: str, moves: list[Move], depth: int, pv: list[Move]) -> int:
+        alpha, beta = -WIN - 1, WIN + 1
+        other = opponent(color)
+
+        pv_move = pv[0] if pv else None
+
+        for move in self._order(moves, 0, pv_move, None):
+            on_pv = pv_move is not None and move.key == pv_move.key
+            undo = board.make_move(move)
+            score = -self._negamax(board, other, depth - 1, -beta, -alpha, 1, pv[1:] if on_pv else [])
+            board.unmake_move(undo)
+
+            if score > alpha:
+                alpha = score
+                self._pv[0] = [move] + self._pv[1]
+
+        return alpha
+
+    def _negamax(self, board: Position, color: str, depth: int, alpha: int, beta: int, ply: int,
+                 pv: list[Move]) -> int:
+        self.nodes += 1
+        if self.nodes >= self._next_check:
+            self._check_budget()
+
+        self._pv[ply] = []
+
+        key, mirrored = board.canonical_key(color)
+        entry = self.tt.probe(key)
+        tt_move_squares = NO_MOVE
+        if entry is not None:
+            tt_depth, tt_score, bound, tt_move_squares = entry
+            if mirrored:
+                tt_move_squares = mirror_move(tt_move_squares)
+            # Cutting off on the principal variation would cut it short, so only the other nodes trust the table
+            if tt_depth >= depth and not pv:
+                tt_score = _score_from_tt(tt_score, ply)
+                if bound == EXACT or (bound == LOWER and tt_score >= beta) or (bound == UPPER and tt_score <= alpha):
+                    return tt_score
+
+        if self.tablebase is not None and (board.black | board.red).bit_count() <= self.tablebase.max_pieces:
+            entry = self.tablebase.probe(board, color)
+            if entry is not None:
+                value, distance = entry
+                if value == TB_WIN:
+                    return WIN - ply - distance
+                if value == TB_LOSS:
+                    return -WIN + ply + distance
+                return 0
+
+        moves = board.legal_moves(color)
+        if not moves:
+            # A side that can not move has lost
+            return -WIN + ply
+
+        # Captures are searched past the horizon, so that positions are only evaluated once they are quiet
+        if (depth <= 0 and not moves[0].jumper) or ply >= MAX_DEPTH:
+            return self._evaluate(board, color)
+
+        other = opponent(color)
+        pv_move = pv[0] if pv else None
+        tt_move = None
+        if tt_move_squares != NO_MOVE:
+            tt_move = next((move for move in moves if move.key & 0x3FF == tt_move_squares), None)
+        leaves = self._evaluate_leaves(board, moves, other) if depth == 1 and self.batch_leaves else {}
+
+        best = None
+
+        ordered = self._order(moves, ply, pv_move, tt_move)
+        for move in ordered:
+            if move in leaves:
+                self.nodes += 1
+                if self.nodes >= self._next_check:
+                    self._check_budget()
+                self._pv[ply + 1] = []
+                score = leaves[move]
+            else:
+                undo = board.make_move(move)
+                on_pv = pv_move is not None and move.key == pv_move.key
+                score = -self._negamax(board, other, depth - 1, -beta, -alpha, ply + 1, pv[1:] if on_pv else [])
+                board.unmake_move(undo)
+
+            if score > alpha:
+                alpha = score
+                best = move
+                self._pv[ply] = [move] + self._pv[ply + 1]
+
+                if alpha >= beta:
+                    if self.profile is not None:
+                        self.profile.cutoff(ordered.index(move))
+                    if not move.jumper:
+                        self._store_killer(move, ply)
+                        # The history of a quiet move is kept per origin and final square, the low 10 bits of its key
+                        history_key = move.key & 0x3FF
+                        self._history[history_key] = self._history.get(history_key, 0) + depth * depth
+                    break
+
+        if best is None:
+            bound = UPPER
+        elif alpha >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        best_squares = NO_MOVE if best is None else best.key & 0x3FF
+        self.tt.store(key, max(depth, 0), _score_to_tt(alpha, ply), bound,
+                      mirror_move(best_squares) if mirrored else best_squares)
+
+        return alpha
+
+    def _evaluate_leaves(self, board: Position, moves: list[Move], other: str) -> dict[Move, int]:
+        """
+        Scores, in one batch, the moves after which the opponent is left in a quiet position at the horizon: one with
+        no capture to extend the search with, at least one move to make and no tablebase entry. The scores are from
+        the point of view of the side making the moves. The other moves are left to the search.
+        """
+        tablebase = self.tablebase
+        positions = []
+        quiet = []
+        for move in moves:
+            undo = board.make_move(move)
+            if not board.jumpers(other) and board.steppers(other) and not (
+                    tablebase is not None and (board.black | board.red).bit_count() <= tablebase.max_pieces):
+                positions.append((board.black, board.red, board.king_mask))
+                quiet.append(move)
+            board.unmake_move(undo)
+
+        scores = evaluate_batch(positions, [other] * len(positions))
+        return {move: -score for move, score in zip(quiet, scores)}
+
+    def _store_killer(self, move: Move, ply: int):
+        killers = self._killers[ply]
+        if killers[0] is None or killers[0].key != move.key:
+            killers[1] = killers[0]
+            killers[0] = move
+
+    def _order(self, moves: list[Move], ply: int, pv_move: Move | None, tt_move: Move | None) -> list[Move]:
+        killers = self._killers[ply]
+        history = self._history
+
+        def priority(move: Move):
+            if pv_move is not None and move.key == pv_move.key:
+                return 4, 0
+            if move is tt_move:
+                return 3, 0
+            if move.jumper:
+                return 2, len(move.squares)
+            if any(killer is not None and killer.key == move.key for killer in killers):
+                return 1, 0
+            return 0, history.get(move.key & 0x3FF, 0)
+
+        return sorted(moves, key=priority, reverse=True)
+
+
+def search(board: Position, color: str, max_depth: int = MAX_DEPTH, time_limit: float | None = None,
+           max_nodes: int | None = None, stop: threading.Event | None = None) -> SearchResult:
+    return Engine(max_depth, time_limit, max_nodes, stop=stop).search(board, color)
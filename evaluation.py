@@ -0,0 +1,214 @@
+"""
+Static evaluation of positions, one at a time or in batches.
+
+The evaluation is a sum of weighted terms, all from the point of view of black: the material (men and kings), how far
+the men have advanced, the men still guarding their own back row, and the mobility of each side (the number of steps
+its stones can make). The score is then turned around for the side to move.
+
+evaluate() scores a single position with bitboard arithmetic. evaluate_batch() scores many positions at once: their
+bitboards are stacked into an N x 32 array of square codes (see board_array()) and every term is computed for all of
+them in one vectorized NumPy pass. NumPy is optional; without it, or for batches too small to pay for the conversion,
+evaluate_batch() falls back to evaluating the positions one by one. Both give the same scores.
+
+    python evaluation.py -n 20000
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+import bitboard
+import geometry
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAN_VALUE = 100
+KING_VALUE = 160
+# Per man and per row it has advanced
+ADVANCE_VALUE = 1
+# Per man on its own back row, where it keeps the opponent's men from being promoted
+BACK_RANK_VALUE = 4
+# Per step a side's stones can make
+MOBILITY_VALUE = 2
+
+# Batches smaller than this are evaluated one position at a time, which is faster than building the arrays
+MIN_BATCH = 32
+
+# The square codes of board_array()
+EMPTY, BLACK_MAN, BLACK_KING, RED_MAN, RED_KING = range(5)
+
+_ROWS = tuple(0xF << (4 * row) for row in range(8))
+
+
+def _mobility(men: int, kings: int, empty: int, forward, backward) -> int:
+    steps = 0
+    for shift in forward:
+        steps += (shift(men | kings) & empty).bit_count()
+    for shift in backward:
+        steps += (shift(kings) & empty).bit_count()
+    return steps
+
+
+def evaluate_bitboards(black: int, red: int, king_mask: int) -> int:
+    """
+    Returns the evaluation of the position given by its bitboards, from the point of view of black.
+    """
+    black_men = black & ~king_mask
+    red_men = red & ~king_mask
+    black_kings = black & king_mask
+    red_kings = red & king_mask
+    empty = ~(black | red) & bitboard.FULL
+
+    score = MAN_VALUE * (black_men.bit_count() - red_men.bit_count()) + \
+        KING_VALUE * (black_kings.bit_count() - red_kings.bit_count())
+
+    for row in range(1, 7):
+        score += ADVANCE_VALUE * (row * (black_men & _ROWS[row]).bit_count() -
+                                  (7 - row) * (red_men & _ROWS[row]).bit_count())
+
+    score += BACK_RANK_VALUE * ((black_men & bitboard.BOTTOM_ROW).bit_count() -
+                                (red_men & bitboard.TOP_ROW).bit_count())
+
+    score += MOBILITY_VALUE * (_mobility(black_men, black_kings, empty, bitboard.FORWARD['B'], bitboard.BACKWARD['B']) -
+                               _mobility(red_men, red_kings, empty, bitboard.FORWARD['R'], bitboard.BACKWARD['R']))
+
+    return score
+
+
+def evaluate(board, color: str) -> int:
+    """
+    Returns the static evaluation of the board (anything with black, red and king_mask bitboards, e.g. a GameBoard)
+    from the point of view of the given side.
+    """
+    score = evaluate_bitboards(board.black, board.red, board.king_mask)
+    return score if color == 'B' else -score
+
+
+if np is not None:
+    _SQUARE_BITS = np.arange(32, dtype=np.int64)
+    _ROW_OF = _SQUARE_BITS // 4
+    # The square a step in each direction leads to from every square, or 32 (a square that is never empty) off the
+    # board
+    _NEIGHBOURS = tuple(np.where(np.array(neighbours) == -1, 32, neighbours) for neighbours in geometry.NEIGHBOURS)
+
+    # The weights of every term per square, for black and red men
+    _ADVANCE = {
+        BLACK_MAN: ADVANCE_VALUE * np.where(_ROW_OF < 7, _ROW_OF, 0),
+        RED_MAN: ADVANCE_VALUE * np.where(_ROW_OF > 0, 7 - _ROW_OF, 0),
+    }
+    _BACK_RANK = {
+        BLACK_MAN: BACK_RANK_VALUE * (_ROW_OF == 0),
+        RED_MAN: BACK_RANK_VALUE * (_ROW_OF == 7),
+    }
+
+
+def board_array(black, red, king_mask):
+    """
+    Stacks the bitboards of N positions (sequences or arrays of N ints each) into an N x 32 array of square codes:
+    EMPTY, BLACK_MAN, BLACK_KING, RED_MAN or RED_KING.
+    """
+    black_bits = (np.asarray(black, dtype=np.int64)[:, None] >> _SQUARE_BITS) & 1
+    red_bits = (np.asarray(red, dtype=np.int64)[:, None] >> _SQUARE_BITS) & 1
+    king_bits = (np.asarray(king_mask, dtype=np.int64)[:, None] >> _SQUARE_BITS) & 1
+    return (black_bits * (BLACK_MAN + king_bits) + red_bits * (RED_MAN + king_bits)).astype(np.int8)
+
+
+def evaluate_array(squares):
+    """
+    Evaluates every position of an N x 32 array of square codes in one pass. Returns the N scores from the point of
+    view of black.
+    """
+    black_men = squares == BLACK_MAN
+    red_men = squares == RED_MAN
+    black_kings = squares == BLACK_KING
+    red_kings = squares == RED_KING
+
+    score = MAN_VALUE * (black_men.sum(axis=1) - red_men.sum(axis=1)) + \
+        KING_VALUE * (black_kings.sum(axis=1) - red_kings.sum(axis=1))
+    score += black_men @ (_ADVANCE[BLACK_MAN] + _BACK_RANK[BLACK_MAN])
+    score -= red_men @ (_ADVANCE[RED_MAN] + _BACK_RANK[RED_MAN])
+
+    # A 33rd column that is never empty stands for the squares off the board
+    empty = np.zeros((squares.shape[0], 33), dtype=bool)
+    empty[:, :32] = squares == EMPTY
+
+    black_stones = black_men | black_kings
+    red_stones = red_men | red_kings
+    for direction in geometry.DIRECTIONS['B']:
+        score += MOBILITY_VALUE * (black_stones & empty[:, _NEIGHBOURS[direction]]).sum(axis=1)
+        score -= MOBILITY_VALUE * (red_kings & empty[:, _NEIGHBOURS[direction]]).sum(axis=1)
+    for direction in geometry.DIRECTIONS['R']:
+        score += MOBILITY_VALUE * (black_kings & empty[:, _NEIGHBOURS[direction]]).sum(axis=1)
+        score -= MOBILITY_VALUE * (red_stones & empty[:, _NEIGHBOURS[direction]]).sum(axis=1)
+
+    return score
+
+
+def evaluate_batch(positions: list[tuple[int, int, int]], colors: list[str]) -> list[int]:
+    """
+    Returns the evaluations of the positions, given as (black, red, king_mask) bitboards, each from the point of view
+    of its side to move in colors.
+    """
+    if np is None or len(positions) < MIN_BATCH:
+        return [score if color == 'B' else -score
+                for score, color in zip((evaluate_bitboards(*position) for position in positions), colors)]
+
+    black, red, king_mask = zip(*positions)
+    scores = evaluate_array(board_array(black, red, king_mask))
+    signs = np.array([1 if color == 'B' else -1 for color in colors])
+    return (scores * signs).tolist()
+
+
+def benchmark(count: int = 20000, seed: int = 0) -> dict:
+    """
+    Times the evaluation of count positions reached by random play, one by one and in a single batch. Returns the
+    positions per second of both.
+    """
+    import random
+
+    from structure import GameBoard, opponent
+
+    rng = random.Random(seed)
+    positions = []
+    colors = []
+    while len(positions) < count:
+        board, color = GameBoard.start(), 'B'
+        for _ in range(rng.randrange(60)):
+            moves = board.legal_moves(color)
+            if not moves:
+                break
+            board.make_move(rng.choice(moves))
+            color = opponent(color)
+        positions.append((board.black, board.red, board.king_mask))
+        colors.append(color)
+
+    start = time.perf_counter()
+    single = [evaluate_bitboards(*position) if color == 'B' else -evaluate_bitboards(*position)
+              for position, color in zip(positions, colors)]
+    single_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = evaluate_batch(positions, colors)
+    batch_time = time.perf_counter() - start
+
+    assert single == batched
+    return {
+        'positions': count,
+        'single': int(count / single_time),
+        'batched': int(count / batch_time),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compares the per-position and batched evaluation throughput.")
+    parser.add_argument('-n', '--positions', type=int, default=20000, help="the number of positions to evaluate")
+    args = parser.parse_args()
+
+    if np is None:
+        print("NumPy is not installed, batches are evaluated one position at a time.")
+    result = benchmark(args.positions)
+    print(f"{result['positions']} positions: {result['single']} per second one by one, "
+          f"{result['batched']} per second batched ({result['batched'] / result['single']:.1f}x)")
@@ -0,0 +1,64 @@
+"""
+Static geometry of the 32 playable squares, built once at import.
+
+For every square and each of the four diagonal directions, the tables hold the neighbouring square, the square a
+jump in that direction lands on and the square it jumps over (-1 where the board ends). On top of those, the steps
+and jumps of every kind of stone are listed per square: 'B' and 'R' for the men of each colour, which only move
+forward, and 'K' for kings, which move in all four directions. Move generation and capture resolution look squares up
+in these tables instead of working out (col, row) arithmetic for every candidate step.
+"""
+from __future__ import annotations
+
+import bitboard
+
+UP_RIGHT, UP_LEFT, DOWN_RIGHT, DOWN_LEFT = range(4)
+
+_SHIFTS = (bitboard.up_right, bitboard.up_left, bitboard.down_right, bitboard.down_left)
+
+# The directions the stones of each kind move in: men forward only (black up the board, red down), kings both ways
+DIRECTIONS = {
+    'B': (UP_RIGHT, UP_LEFT),
+    'R': (DOWN_RIGHT, DOWN_LEFT),
+    'K': (UP_RIGHT, UP_LEFT, DOWN_RIGHT, DOWN_LEFT),
+}
+
+
+def _square_of_bit(bb: int) -> int:
+    return bb.bit_length() - 1 if bb else -1
+
+
+# NEIGHBOURS[direction][square] is the square next to the square in the direction, or -1 off the board
+NEIGHBOURS: tuple[tuple[int, ...], ...] = tuple(
+    tuple(_square_of_bit(shift(1 << square)) for square in range(32)) for shift in _SHIFTS
+)
+
+# LANDINGS[direction][square] is the square a jump from the square in the direction lands on, or -1 off the board;
+# the jumped-over square is then NEIGHBOURS[direction][square]
+LANDINGS: tuple[tuple[int, ...], ...] = tuple(
+    tuple(_square_of_bit(shift(shift(1 << square))) for square in range(32)) for shift in _SHIFTS
+)
+
+# STEPS[kind][square] are the squares a stone of the kind can step to from the square, and JUMPS[kind][square] the
+# (jumped-over square, landing square) pairs it can jump along
+STEPS: dict[str, tuple[tuple[int, ...], ...]] = {
+    kind: tuple(
+        tuple(NEIGHBOURS[direction][square] for direction in directions if NEIGHBOURS[direction][square] != -1)
+        for square in range(32)
+    )
+    for kind, directions in DIRECTIONS.items()
+}
+JUMPS: dict[str, tuple[tuple[tuple[int, int], ...], ...]] = {
+    kind: tuple(
+        tuple((NEIGHBOURS[direction][square], LANDINGS[direction][square])
+              for direction in directions if LANDINGS[direction][square] != -1)
+        for square in range(32)
+    )
+    for kind, directions in DIRECTIONS.items()
+}
+
+# JUMPED[orig << 5 | landing] is the square jumped over by a jump from orig to landing, or -1 if the two squares are
+# not a jump apart
+JUMPED: tuple[int, ...] = tuple(
+    next((NEIGHBOURS[direction][orig] for direction in DIRECTIONS['K'] if LANDINGS[direction][orig] == landing), -1)
+    for orig in range(32) for landing in range(32)
+)
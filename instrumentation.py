@@ -0,0 +1,196 @@
+"""
+Instrumentation of the search and of the API.
+
+A SearchProfile collects what one search did: its nodes, the calls to legal_moves() and make_move(), the
+transposition table probes and hits, the beta cutoffs by the index of the cutting move in the ordered move list, and
+the time spent per phase (move generation, making and taking back moves, evaluation and the search as a whole).
+Profiling costs nothing when it is off: an Engine without a profile searches a plain Position, and only a profiled
+search swaps its position for a ProfiledPosition and its evaluation for a timed one.
+
+Profiles are added up in a MetricsRegistry, which also counts the API requests, and renders everything in the
+Prometheus text format for the /metrics endpoint. Set ENABLED to profile every search of the API; a single request
+can also ask for the profile of its search with ?debug=1.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable
+
+from structure import Position
+
+# Whether every search of the API is profiled and added to the registry
+ENABLED = False
+
+# Cutoffs by moves at this index or later in the ordered move list are counted together
+MAX_CUTOFF_INDEX = 7
+
+PHASES = ('movegen', 'make_move', 'evaluate', 'search')
+
+
+class SearchProfile:
+    """
+    The counters and phase timings of a search, or of several searches added up.
+    """
+    searches: int
+    nodes: int
+    movegen_calls: int
+    make_move_calls: int
+    tt_probes: int
+    tt_hits: int
+    cutoffs: list[int]
+    times: dict[str, float]
+
+    def __init__(self):
+        self.searches = 0
+        self.nodes = 0
+        self.movegen_calls = 0
+        self.make_move_calls = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.cutoffs = [0] * (MAX_CUTOFF_INDEX + 1)
+        self.times = dict.fromkeys(PHASES, 0.0)
+
+    def instrument(self, board: Position) -> ProfiledPosition:
+        """
+        Turns the position (which should be a copy owned by the search) into one that reports to this profile.
+        """
+        board.__class__ = ProfiledPosition
+        board.profile = self
+        return board
+
+    def timed(self, phase: str, fn: Callable) -> Callable:
+        """
+        Wraps the function so that its calls are timed as the given phase.
+        """
+        times = self.times
+
+        def timed_fn(*args):
+            start = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                times[phase] += time.perf_counter() - start
+
+        return timed_fn
+
+    def cutoff(self, index: int):
+        self.cutoffs[min(index, MAX_CUTOFF_INDEX)] += 1
+
+    def add(self, other: SearchProfile):
+        self.searches += other.searches
+        self.nodes += other.nodes
+        self.movegen_calls += other.movegen_calls
+        self.make_move_calls += other.make_move_calls
+        self.tt_probes += other.tt_probes
+        self.tt_hits += other.tt_hits
+        for index, count in enumerate(other.cutoffs):
+            self.cutoffs[index] += count
+        for phase, seconds in other.times.items():
+            self.times[phase] += seconds
+
+    def to_dict(self) -> dict:
+        """
+        Returns the profile in the JSON format of the API's debug block.
+        """
+        cutoffs = sum(self.cutoffs)
+        return {
+            'nodes': self.nodes,
+            'movegenCalls': self.movegen_calls,
+            'makeMoveCalls': self.make_move_calls,
+            'ttProbes': self.tt_probes,
+            'ttHits': self.tt_hits,
+            'cutoffs': self.cutoffs,
+            'firstMoveCutoffRate': self.cutoffs[0] / cutoffs if cutoffs else 0.0,
+            'seconds': {phase: round(seconds, 6) for phase, seconds in self.times.items()},
+        }
+
+
+class ProfiledPosition(Position):
+    """
+    A Position that counts and times its move generation and moves into a SearchProfile.
+    """
+    profile: SearchProfile
+
+    def legal_moves(self, color: str):
+        start = time.perf_counter()
+        moves = super().legal_moves(color)
+        self.profile.movegen_calls += 1
+        self.profile.times['movegen'] += time.perf_counter() - start
+        return moves
+
+    def make_move(self, move) -> tuple:
+        start = time.perf_counter()
+        undo = super().make_move(move)
+        self.profile.make_move_calls += 1
+        self.profile.times['make_move'] += time.perf_counter() - start
+        return undo
+
+    def unmake_move(self, undo: tuple):
+        start = time.perf_counter()
+        super().unmake_move(undo)
+        self.profile.times['make_move'] += time.perf_counter() - start
+
+
+class MetricsRegistry:
+    """
+    The totals of every profiled search and the counts of the API requests of the process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._search = SearchProfile()
+        self._requests: dict[tuple[str, int], int] = {}
+
+    def add_search(self, profile: SearchProfile):
+        with self._lock:
+            self._search.add(profile)
+
+    def count_request(self, endpoint: str, status: int):
+        with self._lock:
+            key = (endpoint, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+
+    def render(self, gauges: dict[str, tuple[str, float]] | None = None) -> str:
+        """
+        Returns the metrics in the Prometheus text format, followed by the given gauges ({name: (help, value)}).
+        """
+        with self._lock:
+            search = SearchProfile()
+            search.add(self._search)
+            requests = dict(self._requests)
+
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str, samples: list[tuple[str, float]]):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{labels} {value}")
+
+        metric('checkers_requests_total', 'counter', "API requests by endpoint and status.",
+               [(f'{{endpoint="{endpoint}",status="{status}"}}', count)
+                for (endpoint, status), count in sorted(requests.items())])
+        metric('checkers_searches_total', 'counter', "Profiled searches.", [('', search.searches)])
+        metric('checkers_search_nodes_total', 'counter', "Nodes of the profiled searches.", [('', search.nodes)])
+        metric('checkers_movegen_calls_total', 'counter', "Calls to legal_moves() in profiled searches.",
+               [('', search.movegen_calls)])
+        metric('checkers_make_move_calls_total', 'counter', "Calls to make_move() in profiled searches.",
+               [('', search.make_move_calls)])
+        metric('checkers_tt_probes_total', 'counter', "Transposition table probes in profiled searches.",
+               [('', search.tt_probes)])
+        metric('checkers_tt_hits_total', 'counter', "Transposition table hits in profiled searches.",
+               [('', search.tt_hits)])
+        metric('checkers_search_cutoffs_total', 'counter',
+               "Beta cutoffs by the index of the cutting move in the ordered moves (the last index counts the rest).",
+               [(f'{{move_index="{index}"}}', count) for index, count in enumerate(search.cutoffs)])
+        metric('checkers_search_phase_seconds_total', 'counter', "Time spent per phase of the profiled searches.",
+               [(f'{{phase="{phase}"}}', round(seconds, 6)) for phase, seconds in search.times.items()])
+
+        for name, (help_text, value) in (gauges or {}).items():
+            metric(name, 'gauge', help_text, [('', value)])
+
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
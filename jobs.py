@@ -0,0 +1,335 @@
+"""
+A bounded queue of engine jobs for the web API, scheduled fairly over a shared pool of engine workers.
+
+Searches run on engine worker threads instead of the request handlers' own threads. The queue holds at most a fixed
+number of jobs waiting for a worker; past that, submitting a job fails straight away with QueueFull so that the API
+can answer 429 rather than let requests pile up. Every job has a deadline: a job still waiting when its deadline
+passes is dropped without running, and a running job is told how much time it has left. A job can be cancelled at any
+time through its stop event, which the engine checks while it searches.
+
+Every job belongs to an owner (the game it searches for) and has a priority: INTERACTIVE for the moves of live games,
+BACKGROUND for analysis. A worker goes to the waiting job of the highest priority, and among those to the one whose
+owner has had the least worker time so far, so that games share the workers evenly. Searches are time-sliced: the
+engine calls its job's checkpoint() every few thousand nodes, and a search hands its worker over when a job of a
+higher priority is waiting, or when its slice is used up and a job of the same priority is waiting, to carry on once
+its turn comes again. The checkpoints also count the nodes searched against an optional global node rate, which
+holds every search back once the rate is exceeded. stats() and scheduler_stats() report the queue depth per priority
+and how long jobs waited for a worker.
+"""
+from __future__ import annotations
+
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Hashable
+
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_PENDING = 16
+
+# The priorities of jobs, highest first
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITIES = {INTERACTIVE: 'interactive', BACKGROUND: 'background'}
+
+# How long, in seconds, a search keeps its worker while other jobs of its priority are waiting for one
+DEFAULT_TIME_SLICE = 0.05
+
+# How many of the latest waits for a worker the wait statistics are taken over, per priority
+WAIT_SAMPLES = 1000
+
+
+class QueueFull(Exception):
+    """
+    Raised when a job is submitted while every worker is busy and the queue is full.
+    """
+
+
+class DeadlineExceeded(Exception):
+    """
+    Raised when a job could not be finished before its deadline.
+    """
+
+
+class JobCancelled(Exception):
+    """
+    Raised when the result of a job that was cancelled before it ran is asked for.
+    """
+
+
+class Job:
+    """
+    A unit of engine work. The function it runs receives the job itself, to read its stop event and the time it has
+    left before its deadline, and to pass its checkpoint() to the engine.
+    """
+    stop: threading.Event
+    deadline: float
+    owner: Hashable
+    priority: int
+    submitted: float
+    started: float | None
+    finished: float | None
+    nodes: int
+    turns: int
+    waited: float
+
+    def __init__(self, fn: Callable[[Job], Any], deadline: float, owner: Hashable = None,
+                 priority: int = INTERACTIVE):
+        self.stop = threading.Event()
+        self.deadline = deadline
+        self.owner = owner if owner is not None else self
+        self.priority = priority
+        self.submitted = time.monotonic()
+        self.started = None
+        self.finished = None
+        # The nodes searched through checkpoint(), the times the job got a worker and the seconds it waited for one
+        self.nodes = 0
+        self.turns = 0
+        self.waited = 0.0
+
+        self._fn = fn
+        self._done = threading.Event()
+        self._result = None
+        self._error = None
+
+        self._queue: EngineJobQueue | None = None
+        self._turn = threading.Event()
+        self._waiting_since = self.submitted
+        self._slice_start = self.submitted
+        self._search_nodes = 0
+
+    def remaining(self) -> float:
+        """
+        The seconds left until the deadline of the job.
+        """
+        return max(0.0, self.deadline - time.monotonic())
+
+    def cancel(self):
+        self.stop.set()
+        # A job waiting for its turn is let through, to end straight away
+        if self._queue is not None:
+            self._queue._resume(self)
+
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def checkpoint(self, nodes: int):
+        """
+        Called by the engine while it searches, with the nodes of its search so far. Counts them against the node rate
+        of the queue and, when the scheduler wants the worker for another job, waits for the next turn of this job.
+        """
+        searched = nodes - self._search_nodes if nodes >= self._search_nodes else nodes
+        self._search_nodes = nodes
+        self.nodes += searched
+        if self._queue is not None:
+            self._queue._checkpoint(self, searched)
+
+    def result(self, timeout: float | None = None):
+        """
+        Waits for the job to finish and returns its result, or raises the exception it ended with. Waits until the
+        deadline of the job when no timeout is given.
+        """
+        if not self._done.wait(self.remaining() if timeout is None else timeout):
+            raise DeadlineExceeded("The job did not finish before its deadline.")
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def _run(self):
+        self.started = time.monotonic()
+        try:
+            if self.stop.is_set():
+                raise JobCancelled("The job was cancelled before it started.")
+            if self.started >= self.deadline:
+                raise DeadlineExceeded("The job waited in the queue past its deadline.")
+            self._result = self._fn(self)
+        except Exception as e:
+            self._error = e
+        finally:
+            self.finished = time.monotonic()
+            self._done.set()
+
+
+class EngineJobQueue:
+    """
+    Runs jobs on a fixed number of workers, with room for at most max_pending jobs waiting for a worker.
+
+    Every admitted job gets a thread of its own, but only `workers` of them search at any time; the others wait for
+    their turn in the order of their priority and the worker time of their owner. A search holds its worker for at
+    most time_slice seconds while jobs of the same priority are waiting. With a max_node_rate, the searches of all
+    jobs together are held to that many nodes per second.
+    """
+    workers: int
+    max_pending: int
+    time_slice: float
+    max_node_rate: int | None
+    rejected: int
+    nodes: int
+    preempted: int
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, max_pending: int = DEFAULT_MAX_PENDING,
+                 time_slice: float = DEFAULT_TIME_SLICE, max_node_rate: int | None = None):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.time_slice = time_slice
+        self.max_node_rate = max_node_rate
+
+        self._executor = ThreadPoolExecutor(max_workers=workers + max_pending, thread_name_prefix='engine')
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._lock = threading.Lock()
+        # The jobs waiting for a worker, as a heap of (priority, worker time of the owner, sequence number, job)
+        self._ready: list[tuple[int, float, int, Job]] = []
+        self._sequence = itertools.count()
+        # The worker time, in seconds, of every owner with jobs in the queue, and the number of those jobs
+        self._usage: dict[Hashable, float] = {}
+        self._owner_jobs: dict[Hashable, int] = {}
+        self._waits = {priority: deque(maxlen=WAIT_SAMPLES) for priority in PRIORITIES}
+        self._running = 0
+        # The node budget, refilled at max_node_rate up to a second's worth of nodes
+        self._tokens = float(max_node_rate or 0)
+        self._refilled = time.monotonic()
+        self.rejected = 0
+        self.nodes = 0
+        self.preempted = 0
+
+    def submit(self, fn: Callable[[Job], Any], timeout: float, owner: Hashable = None,
+               priority: int = INTERACTIVE) -> Job:
+        """
+        Queues the function to run as a job that has to finish within timeout seconds, on behalf of the owner (every
+        job is its own owner when none is given) and with the given priority.
+
+        Raises QueueFull if there is no room left for the job.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"{priority} is not a job priority.")
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise QueueFull("Every engine worker is busy and the queue is full.")
+
+        job = Job(fn, time.monotonic() + timeout, owner, priority)
+        job._queue = self
+        with self._lock:
+            owner = job.owner
+            if owner not in self._usage:
+                # A new owner starts level with the owner that has had the least worker time, rather than ahead of all
+                self._usage[owner] = min(self._usage.values(), default=0.0)
+            self._owner_jobs[owner] = self._owner_jobs.get(owner, 0) + 1
+            now = time.monotonic()
+            self._enqueue(job, now)
+            self._dispatch(now)
+        self._executor.submit(self._work, job)
+        return job
+
+    def _work(self, job: Job):
+        try:
+            self._await_turn(job)
+            job._run()
+        finally:
+            with self._lock:
+                now = time.monotonic()
+                self._release(job, now)
+                self._owner_jobs[job.owner] -= 1
+                if not self._owner_jobs[job.owner]:
+                    del self._owner_jobs[job.owner]
+                    del self._usage[job.owner]
+                self._dispatch(now)
+            self._slots.release()
+
+    def _enqueue(self, job: Job, now: float):
+        job._turn.clear()
+        job._waiting_since = now
+        heapq.heappush(self._ready, (job.priority, self._usage[job.owner], next(self._sequence), job))
+
+    def _grant(self, job: Job, now: float):
+        self._running += 1
+        waited = now - job._waiting_since
+        if not job.turns:
+            self._waits[job.priority].append(waited)
+        job.waited += waited
+        job.turns += 1
+        job._slice_start = now
+        job._turn.set()
+
+    def _dispatch(self, now: float):
+        while self._running < self.workers and self._ready:
+            self._grant(heapq.heappop(self._ready)[3], now)
+
+    def _release(self, job: Job, now: float):
+        self._running -= 1
+        self._usage[job.owner] += now - job._slice_start
+
+    def _await_turn(self, job: Job):
+        # A job whose deadline passes while it waits is let through, to find out that it is out of time
+        if not job._turn.wait(job.remaining()):
+            self._resume(job)
+
+    def _resume(self, job: Job):
+        """
+        Gives the job a worker straight away if it is waiting for one, even if every worker is taken, so that a job
+        that is out of time or cancelled can end without waiting for its turn.
+        """
+        with self._lock:
+            for index, entry in enumerate(self._ready):
+                if entry[3] is job:
+                    del self._ready[index]
+                    heapq.heapify(self._ready)
+                    self._grant(job, time.monotonic())
+                    return
+
+    def _checkpoint(self, job: Job, searched: int):
+        delay = 0.0
+        with self._lock:
+            self.nodes += searched
+            now = time.monotonic()
+            if self.max_node_rate is not None:
+                self._tokens = min(self.max_node_rate, self._tokens + (now - self._refilled) * self.max_node_rate)
+                self._tokens -= searched
+                self._refilled = now
+                if self._tokens < 0:
+                    delay = -self._tokens / self.max_node_rate
+
+            if self._ready and not job.stop.is_set():
+                waiting = self._ready[0][0]
+                if waiting < job.priority or (waiting == job.priority and now - job._slice_start >= self.time_slice):
+                    self.preempted += 1
+                    self._release(job, now)
+                    self._enqueue(job, now)
+                    self._dispatch(now)
+
+        if delay:
+            time.sleep(delay)
+        if not job._turn.is_set():
+            self._await_turn(job)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'queued': len(self._ready), 'running': self._running, 'rejected': self.rejected}
+
+    def scheduler_stats(self) -> dict:
+        """
+        Returns, for every priority, the jobs waiting for a worker and the mean, 95th percentile and longest wait, in
+        seconds, of the latest jobs for their first turn; along with the nodes searched by all jobs and the number of
+        times a search handed its worker over to another job.
+        """
+        with self._lock:
+            queued = dict.fromkeys(PRIORITIES, 0)
+            for priority, _, _, _ in self._ready:
+                queued[priority] += 1
+            waits = {priority: sorted(samples) for priority, samples in self._waits.items()}
+            stats = {'nodes': self.nodes, 'preempted': self.preempted}
+
+        for priority, name in PRIORITIES.items():
+            samples = waits[priority]
+            stats[name] = {
+                'queued': queued[priority],
+                'wait_mean': sum(samples) / len(samples) if samples else 0.0,
+                'wait_p95': samples[int(0.95 * (len(samples) - 1))] if samples else 0.0,
+                'wait_max': samples[-1] if samples else 0.0,
+            }
+        return stats
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=False)
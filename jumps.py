@@ -0,0 +1,104 @@
+"""
+Enumeration of complete jump sequences, memoized on the part of the board that can influence them.
+
+A jump sequence starting on a square can only ever touch the squares that are reachable from it through the jump
+tables, so the sequences are fully determined by the square, the kind of the jumping stone and which of those squares
+hold opponents or are empty. JumpCache keys its LRU cache on exactly that, which lets the same capture pattern be
+reused across otherwise unrelated positions.
+"""
+from __future__ import annotations
+
+import functools
+
+import bitboard
+import geometry
+
+DEFAULT_CAPACITY = 1 << 16
+
+
+def jump_sequences(square: int, jumps, promotion: int, opponents: int, empty: int) -> list[tuple[int, ...]]:
+    """
+    Returns every complete jump sequence, as a tuple of squares, that a stone standing on the given square can make.
+
+    The captured stones stay on the board until the sequence is over, so they can be neither jumped again nor landed
+    on. A man that reaches its promotion row ends its sequence there.
+    """
+    sequences = []
+    for over, landing in jumps[square]:
+        if opponents >> over & 1 and empty >> landing & 1:
+            continuations = None
+            if not promotion >> landing & 1:
+                continuations = jump_sequences(landing, jumps, promotion, opponents & ~(1 << over), empty)
+
+            if continuations:
+                sequences.extend((square,) + continuation for continuation in continuations)
+            else:
+                sequences.append((square, landing))
+
+    return sequences
+
+
+def _region(kind: str, square: int) -> int:
+    """
+    The bitboard of every square that a jump sequence of a stone of the kind starting on the square could jump over
+    or land on.
+    """
+    promotion = bitboard.PROMOTION_ROW.get(kind, 0)
+    region = 0
+    seen = {square}
+    frontier = [square]
+    while frontier:
+        current = frontier.pop()
+        for over, landing in geometry.JUMPS[kind][current]:
+            region |= (1 << over) | (1 << landing)
+            if landing not in seen and not promotion >> landing & 1:
+                seen.add(landing)
+                frontier.append(landing)
+    return region
+
+
+# REGIONS[kind][square], with the kind being 'B' or 'R' for men and 'K' for kings
+REGIONS = {kind: tuple(_region(kind, square) for square in range(32)) for kind in ('B', 'R', 'K')}
+
+
+def _sequences_of(square: int, kind: str, opponents: int, empty: int) -> tuple[tuple[int, ...], ...]:
+    promotion = bitboard.PROMOTION_ROW.get(kind, 0)
+    return tuple(jump_sequences(square, geometry.JUMPS[kind], promotion, opponents, empty))
+
+
+class JumpCache:
+    """
+    An LRU cache of the jump sequences of a stone, keyed on its square, its kind ('B' or 'R' for men, 'K' for kings)
+    and the occupancy of the squares in its region.
+    """
+    capacity: int
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._lookup = functools.lru_cache(maxsize=capacity)(_sequences_of)
+
+    def sequences(self, square: int, kind: str, opponents: int, empty: int) -> tuple[tuple[int, ...], ...]:
+        """
+        Returns the complete jump sequences of the stone on the square, given the bitboards of its opponents and of
+        the empty squares (which must include the square the stone starts from).
+        """
+        region = REGIONS[kind][square]
+        return self._lookup(square, kind, opponents & region, empty & region)
+
+    @property
+    def hits(self) -> int:
+        return self._lookup.cache_info().hits
+
+    @property
+    def misses(self) -> int:
+        return self._lookup.cache_info().misses
+
+    def __len__(self) -> int:
+        return self._lookup.cache_info().currsize
+
+    def clear(self):
+        self._lookup.cache_clear()
+
+
+# The cache shared by every GameBoard
+JUMP_CACHE = JumpCache()
@@ -0,0 +1,169 @@
+"""
+Root-splitting parallel search over a process pool.
+
+The legal moves of the root are dealt out to the workers, and every worker runs its own iterative deepening search
+restricted to its share of them. Positions travel to the workers in the 16-byte packed form of GameBoard.to_bytes()
+and results come back as plain square sequences, so no GameBoard or Move is ever pickled. The results are merged at
+the deepest depth that every worker completed.
+
+Usage:
+    python parallel.py [-d DEPTH] [-w WORKERS [WORKERS ...]] [-p POSITION]
+
+prints how the time to reach the given depth scales with the number of workers.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import engine
+from engine import Engine, SearchResult, WIN, WIN_THRESHOLD
+from structure import GameBoard, Move, Position, opponent
+from transposition import DEFAULT_MAX_BYTES
+
+# One engine per worker process, so that its transposition table carries over from one request to the next
+_worker_engine: Engine | None = None
+
+_pools: dict[int, ProcessPoolExecutor] = {}
+
+
+def get_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Returns the shared process pool with the given number of workers, starting it on first use.
+    """
+    if workers not in _pools:
+        _pools[workers] = ProcessPoolExecutor(max_workers=workers)
+    return _pools[workers]
+
+
+def shutdown_pools():
+    for pool in _pools.values():
+        pool.shutdown(cancel_futures=True)
+    _pools.clear()
+
+
+def _squares_of(move: Move) -> tuple[int, ...]:
+    return move.squares
+
+
+def _search_share(data: bytes, move_indices: list[int], max_depth: int, time_limit: float | None,
+                  max_nodes: int | None, tt_bytes: int) -> list[tuple[int, int, int, list[tuple[int, ...]]]]:
+    """
+    Runs in a worker: searches the packed position restricted to the root moves with the given indices in its
+    legal_moves() list. Returns (depth, score, nodes, pv) for every completed iteration, with the PV as squares.
+    """
+    global _worker_engine
+    if _worker_engine is None or _worker_engine.tt.max_bytes != tt_bytes:
+        _worker_engine = Engine(tt_bytes=tt_bytes)
+    _worker_engine.max_depth = max_depth
+    _worker_engine.time_limit = time_limit
+    _worker_engine.max_nodes = max_nodes
+
+    board, color = Position.from_bytes(data)
+    root_moves = board.legal_moves(color)
+    _worker_engine.search(board, color, [root_moves[i] for i in move_indices])
+
+    return [(it.depth, it.score, it.nodes, [_squares_of(move) for move in it.pv]) for it in _worker_engine.iterations]
+
+
+def _moves_of(board: GameBoard, color: str, pv: list[tuple[int, ...]]) -> list[Move]:
+    """
+    Turns a PV given as squares back into the moves of the board.
+    """
+    board = board.copy()
+    moves = []
+    for squares in pv:
+        move = next((m for m in board.legal_moves(color) if _squares_of(m) == squares), None)
+        if move is None:
+            break
+        moves.append(move)
+        board.make_move(move)
+        color = opponent(color)
+    return moves
+
+
+def parallel_search(board: GameBoard, color: str, workers: int | None = None, max_depth: int = engine.MAX_DEPTH,
+                    time_limit: float | None = None, max_nodes: int | None = None,
+                    tt_bytes: int = DEFAULT_MAX_BYTES) -> SearchResult:
+    """
+    Searches the position with the root moves split over a pool of worker processes (one per CPU by default). The
+    node budget is shared evenly between the workers; the time limit applies to each of them.
+    """
+    start = time.perf_counter()
+
+    root_moves = board.legal_moves(color)
+    if not root_moves:
+        return SearchResult(None, [], -WIN, 0, 0, time.perf_counter() - start)
+
+    workers = min(workers or os.cpu_count() or 1, len(root_moves))
+    if workers == 1:
+        return Engine(max_depth, time_limit, max_nodes, tt_bytes=tt_bytes).search(board, color)
+
+    data = board.to_bytes(color)
+    node_share = max_nodes // workers if max_nodes is not None else None
+    pool = get_pool(workers)
+    futures = [pool.submit(_search_share, data, list(range(i, len(root_moves), workers)), max_depth, time_limit,
+                           node_share, tt_bytes) for i in range(workers)]
+    shares = [future.result() for future in futures]
+    nodes = sum(iterations[-1][2] for iterations in shares if iterations)
+
+    # A share whose outcome is decided holds at any depth; every other share only up to its deepest iteration. The
+    # moves of a share that did not even complete its first iteration are left out.
+    depth = min((iterations[-1][0] if abs(iterations[-1][1]) < WIN_THRESHOLD else max_depth)
+                for iterations in shares if iterations) if any(shares) else 0
+
+    best = None
+    for iterations in shares:
+        completed = [it for it in iterations if it[0] <= depth]
+        if completed and (best is None or completed[-1][1] > best[1]):
+            best = completed[-1]
+
+    if best is None:
+        return SearchResult(root_moves[0], [root_moves[0]], 0, 0, nodes, time.perf_counter() - start)
+
+    pv = _moves_of(board, color, best[3])
+    return SearchResult(pv[0], pv, best[1], best[0], nodes, time.perf_counter() - start)
+
+
+def measure_scaling(board: GameBoard, color: str, depth: int, worker_counts: list[int]) -> list[dict]:
+    """
+    Searches the position to a fixed depth with every given number of workers. Returns, per worker count, the time
+    it took, the nodes searched, the nodes per second and the speedup over the first worker count.
+    """
+    report = []
+    for workers in worker_counts:
+        if workers > 1:
+            # Start the pool before the clock does
+            list(get_pool(workers).map(abs, range(workers)))
+
+        result = parallel_search(board, color, workers, max_depth=depth)
+        report.append({
+            'workers': workers,
+            'time': result.elapsed,
+            'nodes': result.nodes,
+            'nps': result.nps,
+            'speedup': report[0]['time'] / result.elapsed if report and result.elapsed > 0 else 1.0,
+        })
+    return report
+
+
+def main():
+    import perft
+
+    parser = argparse.ArgumentParser(description="Reports how the parallel search scales with its worker count.")
+    parser.add_argument('-d', '--depth', type=int, default=8)
+    parser.add_argument('-w', '--workers', type=int, nargs='+', default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument('-p', '--position', choices=sorted(perft.POSITIONS), default='start')
+    args = parser.parse_args()
+
+    board, color = perft.board_of(args.position)
+    for row in measure_scaling(board, color, args.depth, args.workers):
+        print(f"{row['workers']:>3} workers: {row['time']:.3f}s, {row['nodes']} nodes, {row['nps']} nodes/sec, "
+              f"speedup {row['speedup']:.2f}")
+    shutdown_pools()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""
+Perft: counts the leaf nodes of the move tree of a position to a fixed depth, to check the move generator against
+known node counts and to measure its throughput.
+
+Usage:
+    python perft.py [-d DEPTH] [-p POSITION] [--divide]
+    python perft.py --record
+
+--divide prints the count below every root move. --record runs every stored position at its baseline depth and writes
+the node counts and speeds to the baselines file that tests/perft_tests.py checks against.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+
+from structure import GameBoard, Move, START_BOARD, opponent
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tests', 'perft_baselines.json')
+
+# Stored positions, as (board, kings, side to move)
+POSITIONS = {
+    'start': (START_BOARD, set(), 'B'),
+    'midgame': (
+        [
+            [0, -1, 1, -1, -1, -1, -1, -1],
+            [-1, -1, -1, -1, -1, 12, -1, -1],
+            [-1, -1, -1, -1, -1, -1, 4, -1],
+            [-1, -1, -1, 2, -1, -1, -1, -1],
+            [-1, -1, -1, -1, -1, -1, 16, -1],
+            [-1, -1, -1, 23, -1, 20, -1, 19],
+            [18, -1, 10, -1, -1, -1, 21, -1],
+            [-1, 11, -1, -1, -1, -1, -1, 22]
+        ],
+        {4, 18},
+        'B',
+    ),
+    'endgame': (
+        [
+            [-1, -1, -1, -1, -1, -1, 12, -1],
+            [-1, -1, -1, -1, -1, 16, -1, 13],
+            [-1, -1, 0, -1, 2, -1, -1, -1],
+            [-1, -1, -1, -1, -1, 17, -1, -1],
+            [14, -1, -1, -1, -1, -1, 19, -1],
+            [-1, -1, -1, 11, -1, -1, -1, -1],
+            [-1, -1, -1, -1, -1, -1, -1, -1],
+            [-1, -1, -1, -1, -1, 5, -1, -1]
+        ],
+        {5, 14},
+        'R',
+    ),
+}
+
+# The depth every stored position is benchmarked at
+BASELINE_DEPTHS = {
+    'start': 6,
+    'midgame': 7,
+    'endgame': 7,
+}
+
+
+def board_of(name: str) -> tuple[GameBoard, str]:
+    """
+    Returns a fresh board of the stored position with the given name, along with its side to move.
+    """
+    board, kings, color = POSITIONS[name]
+    return GameBoard([col[:] for col in board], set(kings)), color
+
+
+def perft(board: GameBoard, color: str, depth: int) -> int:
+    """
+    Returns the number of leaf nodes of the move tree of the board, with the given side to move, at the given depth.
+    """
+    if depth == 0:
+        return 1
+
+    moves = board.legal_moves(color)
+    if depth == 1:
+        return len(moves)
+
+    other = opponent(color)
+    nodes = 0
+    for move in moves:
+        undo = board.make_move(move)
+        nodes += perft(board, other, depth - 1)
+        board.unmake_move(undo)
+    return nodes
+
+
+def divide(board: GameBoard, color: str, depth: int) -> list[tuple[Move, int]]:
+    """
+    Returns the perft count below every root move of the board.
+    """
+    other = opponent(color)
+    counts = []
+    for move in board.legal_moves(color):
+        undo = board.make_move(move)
+        counts.append((move, perft(board, other, depth - 1)))
+        board.unmake_move(undo)
+    return counts
+
+
+def timed_perft(board: GameBoard, color: str, depth: int) -> tuple[int, float]:
+    """
+    Returns the perft count along with the nodes per second at which the tree was walked.
+    """
+    start = time.perf_counter()
+    nodes = perft(board, color, depth)
+    elapsed = time.perf_counter() - start
+    return nodes, nodes / elapsed if elapsed > 0 else float('inf')
+
+
+def load_baselines(path: str = BASELINES_PATH) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def record_baselines(path: str = BASELINES_PATH) -> dict:
+    baselines = {}
+    for name, depth in BASELINE_DEPTHS.items():
+        board, color = board_of(name)
+        nodes, nps = timed_perft(board, color, depth)
+        baselines[name] = {'depth': depth, 'nodes': nodes, 'nps': int(nps)}
+
+    with open(path, 'w') as f:
+        json.dump(baselines, f, indent=4)
+        f.write('\n')
+    return baselines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Counts the leaf nodes of the move tree of a position.")
+    parser.add_argument('-d', '--depth', type=int, default=6)
+    parser.add_argument('-p', '--position', choices=sorted(POSITIONS), default='start')
+    parser.add_argument('--divide', action='store_true', help="print the count below every root move")
+    parser.add_argument('--record', action='store_true', help="record the baselines of every stored position")
+    args = parser.parse_args()
+
+    if args.record:
+        for name, baseline in record_baselines().items():
+            print(f"{name}: depth {baseline['depth']}, {baseline['nodes']} nodes, {baseline['nps']} nodes/sec")
+        return
+
+    board, color = board_of(args.position)
+
+    start = time.perf_counter()
+    if args.divide:
+        nodes = 0
+        for move, count in divide(board, color, args.depth):
+            print(f"{move.to_list()}: {count}")
+            nodes += count
+    else:
+        nodes = perft(board, color, args.depth)
+    elapsed = time.perf_counter() - start
+
+    nps = int(nodes / elapsed) if elapsed > 0 else 0
+    print(f"{args.position} depth {args.depth}: {nodes} nodes in {elapsed:.3f}s ({nps} nodes/sec)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+"""
+Self-play: engine-against-engine matches for tuning.
+
+A match plays two engine configurations against each other from a set of start positions, each position twice with
+the colours swapped. Games run concurrently over a process pool; positions travel to the workers as PDN FEN and
+games come back as plain dicts. A game is drawn when a position repeats for the third time with the same side to
+move, or when it reaches the ply limit. Every finished game is appended to a PDN file and to a JSON lines file (with
+the time, nodes, depth and score of every move) as soon as it comes in, so a long match can be followed or
+interrupted without losing the games played. The match ends with the Elo difference between the configurations and
+its 95% confidence interval.
+
+An engine configuration is a dict of Engine keyword arguments, e.g. {"max_depth": 6} or {"time_limit": 0.1}:
+
+    python selfplay.py -a '{"max_depth": 6}' -b '{"max_depth": 4}' --openings 3 -w 4 -o match
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import engine
+from structure import GameBoard, Position, opponent
+
+# Games that reach this many plies are drawn
+DEFAULT_MAX_PLIES = 200
+
+# The number of times a position has to occur to draw the game
+REPETITIONS = 3
+
+# The plies from the start that the default set of start positions is taken from
+DEFAULT_OPENING_PLIES = 3
+
+# The memory cap of the transposition table of each engine of a game
+GAME_TT_BYTES = 1024 * 1024
+
+# PDN results are given from black's side, which moves first
+RESULTS = {'B': '1-0', 'R': '0-1', None: '1/2-1/2'}
+
+
+def openings(plies: int = DEFAULT_OPENING_PLIES) -> list[str]:
+    """
+    Returns the PDN FEN of every distinct position exactly the given number of plies from the start.
+    """
+    color = 'B'
+    frontier = {GameBoard.start().key(color): GameBoard.start()}
+    for _ in range(plies):
+        following = {}
+        for board in frontier.values():
+            for move in board.legal_moves(color):
+                child = board.copy_and_make_move(move)
+                following.setdefault(child.key(opponent(color)), child)
+        frontier = following
+        color = opponent(color)
+    return [board.to_fen(color) for board in frontier.values()]
+
+
+def play_game(fen: str, black: dict, red: dict, max_plies: int = DEFAULT_MAX_PLIES) -> dict:
+    """
+    Plays one game from the position between two engine configurations. Returns the game as a dict: its start
+    position, result ('B', 'R' or None for a draw), the reason it ended and its moves, each with the PDN notation, the
+    time, nodes, depth and score of its search.
+    """
+    board, color = Position.from_fen(fen)
+    engines = {
+        'B': engine.Engine(**{'tt_bytes': GAME_TT_BYTES, **black}),
+        'R': engine.Engine(**{'tt_bytes': GAME_TT_BYTES, **red}),
+    }
+
+    seen = {board.key(color): 1}
+    moves = []
+    winner = None
+    reason = 'plies'
+
+    while len(moves) < max_plies:
+        result = engines[color].search(board, color)
+        if result.best_move is None:
+            winner = opponent(color)
+            reason = 'no moves'
+            break
+
+        moves.append({
+            'move': result.best_move.to_pdn(),
+            'time': round(result.elapsed, 6),
+            'nodes': result.nodes,
+            'depth': result.depth,
+            'score': result.score,
+        })
+        board.make_move(result.best_move)
+        color = opponent(color)
+
+        key = board.key(color)
+        seen[key] = seen.get(key, 0) + 1
+        if seen[key] >= REPETITIONS:
+            reason = 'repetition'
+            break
+
+    return {'fen': fen, 'result': winner, 'reason': reason, 'moves': moves}
+
+
+def to_pdn(game: dict, number: int, names: tuple[str, str]) -> str:
+    """
+    Returns the game in PDN, with the names of the black and red engines.
+    """
+    result = RESULTS[game['result']]
+    color = game['fen'][0]
+
+    tokens = []
+    move_number = 1
+    if color == 'W' and game['moves']:
+        tokens.append('1...')
+    for move in game['moves']:
+        if color == 'B':
+            tokens.append(f"{move_number}.")
+        tokens.append(move['move'])
+        if color == 'W':
+            move_number += 1
+        color = 'W' if color == 'B' else 'B'
+    tokens.append(result)
+
+    lines = [
+        '[Event "Self-play"]',
+        f'[Round "{number}"]',
+        f'[Black "{names[0]}"]',
+        f'[White "{names[1]}"]',
+        f'[Result "{result}"]',
+        f'[FEN "{game["fen"]}"]',
+        f'[Termination "{game["reason"]}"]',
+        '',
+    ]
+    # PDN movetext lines are kept under 80 characters
+    line = ''
+    for token in tokens:
+        if len(line) + len(token) + 1 > 79:
+            lines.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    lines.append(line)
+    return '\n'.join(lines) + '\n\n'
+
+
+def elo(wins: int, draws: int, losses: int) -> tuple[float, float, float]:
+    """
+    Returns the Elo difference implied by the score of a match, with the bounds of its 95% confidence interval. The
+    bounds are infinite when the score interval reaches 0 or 1.
+    """
+    games = wins + draws + losses
+    if not games:
+        return 0.0, -math.inf, math.inf
+
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    margin = 1.96 * math.sqrt(variance / games)
+
+    def difference(p: float) -> float:
+        if p <= 0:
+            return -math.inf
+        if p >= 1:
+            return math.inf
+        return -400 * math.log10(1 / p - 1)
+
+    return difference(score), difference(score - margin), difference(score + margin)
+
+
+def run_match(config_a: dict, config_b: dict, fens: list[str], workers: int = os.cpu_count() or 1,
+              output: str | None = None, max_plies: int = DEFAULT_MAX_PLIES, verbose: bool = False) -> dict:
+    """
+    Plays every start position twice, once with each configuration as black, over a pool of worker processes. Games
+    are written to output.pdn and output.jsonl as they finish when an output prefix is given.
+
+    Returns the wins, draws and losses of configuration a and the Elo difference of a over b with its confidence
+    interval.
+    """
+    pairings = [(fen, config_a, config_b, 'a') for fen in fens] + [(fen, config_b, config_a, 'b') for fen in fens]
+    wins = draws = losses = 0
+    start = time.perf_counter()
+
+    pdn_file = open(f"{output}.pdn", 'a') if output else None
+    jsonl_file = open(f"{output}.jsonl", 'a') if output else None
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(play_game, fen, black, red, max_plies): (number, a_color)
+                       for number, (fen, black, red, a_color) in enumerate(pairings, 1)}
+
+            for future in as_completed(futures):
+                number, a_color = futures[future]
+                game = future.result()
+
+                a_side = 'B' if a_color == 'a' else 'R'
+                if game['result'] is None:
+                    draws += 1
+                elif game['result'] == a_side:
+                    wins += 1
+                else:
+                    losses += 1
+
+                if output:
+                    names = ('a', 'b') if a_side == 'B' else ('b', 'a')
+                    pdn_file.write(to_pdn(game, number, names))
+                    pdn_file.flush()
+                    jsonl_file.write(json.dumps({'game': number, 'black': names[0], 'red': names[1], **game}) + '\n')
+                    jsonl_file.flush()
+
+                if verbose:
+                    print(f"game {number}: {RESULTS[game['result']]} ({game['reason']}, {len(game['moves'])} plies)"
+                          f" +{wins} ={draws} -{losses}")
+    finally:
+        if output:
+            pdn_file.close()
+            jsonl_file.close()
+
+    difference, low, high = elo(wins, draws, losses)
+    return {
+        'wins': wins,
+        'draws': draws,
+        'losses': losses,
+        'elo': difference,
+        'elo_low': low,
+        'elo_high': high,
+        'time': time.perf_counter() - start,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plays two engine configurations against each other.")
+    parser.add_argument('-a', type=json.loads, default={'max_depth': 6}, help="the Engine arguments of engine a")
+    parser.add_argument('-b', type=json.loads, default={'max_depth': 4}, help="the Engine arguments of engine b")
+    parser.add_argument('--openings', type=int, default=DEFAULT_OPENING_PLIES,
+                        help="start from every position this many plies from the start")
+    parser.add_argument('--max-plies', type=int, default=DEFAULT_MAX_PLIES)
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('-o', '--output', help="write the games to OUTPUT.pdn and OUTPUT.jsonl")
+    args = parser.parse_args()
+
+    fens = openings(args.openings)
+    print(f"{2 * len(fens)} games from {len(fens)} start positions on {args.workers} workers")
+    report = run_match(args.a, args.b, fens, args.workers, args.output, args.max_plies, verbose=True)
+    print(f"a: +{report['wins']} ={report['draws']} -{report['losses']} in {report['time']:.1f}s, "
+          f"Elo {report['elo']:+.0f} [{report['elo_low']:+.0f}, {report['elo_high']:+.0f}]")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,286 @@
 """"""
+import os
 
+import bitboard
+import book
+import cache
+import engine
+import instrumentation
+import tablebase as endgame
+from structure import GameBoard, Move, colorOf, opponent
 
-def getPossMoves(board, stone_id, is_king) -> str:
-    return f""" ... Calculating all possible moves for stone with stone_id given the board ...
-            {board}, {stone_id}, {is_king}
+# The wall-clock budget, in seconds, of the engine's answer to a move
+SEARCH_TIME_LIMIT = 1.0
+
+# The longest, in seconds, that an analysis may run for
+ANALYSIS_TIME_LIMIT = 30.0
+
+# The cache of legal-move lists and engine answers, shared by every request of the process. Setting a file path
+# shares it between the processes of the server too.
+RESPONSE_CACHE_SIZE = 10_000
+RESPONSE_CACHE_TTL = 60 * 60
+RESPONSE_CACHE_PATH = None
+response_cache = cache.ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, RESPONSE_CACHE_PATH)
+
+# The opening book consulted before searching, when one has been built with book.py
+OPENING_BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'opening_book.bin')
+opening_book = book.OpeningBook(OPENING_BOOK_PATH) if os.path.exists(OPENING_BOOK_PATH) else None
+
+# The endgame tablebase the engine scores the positions with few stones from, when one has been built with
+# tablebase.py
+TABLEBASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'endgame.tb')
+tablebase = endgame.Tablebase(TABLEBASE_PATH) if os.path.exists(TABLEBASE_PATH) else None
+
+_MOVES_KEY = b'M'
+_SEARCH_KEY = b'S'
+
+
+def _squares_of(move: Move, mirrored: bool = False) -> list[int]:
+    # Cached positions are kept in the orientation of GameBoard.canonical_bytes(), and so are their moves
+    return list(bitboard.mirror_squares(move.squares) if mirrored else move.squares)
+
+
+def _move_at(gameboard: GameBoard, squares: list[int], mirrored: bool = False) -> Move:
+    # Cached moves are kept as squares only, since the ids of the stones differ between boards of the same position
+    if mirrored:
+        squares = bitboard.mirror_squares(squares)
+    stone_id = gameboard.stone_id_at(bitboard.POSITIONS[squares[0]])
+    promotes = not gameboard.king_mask >> squares[0] & 1 and bitboard.PROMOTION_ROW[colorOf(stone_id)] >> squares[-1] & 1
+    return Move.of_squares(stone_id, tuple(squares), promotes)
+
+
+def cachedLegalMoves(gameboard: GameBoard, color: str) -> list[Move]:
+    """
+    Returns the legal moves of the given side, from the response cache when the position (or its mirror) has been seen
+    before.
     """
+    position, mirrored = gameboard.canonical_bytes(color)
+    key = _MOVES_KEY + position
+    cached = response_cache.get(key)
+    if cached is not None:
+        return [_move_at(gameboard, squares, mirrored) for squares in cached]
 
+    moves = gameboard.legal_moves(color)
+    response_cache.put(key, [_squares_of(move, mirrored) for move in moves])
+    return moves
 
-def makeMove(board, stone_id, is_king, move) -> dict:
-    ...
-    ...
-    return {board: "1", stone_id: "2", is_king: "3", move: "4"}
+
+def _budget_of(searcher: engine.Engine) -> bytes:
+    # Searches are only shared between callers with the same budget. Time limits are taken to a tenth of a second, so
+    # that the limits of requests that waited about as long in the queue match
+    time_limit = None if searcher.time_limit is None else round(searcher.time_limit, 1)
+    return f"{searcher.max_depth}:{time_limit}:{searcher.max_nodes}:".encode()
+
+
+def cachedSearch(gameboard: GameBoard, color: str, searcher: engine.Engine, pv=None) -> engine.SearchResult:
+    """
+    Searches the position with the given side to move, unless the response cache holds the result of an earlier search
+    of the same position or of its mirror under the same budget, in which case that one is returned. Searches cut short
+    by the stop event are not cached.
+    """
+    position, mirrored = gameboard.canonical_bytes(color)
+    key = _SEARCH_KEY + _budget_of(searcher) + position
+    cached = response_cache.get(key)
+    if cached is not None:
+        board = gameboard.copy()
+        line = []
+        for squares in cached['pv']:
+            move = _move_at(board, squares, mirrored)
+            board.make_move(move)
+            line.append(move)
+        return engine.SearchResult(line[0] if line else None, line, cached['score'], cached['depth'],
+                                   cached['nodes'], 0.0)
+
+    result = searcher.search(gameboard, color, pv=pv)
+    if result.depth > 0 and not (searcher.stop is not None and searcher.stop.is_set()):
+        response_cache.put(key, {'pv': [_squares_of(move, mirrored) for move in result.pv], 'score': result.score,
+                                 'depth': result.depth, 'nodes': result.nodes})
+    return result
+
+
+def kingsOf(stone_id, is_king, kings=None) -> set:
+    """
+    Returns the ids of the kings of a request that names one stone: the given kings, if any, and the stone itself when
+    it is a king.
+    """
+    kings = set(kings or [])
+    if is_king:
+        kings.add(stone_id)
+    return kings
+
+
+def getPossMoves(board, stone_id, is_king, kings=None) -> dict:
+    """
+    Returns the legal moves of the stone with stone_id, as paths of [col, row] pairs. Capturing is mandatory, so the
+    stone has no moves if another stone of its colour can jump and it can not. The ids of the other kings on the board
+    can be given as kings.
+    """
+    gameboard = GameBoard(board, kingsOf(stone_id, is_king, kings))
+
+    moves = [move.to_list() for move in cachedLegalMoves(gameboard, colorOf(stone_id)) if move.stone_id == stone_id]
+
+    return {'moves': moves}
+
+
+def getPossMovesBatch(games):
+    """
+    Yields the legal moves of every game of the batch, in order, as soon as they are computed. Each game is a dict with
+    the 'board', the ids of its 'kings' and the side to move as 'turn' ('B' or 'R'). Each result holds the 'index' of
+    its game and either its 'moves' (as {'stone': id, 'path': [[col, row], ...]}) or an 'error'.
+
+    Games that share the same position are only computed once.
+    """
+    computed = {}
+
+    for index, game in enumerate(games):
+        try:
+            board = game['board']
+            kings = game.get('kings') or []
+            turn = game['turn']
+            if turn not in ('B', 'R'):
+                raise ValueError(f"{turn} is not a side to move, expected 'B' or 'R'.")
+
+            key = (tuple(tuple(col) for col in board), frozenset(kings), turn)
+            moves = computed.get(key)
+            if moves is None:
+                gameboard = GameBoard(board, set(kings))
+                moves = [{'stone': move.stone_id, 'path': move.to_list()} for move in cachedLegalMoves(gameboard, turn)]
+                computed[key] = moves
+        except (KeyError, TypeError, ValueError, IndexError) as e:
+            yield {'index': index, 'error': f"{type(e).__name__}: {e}"}
+            continue
+
+        yield {'index': index, 'moves': moves}
+
+
+def legalMoves(gameboard: GameBoard, color: str, stone_id: int = None) -> dict:
+    """
+    Returns the legal moves of the side to move (or only of the stone with stone_id), each with the id of its stone,
+    its path of [col, row] pairs and its PDN notation.
+    """
+    moves = [{'stone': move.stone_id, 'path': move.to_list(), 'pdn': move.to_pdn()}
+             for move in cachedLegalMoves(gameboard, color) if stone_id is None or move.stone_id == stone_id]
+
+    return {'moves': moves}
+
+
+def newProfile(debug: bool = False) -> instrumentation.SearchProfile | None:
+    """
+    Returns a profile for a search when instrumentation is enabled or the request asks for it, and None otherwise.
+    """
+    return instrumentation.SearchProfile() if instrumentation.ENABLED or debug else None
+
+
+def playMove(gameboard: GameBoard, color: str, path, stone_id: int = None, time_limit: float = None,
+             stop=None, searcher: engine.Engine = None, pv=None,
+             profile: instrumentation.SearchProfile = None, checkpoint=None) -> engine.SearchResult:
+    """
+    Plays the move of the given side with the given path of (col, row) positions on the board, then lets the engine
+    answer it for the other side, searching for at most time_limit seconds (SEARCH_TIME_LIMIT by default) or until
+    the stop event is set. The board is updated in place; the engine's search result is returned (its move is None
+    when the other side has no move left).
+
+    Positions in the opening book are answered from it without searching. A long-lived searcher (with its
+    transposition table) and the PV expected for the reply can be passed to carry the work of earlier searches over.
+    The search is counted into the profile, if one is given, and into the metrics registry. The checkpoint of the
+    engine job that runs the search, if any, is passed on to the engine.
+
+    Raises a ValueError if the move is not legal.
+    """
+    path = [tuple(pos) for pos in path]
+    played = next((m for m in cachedLegalMoves(gameboard, color)
+                   if m.path == path and (stone_id is None or m.stone_id == stone_id)), None)
+    if played is None:
+        raise ValueError(f"{[list(pos) for pos in path]} is not a legal move.")
+    gameboard.make_move(played)
+
+    result = opening_book.probe(gameboard, opponent(color)) if opening_book is not None else None
+    if result is None:
+        # The searcher (with its transposition table) is only set up when the book has no answer
+        if searcher is None:
+            searcher = engine.Engine()
+        searcher.time_limit = SEARCH_TIME_LIMIT if time_limit is None else time_limit
+        searcher.stop = stop
+        searcher.profile = profile
+        searcher.checkpoint = checkpoint
+        if searcher.tablebase is None:
+            searcher.tablebase = tablebase
+        result = cachedSearch(gameboard, opponent(color), searcher, pv)
+        if profile is not None:
+            instrumentation.REGISTRY.add_search(profile)
+    if result.best_move is not None:
+        gameboard.make_move(result.best_move)
+
+    return result
+
+
+def analyzePosition(gameboard: GameBoard, color: str, on_iteration, time_limit: float = ANALYSIS_TIME_LIMIT,
+                    max_depth: int = engine.MAX_DEPTH, stop=None, checkpoint=None) -> engine.SearchResult:
+    """
+    Searches the position for the side to move until time_limit seconds have passed, max_depth is reached or the
+    stop event is set, passing the search result of every completed depth to on_iteration as it comes. Returns the
+    final result. The checkpoint of the engine job that runs the search, if any, is passed on to the engine.
+    """
+    profile = newProfile()
+    searcher = engine.Engine(max_depth=max_depth, time_limit=time_limit, stop=stop, tablebase=tablebase,
+                             profile=profile, checkpoint=checkpoint)
+    result = searcher.search(gameboard, color, on_iteration=on_iteration)
+    if profile is not None:
+        instrumentation.REGISTRY.add_search(profile)
+    return result
+
+
+def makeMove(board, stone_id, is_king, move, kings=None) -> dict:
+    """
+    Plays the given move (a path of [col, row] pairs) of the stone with stone_id, then lets the engine answer it for
+    the other side. Returns the board after both moves, the kings on it and the engine's move with its search details
+    (the move is None when the other side has no move left). The ids of the other kings on the board can be given as
+    kings.
+
+    Raises a ValueError if the move is not legal.
+    """
+    gameboard = GameBoard(board, kingsOf(stone_id, is_king, kings))
+
+    result = playMove(gameboard, colorOf(stone_id), move, stone_id)
+
+    return gameState(gameboard, result)
+
+
+def endgameState(gameboard: GameBoard, color: str) -> dict:
+    """
+    Returns the outcome of the position for the side to move ('win', 'loss' or 'draw') according to the tablebase,
+    with its distance to the end of the game in plies and the move that keeps it.
+
+    Raises a LookupError if there is no tablebase or it does not cover the position.
+    """
+    entry = tablebase.probe(gameboard, color) if tablebase is not None else None
+    if entry is None:
+        raise LookupError("The position is not in the endgame tablebase.")
+
+    value, distance = entry
+    move = tablebase.best_move(gameboard, color)
+    return {
+        'result': endgame.RESULTS[value],
+        'distance': distance,
+        'move': move.to_list() if move is not None else None,
+        'pdn': move.to_pdn() if move is not None else None,
+    }
+
+
+def gameState(gameboard: GameBoard, result: engine.SearchResult = None) -> dict:
+    """
+    Returns the board, the kings on it and the engine's search result (if any) in the JSON format of the API.
+    """
+    updated_board = gameboard.to_list()
+    on_board = {stone for col in updated_board for stone in col}
+
+    state = {
+        'board': updated_board,
+        'kings': sorted(stone for stone in gameboard.kings if stone in on_board),
+    }
+    if result is not None:
+        state['search'] = result.to_dict()
+    return state
 
 
 def get_neighbour_moves(stone_id: int, lop):
@@ -0,0 +1,122 @@
+"""
+Server-side game sessions.
+
+A session keeps a live game in memory: its GameBoard (kings and hash included), the side the client plays, and an
+Engine whose transposition table and last principal variation carry over from one move to the next. Clients create
+a session once and then only send their moves. Sessions that stay idle for too long are evicted, and so is the least
+recently used session when the store is full.
+"""
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import engine
+from structure import GameBoard, Move
+
+DEFAULT_MAX_SESSIONS = 1000
+DEFAULT_IDLE_TIMEOUT = 30 * 60
+
+# The memory cap of the transposition table of every session
+SESSION_TT_BYTES = 1024 * 1024
+
+
+class GameSession:
+    """
+    A game between a client, playing the side to move, and the engine. The lock serializes the moves of the game.
+    """
+    id: str
+    board: GameBoard
+    color: str
+    engine: engine.Engine
+    expected: list[Move]
+    moves_played: int
+    last_access: float
+    lock: threading.Lock
+
+    def __init__(self, board: GameBoard, color: str, tt_bytes: int = SESSION_TT_BYTES):
+        self.id = uuid.uuid4().hex
+        self.board = board
+        self.color = color
+        self.engine = engine.Engine(tt_bytes=tt_bytes)
+        self.expected = []
+        self.moves_played = 0
+        self.last_access = time.monotonic()
+        self.lock = threading.Lock()
+
+    def pv_after(self, path: list[tuple[int, int]]) -> list[Move]:
+        """
+        Returns what is left of the engine's last principal variation if the client plays the given path, which is
+        the expected line of the engine's reply, or an empty list if the client deviates from it.
+        """
+        if self.expected and self.expected[0].path == [tuple(pos) for pos in path]:
+            return self.expected[1:]
+        return []
+
+    def record(self, result: engine.SearchResult):
+        """
+        Keeps the part of the engine's principal variation that follows its own move, for the next search.
+        """
+        self.expected = result.pv[1:]
+        self.moves_played += 1
+
+
+class SessionStore:
+    """
+    Holds at most max_sessions sessions, each for as long as it is used at least every idle_timeout seconds.
+    """
+    max_sessions: int
+    idle_timeout: float
+
+    def __init__(self, max_sessions: int = DEFAULT_MAX_SESSIONS, idle_timeout: float = DEFAULT_IDLE_TIMEOUT):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._sessions: OrderedDict[str, GameSession] = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def create(self, board: GameBoard, color: str) -> GameSession:
+        session = GameSession(board, color)
+        with self._lock:
+            self._evict_idle()
+            while len(self._sessions) >= self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evicted += 1
+            self._sessions[session.id] = session
+        return session
+
+    def get(self, session_id: str) -> GameSession:
+        """
+        Returns the session with the given id and marks it as used.
+
+        Raises a LookupError if there is no such session, or if it has been evicted.
+        """
+        with self._lock:
+            self._evict_idle()
+            session = self._sessions.get(session_id)
+            if session is None:
+                raise LookupError(f"There is no game with id {session_id}.")
+            session.last_access = time.monotonic()
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def remove(self, session_id: str):
+        with self._lock:
+            if self._sessions.pop(session_id, None) is None:
+                raise LookupError(f"There is no game with id {session_id}.")
+
+    def _evict_idle(self):
+        # The sessions are kept in order of last use, so the idle ones are at the front
+        cutoff = time.monotonic() - self.idle_timeout
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.last_access >= cutoff:
+                break
+            self._sessions.popitem(last=False)
+            self.evicted += 1
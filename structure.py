@@ -1,11 +1,28 @@
 from __future__ import annotations
-import copy
+import struct
+
+import bitboard
+import geometry
+import jumps
+import zobrist
 
 from pprint import pprint
 
 BLACK = range(0, 12)  # exclusive for the upper value
 RED = range(12, 24)
 
+# The board at the start of a game. Black moves first.
+START_BOARD = [
+    [0, -1, 1, -1, -1, -1, 12, -1],
+    [-1, 2, -1, -1, -1, 14, -1, 13],
+    [3, -1, 4, -1, -1, -1, 15, -1],
+    [-1, 5, -1, -1, -1, 17, -1, 16],
+    [6, -1, 7, -1, -1, -1, 18, -1],
+    [-1, 8, -1, -1, -1, 20, -1, 19],
+    [9, -1, 10, -1, -1, -1, 21, -1],
+    [-1, 11, -1, -1, -1, 23, -1, 22]
+]
+
 
 def colorOf(stone_id) -> str:
     if stone_id in BLACK:
@@ -14,62 +31,138 @@ def colorOf(stone_id) -> str:
         return 'R'
 
 
-def isValidPos(pos: tuple[int, int]):
-    """
-    Returns if the given position is a valid position in a 8-by-8 Checkers board.
-    """
-    return (0 <= pos[0] < 8) and (0 <= pos[1] < 8)
+def opponent(color: str) -> str:
+    return 'R' if color == 'B' else 'B'
+
+
+# The side letters of PDN. PDN's white is red here.
+PDN_SIDES = {'B': 'B', 'R': 'W'}
+PDN_COLORS = {'B': 'B', 'W': 'R'}
 
+# The packed binary position: the black, red and king bitboards followed by a flags word
+BINARY_FORMAT = struct.Struct('<IIII')
+RED_TO_MOVE_FLAG = 1
 
-def difference(pos1: tuple[int, int], pos2: tuple[int, int]):
+
+def path_from_pdn(notation: str) -> list[tuple[int, int]]:
     """
-    ...
+    Parses a move in PDN notation ("11-15" for a step, "9x18x27" for jumps) into a path of (col, row) positions. PDN
+    square n is the playable square n - 1 of the bitboard module.
     """
-    col_diff = pos2[0] - pos1[0]
-    row_diff = pos2[1] - pos1[1]
-    diff_vector = (col_diff, row_diff)
-    return diff_vector
+    try:
+        squares = [int(part) - 1 for part in notation.replace('x', '-').split('-')]
+    except ValueError:
+        raise ValueError(f"{notation} is not a move in PDN notation.") from None
+    if len(squares) < 2 or not all(0 <= square < 32 for square in squares):
+        raise ValueError(f"{notation} is not a move in PDN notation.")
+    return [bitboard.POSITIONS[square] for square in squares]
 
 
-def addition(curr_pos: tuple[int, int], displacement_vector: tuple[int, int]):
+def path_from_list(path) -> list[tuple[int, int]]:
     """
-    ...
+    Checks a move given in the JSON format of the API, a list of at least two [col, row] pairs, and returns it as a
+    path of (col, row) positions.
     """
-    final_col = curr_pos[0] + displacement_vector[0]
-    final_row = curr_pos[1] + displacement_vector[1]
-    final_pos = (final_col, final_row)
-    return final_pos
+    if not isinstance(path, list) or len(path) < 2 or not all(
+            isinstance(pos, list) and len(pos) == 2 and all(type(value) is int for value in pos) for pos in path):
+        raise ValueError(f"{path} is not a move, expected a list of [col, row] pairs.")
+    return [tuple(pos) for pos in path]
+
+
+_PROMOTES_BIT = 1 << 10
+_CAPTURED_SHIFT = 11
 
 
 class Move:
     """
-    ...
+    A move of a stone along a path of squares. Besides the stone id and the squares of its path, a move is packed
+    into a single int, its key, that is worked out once when the move is created: the origin square (bits 0-4), the
+    final square (bits 5-9), whether the move promotes its stone (bit 10) and the bitmask of the squares of the stones
+    it captures (from bit 11 on). Moves are equal when their keys are, apart from the promotion bit: that follows
+    from the stone on the origin square, which a move built from a path alone does not know.
+
+    Moves are created by the million during a search, so they are slotted, and the (col, row) path used by the API
+    is only built when it is asked for.
     """
+    __slots__ = ('stone_id', 'squares', 'key', 'jumper')
+
     stone_id: int
-    path: list[tuple[int, int]]
+    squares: tuple[int, ...]
+    key: int
     jumper: bool
 
-    def __init__(self, stone_id: int, path: list[tuple[int, int]]):
+    def __init__(self, stone_id: int, path: list[tuple[int, int]], promotes: bool = False):
+        squares = []
+        for pos in path:
+            square = bitboard.square_of(pos)
+            if square is None:
+                raise ValueError(f"The position {pos} is not a playable square.")
+            squares.append(square)
+        self._set(stone_id, tuple(squares), promotes)
+
+    @classmethod
+    def of_squares(cls, stone_id: int, squares: tuple[int, ...], promotes: bool = False) -> Move:
+        """
+        Creates the move of the stone along the given squares, skipping the conversion from (col, row) positions.
+        """
+        move = cls.__new__(cls)
+        move._set(stone_id, squares, promotes)
+        return move
+
+    def _set(self, stone_id: int, squares: tuple[int, ...], promotes: bool):
+        captured = 0
+        jumped = geometry.JUMPED
+        for orig, landing in zip(squares, squares[1:]):
+            over = jumped[orig << 5 | landing]
+            if over != -1:
+                captured |= 1 << over
+
         self.stone_id = stone_id
-        self.path = path
-        self.jumper = abs(self.path[1][0] - self.path[0][0]) >= 2
+        self.squares = squares
+        self.key = squares[0] | squares[-1] << 5 | (_PROMOTES_BIT if promotes else 0) | captured << _CAPTURED_SHIFT
+        self.jumper = captured != 0
+
+    @property
+    def captured(self) -> int:
+        """
+        The bitmask of the squares of the stones the move captures.
+        """
+        return self.key >> _CAPTURED_SHIFT
+
+    @property
+    def promotes(self) -> bool:
+        return bool(self.key & _PROMOTES_BIT)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Move) and (self.key ^ other.key) & ~_PROMOTES_BIT == 0
+
+    def __hash__(self) -> int:
+        return hash(self.key & ~_PROMOTES_BIT)
+
+    def __repr__(self) -> str:
+        return f"Move({self.stone_id}, {self.to_pdn()})"
+
+    @property
+    def path(self) -> list[tuple[int, int]]:
+        return [bitboard.POSITIONS[square] for square in self.squares]
 
     def getTargetPos(self) -> tuple[int, int]:
-        return self.path[-1]
+        return bitboard.POSITIONS[self.squares[-1]]
 
     def get_conquered_stones(self):
-        conquered_positions = set()
+        return {bitboard.POSITIONS[square] for square in bitboard.squares_of(self.captured)}
 
-        if self.jumper:
-            for i in range(0, len(self.path)-1):
-                curr_pos = self.path[i]
-                next_pos = self.path[i + 1]
-                diff = difference(curr_pos, next_pos)
-                half_diff = (diff[0] // 2, diff[1] // 2)
-                intermediate = addition(curr_pos, half_diff)
-                conquered_positions.add(intermediate)
+    def to_list(self) -> list[list[int]]:
+        """
+        Returns the path in the JSON format of the API, as a list of [col, row] pairs.
+        """
+        return [list(bitboard.POSITIONS[square]) for square in self.squares]
 
-        return conquered_positions
+    def to_pdn(self) -> str:
+        """
+        Returns the move in PDN notation, e.g. "11-15" or "9x18x27".
+        """
+        return ('x' if self.jumper else '-').join(str(square + 1) for square in self.squares)
 
     def reaches_end(self):
         return any(
@@ -79,264 +172,701 @@ class Move:
         )
 
 
+def _step_move(stone_id: int, squares: tuple[int, int], key: int) -> Move:
+    # Builds a step from the squares and key of _STEPS, the fast path of legal_moves()
+    move = _new_move(Move)
+    move.stone_id = stone_id
+    move.squares = squares
+    move.key = key
+    move.jumper = False
+    return move
+
+
+_new_move = Move.__new__
+
+
+def _step_table(kind: str) -> tuple[tuple[tuple[int, tuple[int, int], int], ...], ...]:
+    # _STEPS[kind][square] holds the (target, squares, key) of every step from the square
+    promotion = bitboard.PROMOTION_ROW.get(kind, 0)
+    return tuple(
+        tuple((target, (square, target), square | target << 5 | (_PROMOTES_BIT if promotion >> target & 1 else 0))
+              for target in geometry.STEPS[kind][square])
+        for square in range(32)
+    )
+
+
+_STEPS = {kind: _step_table(kind) for kind in ('B', 'R', 'K')}
 
 
+def _check_bitboards(black: int, red: int, king_mask: int):
+    if black & red:
+        raise ValueError("A square can not hold both a black and a red stone.")
+    if king_mask & ~(black | red):
+        raise ValueError("Every king must be a stone on the board.")
+    if black.bit_count() > len(BLACK) or red.bit_count() > len(RED) or (black | red) > bitboard.FULL:
+        raise ValueError("The position does not fit on a board of 12 black and 12 red stones.")
 
-class GameBoard:
+
+# The row on which the men of each Zobrist kind of man (zobrist.BLACK_MAN, zobrist.RED_MAN) are promoted
+_PROMOTION_ROWS = (bitboard.TOP_ROW, bitboard.BOTTOM_ROW)
+
+
+class Position:
     """
-    A class that representings the state of a checkers board.
+    A checkers position without stone identities: the bitboards (see the bitboard module) of the black stones, the
+    red stones and the kings, and the Zobrist hashes of the position and of its mirror (see mirrored()), kept up to
+    date in `hash` and `mirror_hash` as moves are made.
 
-    A board is represented by a nested list, where each list at depth 1 is a column and each element of the inner list
-     specified the particular row.
+    This is what the engine searches. Only the kind of stone on every square matters to it, so a move is made and
+    taken back with a few bitboard operations, and positions that differ only in which stone stands where are the
+    same position. Its moves have -1 for the id of their stone; GameBoard adds the stone ids that the API works with.
     """
-    board: list[list[int]]
-    kings: set[int]
+    black: int
+    red: int
+    king_mask: int
+    hash: int
+    mirror_hash: int
+
+    # A position has no stone ids, so legal_moves() finds -1 on every square
+    _ids = (-1,) * 32
+
+    def __init__(self, black: int = 0, red: int = 0, king_mask: int = 0):
+        self.black = black
+        self.red = red
+        self.king_mask = king_mask
+        self.hash = zobrist.hash_of(black, red, king_mask)
+        self.mirror_hash = zobrist.hash_of(bitboard.mirror(red), bitboard.mirror(black), bitboard.mirror(king_mask))
+
+    @classmethod
+    def from_bitboards(cls, black: int, red: int, king_mask: int) -> Position:
+        """
+        Builds a position from its bitboards.
+        """
+        _check_bitboards(black, red, king_mask)
+        return cls(black, red, king_mask)
 
-    def __init__(self, board: list[list[int]], kings: set[int] = None):
-        self.board = board
+    @classmethod
+    def from_fen(cls, fen: str) -> tuple[Position, str]:
+        """
+        Parses a position in PDN FEN notation, e.g. "B:W21,22,K30:B1,2,K5", into a board and the side to move.
+        """
+        fen = fen.strip().strip('"').rstrip('.')
+        fields = fen.split(':')
+        if len(fields) != 3 or fields[0] not in PDN_COLORS:
+            raise ValueError(f"{fen} is not a position in FEN notation.")
+
+        bitboards = {'B': 0, 'R': 0}
+        king_mask = 0
+        for field in fields[1:]:
+            if not field or field[0] not in PDN_COLORS:
+                raise ValueError(f"{fen} is not a position in FEN notation.")
+            color = PDN_COLORS[field[0]]
+            for item in filter(None, field[1:].split(',')):
+                is_king = item.startswith('K')
+                try:
+                    square = int(item[1:] if is_king else item) - 1
+                except ValueError:
+                    raise ValueError(f"{item} is not a square of a FEN position.") from None
+                if not 0 <= square < 32:
+                    raise ValueError(f"{item} is not a square of a FEN position.")
+                bitboards[color] |= 1 << square
+                if is_king:
+                    king_mask |= 1 << square
+
+        return cls.from_bitboards(bitboards['B'], bitboards['R'], king_mask), PDN_COLORS[fields[0]]
+
+    def to_fen(self, color: str) -> str:
+        """
+        Returns the position, with the given side to move, in PDN FEN notation.
+        """
+        fields = [PDN_SIDES[color]]
+        for side, bb in (('W', self.red), ('B', self.black)):
+            fields.append(side + ','.join(('K' if self.king_mask >> square & 1 else '') + str(square + 1)
+                                          for square in bitboard.squares_of(bb)))
+        return ':'.join(fields)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> tuple[Position, str]:
+        """
+        Parses a position packed by to_bytes() into a board and the side to move.
+        """
+        if len(data) != BINARY_FORMAT.size:
+            raise ValueError(f"A packed position is {BINARY_FORMAT.size} bytes long, not {len(data)}.")
+        black, red, king_mask, flags = BINARY_FORMAT.unpack(data)
+        return cls.from_bitboards(black, red, king_mask), 'R' if flags & RED_TO_MOVE_FLAG else 'B'
 
-        if kings is None:
-            self.kings = set()
-        else:
-            self.kings = kings
+    def to_bytes(self, color: str) -> bytes:
+        """
+        Packs the position, with the given side to move, into 16 bytes: the black, red and king bitboards and a flags
+        word, as little-endian 32-bit integers.
+        """
+        return BINARY_FORMAT.pack(self.black, self.red, self.king_mask, RED_TO_MOVE_FLAG if color == 'R' else 0)
 
-    def empty_at(self, pos: tuple[int, int]) -> bool:
+    @property
+    def empty(self) -> int:
         """
-        ...
+        The bitboard of the empty playable squares.
         """
-        return self.board[pos[0]][pos[1]] == -1
+        return ~(self.black | self.red) & bitboard.FULL
 
-    def location_of(self, stone_id: int) -> tuple[int, int]:
+    def key(self, color: str) -> int:
         """
-        returns the (x,y) position of the piece in the board matrix. In the returned tuple, position[0] (that is, x)
-        is the column of the board/matrix and position[1] (that is, y) is the row of the board/matrix.
+        The Zobrist hash of the position with the given side to move.
         """
-        for col in range(len(self.board)):
-            for row in range(len(self.board[col])):
-                if self.board[col][row] == stone_id:
-                    return (col, row)
+        return self.hash ^ zobrist.side_key(color)
 
-        raise LookupError(f"A stone with id {stone_id} does not exist on the this board.")
+    def canonical_key(self, color: str) -> tuple[int, bool]:
+        """
+        The key shared by the position and its mirror: the smaller of key(color) and the key of mirrored() with the
+        other side to move. Returns the key and whether it is the key of the mirror, in which case whatever is stored
+        under it is in the mirror's orientation (see bitboard.mirror_squares()).
+        """
+        key = self.hash ^ zobrist.side_key(color)
+        mirror_key = self.mirror_hash ^ zobrist.side_key(opponent(color))
+        return (mirror_key, True) if mirror_key < key else (key, False)
 
-    def stone_id_at(self, pos: tuple[int, int]):
+    def canonical_bytes(self, color: str) -> tuple[bytes, bool]:
         """
-        ...
+        The to_bytes() of the orientation of the position that canonical_key() picks, and whether it is the mirror.
         """
-        return self.board[pos[0]][pos[1]]
+        if self.canonical_key(color)[1]:
+            return BINARY_FORMAT.pack(bitboard.mirror(self.red), bitboard.mirror(self.black),
+                                      bitboard.mirror(self.king_mask), 0 if color == 'R' else RED_TO_MOVE_FLAG), True
+        return self.to_bytes(color), False
 
-    def _remove_stone_at(self, pos: tuple[int, int]):
-        self.board[pos[0]][pos[1]] = -1
+    def mirrored(self) -> Position:
+        """
+        Returns the position rotated by 180 degrees with the colours of the stones swapped, which is equivalent to
+        this one with the other side to move. The stones of a GameBoard get fresh ids, as with from_bitboards().
+        """
+        return type(self).from_bitboards(bitboard.mirror(self.red), bitboard.mirror(self.black),
+                                        bitboard.mirror(self.king_mask))
 
-    def _transfer_stone(self, orig_pos: tuple[int, int], final_pos: tuple[int, int]):
-        self.board[final_pos[0]][final_pos[1]] = self.board[orig_pos[0]][orig_pos[1]]
-        self._remove_stone_at(orig_pos)
+    def position(self) -> Position:
+        """
+        Returns a copy of the position without stone ids.
+        """
+        copied = Position.__new__(Position)
+        copied.black = self.black
+        copied.red = self.red
+        copied.king_mask = self.king_mask
+        copied.hash = self.hash
+        copied.mirror_hash = self.mirror_hash
+        return copied
+
+    def copy(self) -> Position:
+        return self.position()
+
+    def move_of(self, move: Move) -> Move:
+        """
+        Returns the move with the id of the stone it moves, which a position does not have.
+        """
+        return move
+
+    def make_move(self, move: Move) -> tuple:
+        """
+        Plays the move in place. A man that ends its move on the far row of the board is promoted to a king.
 
-    def copy_and_make_move(self, move: Move) -> GameBoard:
+        Returns an undo record for unmake_move(): the tuple (black, red, king_mask, hash, mirror_hash) from before the
+        move.
+        """
+        key = move.key
+        orig = key & 0x1F
+        final = key >> 5 & 0x1F
+        orig_bit = 1 << orig
+        final_bit = 1 << final
+        captured = key >> _CAPTURED_SHIFT
+
+        undo = black, red, king_mask, h, mirror_h = self.black, self.red, self.king_mask, self.hash, self.mirror_hash
+        if black & orig_bit:
+            kind = zobrist.BLACK_KING if king_mask & orig_bit else zobrist.BLACK_MAN
+            self.black = black & ~orig_bit | final_bit
+            self.red = red & ~captured
+        else:
+            kind = zobrist.RED_KING if king_mask & orig_bit else zobrist.RED_MAN
+            self.red = red & ~orig_bit | final_bit
+            self.black = black & ~captured
+        # The king of a kind of man is that kind + 2
+        final_kind = kind + 2 if kind < zobrist.BLACK_KING and _PROMOTION_ROWS[kind] & final_bit else kind
+
+        keys, mirror_keys = zobrist.KEYS, zobrist.MIRROR_KEYS
+        h ^= keys[kind][orig] ^ keys[final_kind][final]
+        mirror_h ^= mirror_keys[kind][orig] ^ mirror_keys[final_kind][final]
+        opponent_man = (kind & 1) ^ 1
+        for square in bitboard.squares_of(captured):
+            captured_kind = opponent_man + 2 if king_mask >> square & 1 else opponent_man
+            h ^= keys[captured_kind][square]
+            mirror_h ^= mirror_keys[captured_kind][square]
+
+        king_mask &= ~(orig_bit | captured)
+        if final_kind >= zobrist.BLACK_KING:
+            king_mask |= final_bit
+        self.king_mask = king_mask
+        self.hash = h
+        self.mirror_hash = mirror_h
+        return undo
+
+    def unmake_move(self, undo: tuple):
+        """
+        Takes back the move that returned the given undo record. Moves must be taken back in the reverse order in
+        which they were made.
+        """
+        self.black, self.red, self.king_mask, self.hash, self.mirror_hash = undo
+
+    def copy_and_make_move(self, move: Move) -> Position:
         copied_board = self.copy()
         copied_board.make_move(move)
         return copied_board
 
-    def make_move(self, move: Move):
-        self._transfer_stone(move.path[0], move.path[-1])
-        for pos in move.get_conquered_stones():
-            self.board[pos[0]][pos[1]] = -1
-
-    def copy(self):
-        return copy.deepcopy(self)
-
-    def _get_neighbour_moves(self, stone_id: int) -> set[Move]:
-        curr_pos = self.location_of(stone_id)
-
-        col = curr_pos[0]
-        row = curr_pos[1]
+    def legal_moves(self, color: str) -> list[Move]:
+        """
+        Returns every legal move of the given side ('B' or 'R').
 
-        if colorOf(stone_id) == 'B':
-            normal_targets = {(col + 1, row + 1), (col - 1, row + 1)}
-            king_targets = {(col + 1, row - 1), (col - 1, row - 1)}
+        Capturing is mandatory: if any stone of the side can jump, only jump moves are returned, and each of them is a
+        complete jump sequence (a stone can not stop jumping while it still has a stone to capture).
+        """
+        if color == 'B':
+            own, opponents = self.black, self.red
         else:
-            normal_targets = {(col - 1, row - 1), (col + 1, row - 1)}
-            king_targets = {(col + 1, row + 1), (col - 1, row + 1)}
+            own, opponents = self.red, self.black
+        empty = self.empty
+        kings = own & self.king_mask
 
-        neighbour_targets = normal_targets
+        jumpers = self.jumpers(color)
 
-        if stone_id in self.kings:
-            neighbour_targets.update(king_targets)
+        ids = self._ids
+        promotion = bitboard.PROMOTION_ROW[color]
+        of_squares = Move.of_squares
+        moves = []
 
-        # Removing erroneous targets (e.g. (-1, 2))
-        neighbour_targets = {targ for targ in neighbour_targets if isValidPos(targ)}
+        if jumpers:
+            cache = jumps.JUMP_CACHE
+            for square in bitboard.squares_of(jumpers):
+                is_king = kings >> square & 1
+                for sequence in cache.sequences(square, 'K' if is_king else color, opponents, empty | (1 << square)):
+                    moves.append(of_squares(ids[square], sequence, not is_king and promotion >> sequence[-1] & 1))
 
-        # Keeping only possible targets (i.e. one's that are empty)
-        neighbour_targets = {targ for targ in neighbour_targets if self.empty_at(targ)}
+            return moves
 
-        neighbour_moves = {Move(stone_id, [curr_pos, m]) for m in neighbour_targets}
+        steps = _STEPS[color]
+        king_steps = _STEPS['K']
+        for square in bitboard.squares_of(own):
+            for target, squares, key in (king_steps if kings >> square & 1 else steps)[square]:
+                if empty >> target & 1:
+                    moves.append(_step_move(ids[square], squares, key))
 
-        return neighbour_moves
+        return moves
 
+    def jumpers(self, color: str) -> int:
+        """
+        Returns the bitboard of the stones of the given side that have at least one jump, found with whole-board
+        shifts.
+        """
+        if color == 'B':
+            own, opponents = self.black, self.red
+        else:
+            own, opponents = self.red, self.black
+        empty = self.empty
+        kings = own & self.king_mask
+
+        jumpers = 0
+        for shift in bitboard.FORWARD[color]:
+            back = bitboard.OPPOSITE[shift]
+            jumpers |= back(back(empty) & opponents) & own
+        if kings:
+            for shift in bitboard.BACKWARD[color]:
+                back = bitboard.OPPOSITE[shift]
+                jumpers |= back(back(empty) & opponents) & kings
+        return jumpers
+
+    def steppers(self, color: str) -> int:
+        """
+        Returns the bitboard of the stones of the given side that can step to an empty neighbouring square.
+        """
+        own = self.black if color == 'B' else self.red
+        empty = self.empty
+        kings = own & self.king_mask
 
-    def _get_neighbour_jumps(self, stone_id: int):
+        steppers = 0
+        for shift in bitboard.FORWARD[color]:
+            steppers |= bitboard.OPPOSITE[shift](empty) & own
+        if kings:
+            for shift in bitboard.BACKWARD[color]:
+                steppers |= bitboard.OPPOSITE[shift](empty) & kings
+        return steppers
 
-        # The set that will be returned
-        neighbour_jumps = set()
 
-        position = self.location_of(stone_id)
+class GameBoard(Position):
+    """
+    A class that representings the state of a checkers board.
 
-        col = position[0]
-        row = position[1]
+    On top of the bitboards and hashes of its Position, a board keeps the id of the stone standing on every square and
+    the square of every stone id (-1 once the stone has been captured), so that the moves it generates name the stone
+    they move. The nested list that the API works with (where each list at depth 1 is a column and each element of
+    the inner list specified the particular row) is only built on demand, by to_list() or the board property.
+    """
+    kings: set[int]
+    _ids: list[int]
+    _locations: list[int]
 
-        if colorOf(stone_id) == 'B':
-            normal_targets = {(col + 2, row + 2), (col - 2, row + 2)}
-            king_targets = {(col + 2, row - 2), (col - 2, row - 2)}
+    def __init__(self, board: list[list[int]], kings: set[int] = None):
+        if kings is None:
+            self.kings = set()
         else:
-            normal_targets = {(col + 2, row - 2), (col - 2, row - 2)}
-            king_targets = {(col + 2, row + 2), (col - 2, row + 2)}
+            self.kings = kings
 
-        neighbour_targets = normal_targets
+        self.black = 0
+        self.red = 0
+        self.king_mask = 0
+        self.hash = 0
+        self.mirror_hash = 0
+        self._ids = [-1] * 32
+        self._locations = [-1] * 24
 
+        for col in range(len(board)):
+            for row in range(len(board[col])):
+                stone_id = board[col][row]
+                if stone_id == -1:
+                    continue
 
+                if stone_id not in BLACK and stone_id not in RED:
+                    raise ValueError(f"{stone_id} is not a valid stone id.")
 
-        if stone_id in self.kings:
-            neighbour_targets.update(king_targets)
+                square = bitboard.square_of((col, row))
+                if square is None:
+                    raise ValueError(f"The stone {stone_id} is placed on the light square {(col, row)}.")
 
-        # pprint(self.board)
-        # print(f"neighbour_targets: {neighbour_targets}")
+                location = self._locations[stone_id]
+                self._place_stone(square, stone_id)
 
-        for targ in neighbour_targets:
-            diff = difference(position, targ)
-            half_diff = (diff[0] // 2, diff[1] // 2)
-            intermediate = addition(position, half_diff)
+                # With a repeated stone id the first occurrence is the one that location_of() reports
+                if location != -1:
+                    self._locations[stone_id] = location
 
-            # print(f"isValidPos(targ) for {targ}: {isValidPos(targ)}")
-            # print(f"self.empty_at(targ) for {targ}: {self.empty_at(targ)}")
-            # print(f"not self.empty_at(intermediate) for {targ}: {not self.empty_at(intermediate)}")
-            # print(colorOf(self.stone_id_at(intermediate)) != colorOf(stone_id))
+    @classmethod
+    def from_list(cls, board: list[list[int]], kings: set[int] = None) -> GameBoard:
+        return cls(board, kings)
 
-            if isValidPos(targ) and self.empty_at(targ) \
-                    and not self.empty_at(intermediate) and \
-                    colorOf(self.stone_id_at(intermediate)) != colorOf(stone_id):
-                move = Move(stone_id, [position, targ])
-                neighbour_jumps.add(move)
+    @classmethod
+    def from_bitboards(cls, black: int, red: int, king_mask: int) -> GameBoard:
+        """
+        Builds a board from its bitboards. The stones get fresh ids: the black stones 0, 1, ... and the red stones
+        12, 13, ... in the order of their squares.
+        """
+        _check_bitboards(black, red, king_mask)
+
+        board = [[-1] * 8 for _ in range(8)]
+        kings = set()
+        for bb, ids in ((black, BLACK), (red, RED)):
+            for square, stone_id in zip(bitboard.squares_of(bb), ids):
+                col, row = bitboard.POSITIONS[square]
+                board[col][row] = stone_id
+                if king_mask >> square & 1:
+                    kings.add(stone_id)
+        return cls(board, kings)
+
+    @classmethod
+    def start(cls) -> GameBoard:
+        """
+        Returns a new board set up for the start of a game.
+        """
+        return cls(START_BOARD)
 
-        # print([x.path for x in neighbour_jumps])
+    def to_list(self) -> list[list[int]]:
+        """
+        Returns the board in the nested list format of the API, where board[col][row] is the id of the stone at
+        (col, row) or -1 for an empty position.
+        """
+        board = [[-1] * 8 for _ in range(8)]
+        for square, stone_id in enumerate(self._ids):
+            if stone_id != -1:
+                col, row = bitboard.POSITIONS[square]
+                board[col][row] = stone_id
+        return board
+
+    @property
+    def board(self) -> list[list[int]]:
+        return self.to_list()
+
+    def _place_stone(self, square: int, stone_id: int):
+        bit = 1 << square
+        color = colorOf(stone_id)
+        if color == 'B':
+            self.black |= bit
+        else:
+            self.red |= bit
+        is_king = stone_id in self.kings
+        if is_king:
+            self.king_mask |= bit
+        kind = zobrist.kind_of(color, is_king)
+        self.hash ^= zobrist.KEYS[kind][square]
+        self.mirror_hash ^= zobrist.MIRROR_KEYS[kind][square]
+        self._ids[square] = stone_id
+        self._locations[stone_id] = square
+
+    def _clear_square(self, square: int):
+        bit = 1 << square
+        if not (self.black | self.red) & bit:
+            return
+        kind = zobrist.kind_of('B' if self.black & bit else 'R', self.king_mask & bit)
+        self.hash ^= zobrist.KEYS[kind][square]
+        self.mirror_hash ^= zobrist.MIRROR_KEYS[kind][square]
+        mask = ~bit
+        self.black &= mask
+        self.red &= mask
+        self.king_mask &= mask
+        stone_id = self._ids[square]
+        if stone_id != -1 and self._locations[stone_id] == square:
+            self._locations[stone_id] = -1
+        self._ids[square] = -1
+
+    def _square_of(self, stone_id: int) -> int:
+        square = self._locations[stone_id] if 0 <= stone_id < 24 else -1
+        if square == -1:
+            raise LookupError(f"A stone with id {stone_id} does not exist on the this board.")
+        return square
 
-        return neighbour_jumps
+    def empty_at(self, pos: tuple[int, int]) -> bool:
+        """
+        Returns if there is no stone at the given position. Light squares are always empty.
+        """
+        square = bitboard.square_of(pos)
+        return square is None or self._ids[square] == -1
 
-    def _get_jumps(self, stone_id: int) -> set[Move]:
-        jumps = set()
+    def location_of(self, stone_id: int) -> tuple[int, int]:
+        """
+        returns the (x,y) position of the piece in the board matrix. In the returned tuple, position[0] (that is, x)
+        is the column of the board/matrix and position[1] (that is, y) is the row of the board/matrix.
+        """
+        return bitboard.POSITIONS[self._square_of(stone_id)]
 
-        # print("^^^^^^^^^")
-        # pprint(self.board)
-        # print("^^^^^^^^^")
+    def stone_id_at(self, pos: tuple[int, int]):
+        """
+        Returns the id of the stone at the given position, or -1 if the position is empty.
+        """
+        square = bitboard.square_of(pos)
+        return -1 if square is None else self._ids[square]
 
-        neigh_jumps = self._get_neighbour_jumps(stone_id)
+    def _remove_stone_at(self, pos: tuple[int, int]):
+        square = bitboard.square_of(pos)
+        if square is not None:
+            self._clear_square(square)
 
-        # print(f"neighbours for stone: {stone_id} ", [x.path for x in neigh_jumps])
+    def _transfer_stone(self, orig_pos: tuple[int, int], final_pos: tuple[int, int]):
+        self._move_stone(bitboard.square_of(orig_pos), bitboard.square_of(final_pos))
+
+    def _move_stone(self, orig: int, final: int):
+        if orig == final:
+            return
+        stone_id = self._ids[orig]
+        self._clear_square(orig)
+        self._clear_square(final)
+        if stone_id != -1:
+            self._place_stone(final, stone_id)
+
+    def make_move(self, move: Move) -> tuple:
+        """
+        Plays the move on this board in place. A stone that ends its move on the far row of the board is promoted to
+        a king.
 
-        for neigh_jump in neigh_jumps:
-            jumps.add(neigh_jump)
+        Returns an undo record for unmake_move(), which puts the board back exactly as it was before the move. The
+        record is the tuple (black, red, king_mask, hash, mirror_hash, orig, final, stone_id, captured, promoted), where
+        captured holds the (square, stone_id) pairs of the conquered stones.
+        """
+        orig = move.squares[0]
+        final = move.squares[-1]
+        stone_id = self._ids[orig]
+        captured = tuple((square, self._ids[square]) for square in bitboard.squares_of(move.key >> _CAPTURED_SHIFT))
 
-            new_board = self.copy_and_make_move(neigh_jump)
-            #
-            # print(f"move: {neigh_jump.path}")
-            # pprint(new_board.board)
-            # print("00000000")
+        black, red, king_mask, h, mirror_h = self.black, self.red, self.king_mask, self.hash, self.mirror_hash
 
-            remaining_jumps = new_board._get_jumps(stone_id)
+        for square, _ in captured:
+            self._clear_square(square)
 
-            remaining_moves = {Move(stone_id, [neigh_jump.path[0]] + jump.path) for
-                               jump in remaining_jumps}
+        self._move_stone(orig, final)
 
-            jumps.update(remaining_moves)
+        final_bit = 1 << final
+        promoted = False
+        if stone_id != -1 and not self.king_mask & final_bit and \
+                final_bit & (bitboard.TOP_ROW if colorOf(stone_id) == 'B' else bitboard.BOTTOM_ROW):
+            promoted = stone_id not in self.kings
+            self.kings.add(stone_id)
+            self.king_mask |= final_bit
+            color = colorOf(stone_id)
+            man, king = zobrist.kind_of(color, False), zobrist.kind_of(color, True)
+            self.hash ^= zobrist.KEYS[man][final] ^ zobrist.KEYS[king][final]
+            self.mirror_hash ^= zobrist.MIRROR_KEYS[man][final] ^ zobrist.MIRROR_KEYS[king][final]
 
-        return jumps
+        return black, red, king_mask, h, mirror_h, orig, final, stone_id, captured, promoted
 
+    def unmake_move(self, undo: tuple):
+        """
+        Takes back the move that returned the given undo record. Moves must be taken back in the reverse order in
+        which they were made.
+        """
+        black, red, king_mask, h, mirror_h, orig, final, stone_id, captured, promoted = undo
+
+        self.black = black
+        self.red = red
+        self.king_mask = king_mask
+        self.hash = h
+        self.mirror_hash = mirror_h
+
+        self._ids[final] = -1
+        self._ids[orig] = stone_id
+        if stone_id != -1:
+            self._locations[stone_id] = orig
+        for square, captured_id in captured:
+            self._ids[square] = captured_id
+            if captured_id != -1:
+                self._locations[captured_id] = square
+
+        if promoted:
+            self.kings.discard(stone_id)
 
+    def copy(self):
+        copied = GameBoard.__new__(GameBoard)
+        copied.black = self.black
+        copied.red = self.red
+        copied.king_mask = self.king_mask
+        copied.hash = self.hash
+        copied.mirror_hash = self.mirror_hash
+        copied.kings = set(self.kings)
+        copied._ids = self._ids.copy()
+        copied._locations = self._locations.copy()
+        return copied
+
+    def move_of(self, move: Move) -> Move:
+        """
+        Returns the move (e.g. one found by searching the identity-free position()) with the id of the stone standing
+        on its origin square.
+        """
+        squares = move.squares
+        return Move.of_squares(self._ids[squares[0]], squares, move.promotes)
 
+    def _kind_of(self, stone_id: int) -> str:
+        # The kind of the stone in the geometry tables: 'K' for a king, its colour for a man
+        return 'K' if stone_id in self.kings else colorOf(stone_id)
 
-sample_board = [
-    [0, -1, 1, -1, -1, -1, 12, -1],
-    [-1, -1, -1, -1, -1, 14, -1, 13],
-    [3, -1, 4, -1, -1, -1, 15, -1],
-    [-1, 5, -1, -1, -1, 17, -1, 16],
-    [6, -1, 7, -1, -1, -1, 18, -1],
-    [-1, 8, -1, 14, -1, 20, -1, 19],
-    [9, -1, 10, -1, -1, -1, 21, -1],
-    [-1, 11, -1, -1, -1, 23, -1, 22]
-]
+    def _get_neighbour_moves(self, stone_id: int) -> set[Move]:
+        square = self._square_of(stone_id)
+        empty = self.empty
 
-sample_board = [
-    [0, -1, -1, -1, -1, -1, 12, -1],
-    [-1, -1, -1, 13, -1, 14, -1, 13],
-    [3, -1, 4, -1, -1, -1, -1, -1],
-    [-1, 5, -1, -1, -1, 17, -1, 16],
-    [6, -1, 7, -1, -1, -1, 2, -1],
-    [-1, 8, -1, 14, -1, 20, -1, 19],
-    [9, -1, 10, -1, -1, -1, 21, -1],
-    [-1, 11, -1, -1, -1, 23, -1, 22]
-]
+        # Keeping only possible targets (i.e. one's that are empty)
+        return {Move.of_squares(stone_id, (square, target))
+                for target in geometry.STEPS[self._kind_of(stone_id)][square] if empty >> target & 1}
 
-sample_board = [
-    [0, -1, 1, -1, -1, -1, 12, -1],
-    [-1, -1, -1, 20, -1, 14, -1, 10],
-    [3, -1, 4, 15, -1, -1, -1, -1],
-    [-1, 5, -1, 17, -1, 18, -1, 16],
-    [-1, -1, 7, -1, -1, -1, -1, -1],
-    [-1, 8, -1, 13, -1, 2, -1, 19],
-    [9, -1, -1, -1, -1, -1, 21, -1],
-    [-1, 11, -1, 6, -1, 23, -1, 22]
-]
+    def _get_neighbour_jumps(self, stone_id: int) -> set[Move]:
+        square = self._square_of(stone_id)
+        opponents = self.red if colorOf(stone_id) == 'B' else self.black
+        empty = self.empty
 
-# board = [[0, -1, 1, -1, -1, -1, 12, -1],
-#  [-1, 2, -1, -1, -1, 14, -1, 13],
-#  [3, -1, 4, -1, -1, -1, -1, -1],
-#  [-1, 5, -1, -1, -1, 17, -1, 16],
-#  [6, -1, 7, -1, 10, -1, 18, -1],
-#  [-1, 8, -1, -1, -1, 20, -1, 19],
-#  [9, -1, -1, -1, -1, -1, 21, -1],
-#  [-1, 11, -1, -1, -1, 23, -1, 22]]
-
-sample_stone_id = 2
-
-gb = GameBoard(sample_board, {4, 7})
-#
-for i in range(24):
-    print(i, [x.path for x in gb._get_jumps(i)])
-
-# board = [[0, -1, 1, -1, -1, -1, 12, -1],
-#  [-1, -1, -1, 20, -1, 14, -1, 13],
-#  [3, -1, 4, 15, -1, -1, -1, -1],
-#  [-1, 5, -1, 17, -1, 18, -1, 16],
-#  [-1, -1, 7, -1, -1, -1, -1, -1],
-#  [-1, 8, -1, -1, -1, -1, -1, 19],
-#  [9, -1, 21, -1, -1, -1, -1, -1],
-#  [-1, 11, -1, 6, -1, 23, -1, 22]]
-#
-# gb = GameBoard(board)
-#
-# print([x.path for x in gb._get_neighbour_jumps(21)])
-
-
-x = [
-    [(2, 2), (0, 4)],
-    [(2, 2), (4, 4), (2, 6)],
-    [(2, 2), (4, 4), (2, 6), (0, 4)],
-    [(2, 2), (0, 4), (2, 6), (4, 4)],
-    [(2, 2), (0, 4), (2, 6)],
-    [(2, 2), (4, 4), (2, 6), (0, 4), (2, 2)],
-    [(2, 2), (4, 4)],
-    [(2, 2), (0, 4), (2, 6), (4, 4), (2, 2)]
-]
-#
-# y = [
-#  [0, -1, 1, -1, -1, -1, 12, -1],
-#  [-1, -1, -1, -1, -1, -1, -1, 13],
-#  [3, -1, -1, 15, -1, -1, -1, -1],
-#  [-1, 5, -1, 17, -1, -1, -1, 16],
-#  [-1, -1, 7, -1, 4, -1, -1, -1],
-#  [-1, 8, -1, 10, -1, 2, -1, 19],
-#  [9, -1, -1, -1, -1, -1, 21, -1],
-#  [-1, 11, -1, 6, -1, 23, -1, 22]
-# ]
-#
-# XXX = GameBoard(y, {4})
-#
-# print([x.path for x in XXX._get_neighbour_jumps(4)])
+        return {Move.of_squares(stone_id, (square, landing))
+                for over, landing in geometry.JUMPS[self._kind_of(stone_id)][square]
+                if opponents >> over & 1 and empty >> landing & 1}
+
+    def _get_jumps(self, stone_id: int) -> set[Move]:
+        """
+        Returns every jump of the stone: its complete jump sequences along with each of their shorter beginnings.
+        """
+        square = self._square_of(stone_id)
+        opponents = self.red if colorOf(stone_id) == 'B' else self.black
+
+        prefixes = set()
+        for sequence in jumps.JUMP_CACHE.sequences(square, self._kind_of(stone_id), opponents,
+                                                    self.empty | (1 << square)):
+            for end in range(2, len(sequence) + 1):
+                prefixes.add(sequence[:end])
+
+        return {Move.of_squares(stone_id, prefix) for prefix in prefixes}
+
+
+if __name__ == '__main__':
+    sample_board = [
+        [0, -1, 1, -1, -1, -1, 12, -1],
+        [-1, -1, -1, -1, -1, 14, -1, 13],
+        [3, -1, 4, -1, -1, -1, 15, -1],
+        [-1, 5, -1, -1, -1, 17, -1, 16],
+        [6, -1, 7, -1, -1, -1, 18, -1],
+        [-1, 8, -1, 14, -1, 20, -1, 19],
+        [9, -1, 10, -1, -1, -1, 21, -1],
+        [-1, 11, -1, -1, -1, 23, -1, 22]
+    ]
+
+    sample_board = [
+        [0, -1, -1, -1, -1, -1, 12, -1],
+        [-1, -1, -1, 13, -1, 14, -1, 13],
+        [3, -1, 4, -1, -1, -1, -1, -1],
+        [-1, 5, -1, -1, -1, 17, -1, 16],
+        [6, -1, 7, -1, -1, -1, 2, -1],
+        [-1, 8, -1, 14, -1, 20, -1, 19],
+        [9, -1, 10, -1, -1, -1, 21, -1],
+        [-1, 11, -1, -1, -1, 23, -1, 22]
+    ]
+
+    sample_board = [
+        [0, -1, 1, -1, -1, -1, 12, -1],
+        [-1, -1, -1, 20, -1, 14, -1, 10],
+        [3, -1, 4, 15, -1, -1, -1, -1],
+        [-1, 5, -1, 17, -1, 18, -1, 16],
+        [-1, -1, 7, -1, -1, -1, -1, -1],
+        [-1, 8, -1, 13, -1, 2, -1, 19],
+        [9, -1, -1, -1, -1, -1, 21, -1],
+        [-1, 11, -1, 6, -1, 23, -1, 22]
+    ]
+
+    # board = [[0, -1, 1, -1, -1, -1, 12, -1],
+    #  [-1, 2, -1, -1, -1, 14, -1, 13],
+    #  [3, -1, 4, -1, -1, -1, -1, -1],
+    #  [-1, 5, -1, -1, -1, 17, -1, 16],
+    #  [6, -1, 7, -1, 10, -1, 18, -1],
+    #  [-1, 8, -1, -1, -1, 20, -1, 19],
+    #  [9, -1, -1, -1, -1, -1, 21, -1],
+    #  [-1, 11, -1, -1, -1, 23, -1, 22]]
+
+    sample_stone_id = 2
+
+    gb = GameBoard(sample_board, {4, 7})
+    #
+    for i in range(24):
+        print(i, [x.path for x in gb._get_jumps(i)])
+
+    # board = [[0, -1, 1, -1, -1, -1, 12, -1],
+    #  [-1, -1, -1, 20, -1, 14, -1, 13],
+    #  [3, -1, 4, 15, -1, -1, -1, -1],
+    #  [-1, 5, -1, 17, -1, 18, -1, 16],
+    #  [-1, -1, 7, -1, -1, -1, -1, -1],
+    #  [-1, 8, -1, -1, -1, -1, -1, 19],
+    #  [9, -1, 21, -1, -1, -1, -1, -1],
+    #  [-1, 11, -1, 6, -1, 23, -1, 22]]
+    #
+    # gb = GameBoard(board)
+    #
+    # print([x.path for x in gb._get_neighbour_jumps(21)])
+
+
+    x = [
+        [(2, 2), (0, 4)],
+        [(2, 2), (4, 4), (2, 6)],
+        [(2, 2), (4, 4), (2, 6), (0, 4)],
+        [(2, 2), (0, 4), (2, 6), (4, 4)],
+        [(2, 2), (0, 4), (2, 6)],
+        [(2, 2), (4, 4), (2, 6), (0, 4), (2, 2)],
+        [(2, 2), (4, 4)],
+        [(2, 2), (0, 4), (2, 6), (4, 4), (2, 2)]
+    ]
+    #
+    # y = [
+    #  [0, -1, 1, -1, -1, -1, 12, -1],
+    #  [-1, -1, -1, -1, -1, -1, -1, 13],
+    #  [3, -1, -1, 15, -1, -1, -1, -1],
+    #  [-1, 5, -1, 17, -1, -1, -1, 16],
+    #  [-1, -1, 7, -1, 4, -1, -1, -1],
+    #  [-1, 8, -1, 10, -1, 2, -1, 19],
+    #  [9, -1, -1, -1, -1, -1, 21, -1],
+    #  [-1, 11, -1, 6, -1, 23, -1, 22]
+    # ]
+    #
+    # XXX = GameBoard(y, {4})
+    #
+    # print([x.path for x in XXX._get_neighbour_jumps(4)])
@@ -0,0 +1,352 @@
+"""
+Endgame tablebases: the exact outcome of every position with few stones left.
+
+The generator solves every material class (the numbers of black men, black kings, red men and red kings) of up to
+max_pieces stones. Classes are solved in order of fewer stones first and then fewer men, so that every capture and
+every promotion leads to a class that is already solved and only the quiet moves stay inside the class. Inside a class
+the outcomes are found by fixpoint iteration: a side that can not move has lost, a position with a move to a lost
+position is won, a position whose moves all lead to won positions is lost, and whatever is left when nothing changes
+any more is a draw. Every won or lost position also gets its distance to the end of the game in plies, so that the
+winning side can make progress by always moving towards a smaller distance.
+
+Positions are indexed by combinatorial ranking: each group of stones (black men, black kings, red men, red kings) is
+a combination of the squares it may stand on, ranked with the combinatorial number system, and the ranks of the four
+groups are combined as a mixed-radix number. Men are never on their promotion row. Indices where two groups overlap
+are unused.
+
+A position and its mirror (rotated by 180 degrees with the colours and the side to move swapped, see
+bitboard.mirror()) have the same outcome, so only one of them is solved and stored: of two mirrored classes, the one
+in which black has more men (or, with as many men, more kings), and of a class that is its own mirror, only the
+positions with black to move. Positions are turned into that orientation by canonical() before they are looked up.
+The file stores, per stored class and side to move, the outcomes packed in 2 bits each and the distances in one byte
+each, and it is probed through mmap:
+
+    python tablebase.py -o endgame.tb --pieces 4
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import mmap
+import struct
+import time
+from math import comb
+
+import bitboard
+from structure import Move, Position, opponent
+
+MAGIC = b'CKTB0002'
+
+UNKNOWN = 0  # also used for the unused indices
+WIN = 1
+LOSS = 2
+DRAW = 3
+
+RESULTS = {WIN: 'win', LOSS: 'loss', DRAW: 'draw'}
+
+DEFAULT_PIECES = 3
+
+# Distances past this are stored as MAX_DISTANCE
+MAX_DISTANCE = 0xFF
+
+_COUNT = struct.Struct('<I')
+_CLASS = struct.Struct('<BBBBIQQ')
+
+# The squares the stones of each group may stand on: men never stand on the row where they are promoted
+_BLACK_MEN = tuple(square for square in range(32) if not bitboard.TOP_ROW >> square & 1)
+_RED_MEN = tuple(square for square in range(32) if not bitboard.BOTTOM_ROW >> square & 1)
+_KINGS = tuple(range(32))
+_GROUPS = (_BLACK_MEN, _KINGS, _RED_MEN, _KINGS)
+
+# _OFFSETS[group][square] is the place of the square among the squares of the group
+_OFFSETS = tuple({square: offset for offset, square in enumerate(squares)} for squares in _GROUPS)
+
+
+def material_of(black: int, red: int, king_mask: int) -> tuple[int, int, int, int]:
+    """
+    Returns the material class of the position: its numbers of black men, black kings, red men and red kings.
+    """
+    return ((black & ~king_mask).bit_count(), (black & king_mask).bit_count(),
+            (red & ~king_mask).bit_count(), (red & king_mask).bit_count())
+
+
+def class_size(material: tuple[int, int, int, int]) -> int:
+    """
+    The number of indices of a material class, per side to move.
+    """
+    size = 1
+    for squares, count in zip(_GROUPS, material):
+        size *= comb(len(squares), count)
+    return size
+
+
+def rank(black: int, red: int, king_mask: int) -> int:
+    """
+    Returns the index of the position within its material class.
+    """
+    index = 0
+    for group, bb in enumerate((black & ~king_mask, black & king_mask, red & ~king_mask, red & king_mask)):
+        offsets = _OFFSETS[group]
+        group_rank = 0
+        for i, square in enumerate(bitboard.squares_of(bb), 1):
+            group_rank += comb(offsets[square], i)
+        index = index * comb(len(_GROUPS[group]), bb.bit_count()) + group_rank
+    return index
+
+
+def is_stored(material: tuple[int, int, int, int]) -> bool:
+    """
+    Whether the positions of the material class are stored, rather than those of its mirror.
+    """
+    black_men, black_kings, red_men, red_kings = material
+    return (black_men, black_kings) >= (red_men, red_kings)
+
+
+def canonical(black: int, red: int, king_mask: int, color: str) -> tuple[int, int, int, str]:
+    """
+    Returns the (black, red, king_mask, side to move) of the orientation of the position that is stored: the position
+    itself or its mirror.
+    """
+    black_men, black_kings, red_men, red_kings = material_of(black, red, king_mask)
+    black_side, red_side = (black_men, black_kings), (red_men, red_kings)
+    if black_side < red_side or (black_side == red_side and color == 'R'):
+        return bitboard.mirror(red), bitboard.mirror(black), bitboard.mirror(king_mask), opponent(color)
+    return black, red, king_mask, color
+
+
+def materials(max_pieces: int):
+    """
+    Returns the material classes with at least one stone per side and at most max_pieces stones, in the order they
+    have to be solved in.
+    """
+    classes = [
+        (black_men, black_kings, red_men, red_kings)
+        for black_men, black_kings, red_men, red_kings in itertools.product(range(max_pieces + 1), repeat=4)
+        if black_men + black_kings >= 1 and red_men + red_kings >= 1
+        and black_men + black_kings + red_men + red_kings <= max_pieces
+    ]
+    return sorted(classes, key=lambda material: (sum(material), material[0] + material[2], material))
+
+
+def _positions(material: tuple[int, int, int, int]):
+    # Yields the (black, red, king_mask) of every position of the class
+    groups = [itertools.combinations(squares, count) for squares, count in zip(_GROUPS, material)]
+    for black_men, black_kings, red_men, red_kings in itertools.product(*map(list, groups)):
+        bbs = [sum(1 << square for square in squares) for squares in (black_men, black_kings, red_men, red_kings)]
+        if (bbs[0] | bbs[1] | bbs[2] | bbs[3]).bit_count() != sum(material):
+            continue
+        yield bbs[0] | bbs[1], bbs[2] | bbs[3], bbs[1] | bbs[3]
+
+
+def _solve(material, solved, verbose: bool = False) -> tuple[bytearray, bytearray]:
+    # Solves one material class, given the solved classes its captures and promotions lead to
+    size = class_size(material)
+    values = bytearray(2 * size)
+    distances = bytearray(2 * size)
+
+    def outcome(black: int, red: int, king_mask: int, color: str) -> tuple[int, int]:
+        # The outcome of a position outside of the class, for the given side to move
+        if not (black if color == 'B' else red):
+            return LOSS, 0
+        black, red, king_mask, color = canonical(black, red, king_mask, color)
+        child = material_of(black, red, king_mask)
+        child_values, child_distances = solved[child]
+        index = (color == 'R') * class_size(child) + rank(black, red, king_mask)
+        return child_values[index], child_distances[index]
+
+    # Every undecided position with the indices of its moves inside the class, the largest distance of its moves to
+    # won positions outside the class, and whether all of those are won
+    pending = {}
+
+    for black, red, king_mask in _positions(material):
+        board = Position.from_bitboards(black, red, king_mask)
+        position_rank = rank(black, red, king_mask)
+
+        for side, color in enumerate(('B', 'R')):
+            index = side * size + position_rank
+            moves = board.legal_moves(color)
+            if not moves:
+                values[index] = LOSS
+                continue
+
+            other = opponent(color)
+            inside = []
+            fastest_win = None
+            slowest_loss = 0
+            all_won = True
+            for move in moves:
+                undo = board.make_move(move)
+                if material_of(board.black, board.red, board.king_mask) == material:
+                    inside.append((1 - side) * size + rank(board.black, board.red, board.king_mask))
+                else:
+                    value, distance = outcome(board.black, board.red, board.king_mask, other)
+                    if value == LOSS:
+                        fastest_win = distance if fastest_win is None else min(fastest_win, distance)
+                    elif value == WIN:
+                        slowest_loss = max(slowest_loss, distance)
+                    else:
+                        all_won = False
+                board.unmake_move(undo)
+
+            if fastest_win is not None:
+                values[index] = WIN
+                distances[index] = min(fastest_win + 1, MAX_DISTANCE)
+            else:
+                pending[index] = (inside, slowest_loss, all_won)
+
+    changed = True
+    rounds = 0
+    while changed:
+        changed = False
+        rounds += 1
+        for index, (inside, slowest_loss, all_won) in list(pending.items()):
+            lost = [distances[child] for child in inside if values[child] == LOSS]
+            if lost:
+                values[index] = WIN
+                distances[index] = min(min(lost) + 1, MAX_DISTANCE)
+            elif all_won and all(values[child] == WIN for child in inside):
+                values[index] = LOSS
+                distances[index] = min(max([slowest_loss] + [distances[child] for child in inside]) + 1,
+                                       MAX_DISTANCE)
+            else:
+                continue
+            del pending[index]
+            changed = True
+
+    for index in pending:
+        values[index] = DRAW
+
+    if verbose:
+        print(f"{material}: {size} positions per side, {rounds} rounds, {len(pending)} draws")
+    return values, distances
+
+
+def _pack(values: bytearray) -> bytes:
+    packed = bytearray((len(values) + 3) // 4)
+    for index, value in enumerate(values):
+        if value:
+            packed[index >> 2] |= value << ((index & 3) << 1)
+    return bytes(packed)
+
+
+def build(path: str, max_pieces: int = DEFAULT_PIECES, verbose: bool = False) -> int:
+    """
+    Solves every stored material class of up to max_pieces stones and writes the tablebase to path. Returns the
+    number of positions it holds (both sides to move counted).
+    """
+    classes = [material for material in materials(max_pieces) if is_stored(material)]
+    solved = {}
+    for material in classes:
+        solved[material] = _solve(material, solved, verbose)
+        # Of a class that is its own mirror, the positions with red to move are the mirrors of the first half
+        black_men, black_kings, red_men, red_kings = material
+        if (black_men, black_kings) == (red_men, red_kings):
+            values, distances = solved[material]
+            solved[material] = values[:class_size(material)], distances[:class_size(material)]
+
+    header_size = len(MAGIC) + _COUNT.size + len(classes) * _CLASS.size
+    offset = header_size
+    table = []
+    for material in classes:
+        values, distances = solved[material]
+        packed = _pack(values)
+        table.append((material, packed, distances, offset, offset + len(packed)))
+        offset += len(packed) + len(distances)
+
+    with open(path, 'wb') as file:
+        file.write(MAGIC)
+        file.write(_COUNT.pack(len(classes)))
+        for material, packed, distances, values_offset, distances_offset in table:
+            file.write(_CLASS.pack(*material, class_size(material), values_offset, distances_offset))
+        for material, packed, distances, values_offset, distances_offset in table:
+            file.write(packed)
+            file.write(distances)
+
+    return sum(len(solved[material][0]) for material in classes)
+
+
+class Tablebase:
+    """
+    A read-only, memory-mapped tablebase written by build().
+    """
+    path: str
+    max_pieces: int
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._map[:len(MAGIC)] != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a tablebase.")
+
+        count = _COUNT.unpack_from(self._map, len(MAGIC))[0]
+        self._classes = {}
+        for i in range(count):
+            *material, size, values_offset, distances_offset = _CLASS.unpack_from(
+                self._map, len(MAGIC) + _COUNT.size + i * _CLASS.size)
+            self._classes[tuple(material)] = (size, values_offset, distances_offset)
+        self.max_pieces = max((sum(material) for material in self._classes), default=0)
+
+    def close(self):
+        self._map.close()
+
+    def probe(self, board: Position, color: str) -> tuple[int, int] | None:
+        """
+        Returns the (outcome, distance in plies) of the position for the side to move, where the outcome is WIN, LOSS
+        or DRAW, or None if the position is not covered by the tablebase.
+        """
+        return self.probe_bitboards(board.black, board.red, board.king_mask, color)
+
+    def probe_bitboards(self, black: int, red: int, king_mask: int, color: str) -> tuple[int, int] | None:
+        if not (black if color == 'B' else red):
+            return LOSS, 0
+        # A man on the row it promotes on (which a board can be given with) has no place in the tables
+        if black & ~king_mask & bitboard.TOP_ROW or red & ~king_mask & bitboard.BOTTOM_ROW:
+            return None
+        black, red, king_mask, color = canonical(black, red, king_mask, color)
+        entry = self._classes.get(material_of(black, red, king_mask))
+        if entry is None:
+            return None
+
+        size, values_offset, distances_offset = entry
+        index = (color == 'R') * size + rank(black, red, king_mask)
+        value = (self._map[values_offset + (index >> 2)] >> ((index & 3) << 1)) & 0x3
+        if value == UNKNOWN:
+            return None
+        return value, self._map[distances_offset + index]
+
+    def best_move(self, board: Position, color: str) -> Move | None:
+        """
+        Returns the move that keeps the best outcome of the position: the fastest win, a move that holds the draw, or
+        the slowest loss. Returns None if the position is not covered or the side to move can not move.
+        """
+        entry = self.probe(board, color)
+        if entry is None:
+            return None
+
+        other = opponent(color)
+        best = None
+        best_key = None
+        for move in board.legal_moves(color):
+            undo = board.make_move(move)
+            value, distance = self.probe(board, other)
+            board.unmake_move(undo)
+            # From the mover's point of view: a lost position for the opponent is best, the quicker the better
+            key = {LOSS: (2, -distance), DRAW: (1, 0), WIN: (0, distance)}[value]
+            if best_key is None or key > best_key:
+                best, best_key = move, key
+        return best
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Builds the endgame tablebase of positions with few stones.")
+    parser.add_argument('-o', '--output', default='endgame.tb', help="the file to write the tablebase to")
+    parser.add_argument('-n', '--pieces', type=int, default=DEFAULT_PIECES,
+                        help="the largest number of stones on the board")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    positions = build(args.output, args.pieces, verbose=True)
+    print(f"Wrote {positions} positions to {args.output} in {time.perf_counter() - started:.1f} s")
@@ -0,0 +1,65 @@
+import pytest
+
+import book
+import engine
+import services
+from structure import GameBoard
+
+
+@pytest.fixture(scope='module')
+def opening_book(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('book') / 'book.bin')
+    count = book.build(path, plies=2, depth=3)
+    opened = book.OpeningBook(path)
+    assert len(opened) == count == len(list(book.positions(2)))
+    yield opened
+    opened.close()
+
+
+def test_every_position_is_found(opening_book):
+    for board, color in book.positions(2):
+        assert opening_book.lookup(board.canonical_key(color)[0]) is not None
+    assert opening_book.lookup(0) is None and opening_book.lookup(2 ** 64 - 1) is None
+
+
+def test_probe_matches_search(opening_book):
+    board = GameBoard.start()
+    result = opening_book.probe(board, 'B')
+    searched = engine.Engine(max_depth=3).search(board, 'B')
+
+    assert result.best_move.path == searched.best_move.path
+    assert result.best_move.stone_id == searched.best_move.stone_id
+    assert (result.score, result.depth) == (searched.score, searched.depth)
+
+
+def test_probe_finds_mirrored_positions(opening_book):
+    # The start position with red to move is the mirror of the start position, so it gets the mirrored answer
+    board = GameBoard.start()
+    black = opening_book.probe(board, 'B').best_move
+    red = opening_book.probe(board, 'R').best_move
+
+    assert red.stone_id in range(12, 24)
+    assert red.squares == tuple(31 - square for square in black.squares)
+    assert red in board.legal_moves('R')
+
+
+def test_book_moves_are_played_without_a_searcher(opening_book, monkeypatch):
+    monkeypatch.setattr(services, 'opening_book', opening_book)
+
+    def no_engine(*args, **kwargs):
+        raise AssertionError("An engine was set up for a book move.")
+
+    monkeypatch.setattr(engine, 'Engine', no_engine)
+    board = GameBoard.start()
+    move = board.legal_moves('B')[0]
+
+    result = services.playMove(board, 'B', move.path, move.stone_id)
+
+    assert result.nodes == 0 and result.best_move is not None
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'other.bin'
+    path.write_bytes(b'not a book')
+    with pytest.raises(ValueError):
+        book.OpeningBook(str(path))
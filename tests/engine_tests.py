@@ -0,0 +1,62 @@
+from engine import *
+from structure import GameBoard
+
+
+START_BOARD = [
+    [0, -1, 1, -1, -1, -1, 12, -1],
+    [-1, 2, -1, -1, -1, 14, -1, 13],
+    [3, -1, 4, -1, -1, -1, 15, -1],
+    [-1, 5, -1, -1, -1, 17, -1, 16],
+    [6, -1, 7, -1, -1, -1, 18, -1],
+    [-1, 8, -1, -1, -1, 20, -1, 19],
+    [9, -1, 10, -1, -1, -1, 21, -1],
+    [-1, 11, -1, -1, -1, 23, -1, 22]
+]
+
+
+def test_search_respects_node_budget():
+    gameboard = GameBoard([col[:] for col in START_BOARD])
+
+    result = search(gameboard, 'B', max_nodes=3000)
+
+    assert result.nodes <= 3000
+    assert result.depth >= 1
+    assert result.best_move is result.pv[0]
+    assert result.best_move.path in [m.path for m in gameboard.legal_moves('B')]
+    assert gameboard.to_list() == START_BOARD
+    # The search runs without stone ids, but its moves get those of the board back
+    assert all(move.stone_id != -1 for move in result.pv)
+
+
+def test_search_finds_winning_double_jump():
+    sample_board = [[-1] * 8 for _ in range(8)]
+    sample_board[4][2] = 7
+    sample_board[5][3] = 19
+    sample_board[5][5] = 20
+    sample_board[0][2] = 16
+
+    gameboard = GameBoard(sample_board)
+
+    result = search(gameboard, 'B', max_depth=4)
+
+    assert result.best_move.path == [(4, 2), (6, 4), (4, 6)]
+    assert result.score > 0
+
+
+def test_search_without_moves():
+    sample_board = [[-1] * 8 for _ in range(8)]
+    sample_board[1][7] = 3
+
+    result = search(GameBoard(sample_board), 'B', max_depth=4)
+
+    assert result.best_move is None
+    assert result.score == -WIN
+
+
+def test_search_reports_every_iteration():
+    reported = []
+
+    result = Engine(max_depth=4).search(GameBoard.start(), 'B', on_iteration=reported.append)
+
+    assert [it.depth for it in reported] == [1, 2, 3, 4]
+    assert reported[-1] is result
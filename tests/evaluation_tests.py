@@ -0,0 +1,48 @@
+import random
+
+import pytest
+
+import engine
+import evaluation
+from structure import GameBoard, opponent
+
+
+def random_positions(count, seed=1):
+    rng = random.Random(seed)
+    positions, colors = [], []
+    for _ in range(count):
+        board, color = GameBoard.start(), 'B'
+        for _ in range(rng.randrange(50)):
+            moves = board.legal_moves(color)
+            if not moves:
+                break
+            board.make_move(rng.choice(moves))
+            color = opponent(color)
+        positions.append((board.black, board.red, board.king_mask))
+        colors.append(color)
+    return positions, colors
+
+
+def test_start_position_is_balanced():
+    assert evaluation.evaluate(GameBoard.start(), 'B') == 0
+
+
+@pytest.mark.skipif(evaluation.np is None, reason="NumPy is not installed")
+def test_batch_matches_single_evaluation():
+    positions, colors = random_positions(100)
+
+    batched = evaluation.evaluate_batch(positions, colors)
+
+    assert batched == [evaluation.evaluate(GameBoard.from_bitboards(*position), color)
+                       for position, color in zip(positions, colors)]
+    assert evaluation.board_array(*zip(*positions)).shape == (100, 32)
+
+
+def test_search_with_batched_leaves_agrees():
+    board = GameBoard.start()
+
+    plain = engine.Engine(max_depth=5).search(board, 'B')
+    batched = engine.Engine(max_depth=5, batch_leaves=True).search(board, 'B')
+
+    assert batched.score == plain.score
+    assert [m.path for m in batched.pv] == [m.path for m in plain.pv]
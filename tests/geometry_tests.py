@@ -0,0 +1,30 @@
+import bitboard
+from geometry import *
+
+
+VECTORS = {UP_RIGHT: (1, 1), UP_LEFT: (-1, 1), DOWN_RIGHT: (1, -1), DOWN_LEFT: (-1, -1)}
+
+
+def square_at(col: int, row: int) -> int:
+    return bitboard.SQUARES[col][row] if 0 <= col < 8 and 0 <= row < 8 else -1
+
+
+def test_tables_follow_board_coordinates():
+    for square, (col, row) in enumerate(bitboard.POSITIONS):
+        for direction, (d_col, d_row) in VECTORS.items():
+            assert NEIGHBOURS[direction][square] == square_at(col + d_col, row + d_row)
+            assert LANDINGS[direction][square] == square_at(col + 2 * d_col, row + 2 * d_row)
+
+
+def test_jumped_squares():
+    # Square 8 is (0, 2): it jumps over (1, 3), square 12, to (2, 4), square 17, and steps to square 12
+    assert JUMPED[8 << 5 | 17] == 12 and JUMPED[17 << 5 | 8] == 12
+    assert JUMPED[8 << 5 | 12] == -1 and JUMPED[0 << 5 | 31] == -1
+    assert sum(over != -1 for over in JUMPED) == sum(len(jumps) for jumps in JUMPS['K'])
+
+
+def test_men_move_forward():
+    # Square 13 is (3, 3)
+    assert STEPS['B'][13] == (18, 17) and STEPS['R'][13] == (10, 9)
+    assert set(STEPS['K'][13]) == set(STEPS['B'][13] + STEPS['R'][13])
+    assert JUMPS['B'][28] == () and JUMPS['R'][3] == ()
@@ -0,0 +1,46 @@
+from engine import Engine
+from instrumentation import *
+from structure import GameBoard, Position
+
+
+def test_profile_counts_the_search():
+    gameboard = GameBoard.start()
+    profile = SearchProfile()
+
+    result = Engine(max_depth=5, profile=profile).search(gameboard, 'B')
+
+    assert profile.searches == 1
+    assert profile.nodes == result.nodes
+    assert profile.make_move_calls == result.nodes
+    assert profile.movegen_calls > 0
+    assert 0 < profile.tt_hits <= profile.tt_probes
+    assert sum(profile.cutoffs) > 0
+    assert profile.times['search'] >= profile.times['movegen'] > 0
+    assert type(gameboard) is GameBoard
+
+
+def test_unprofiled_search_uses_plain_position():
+    searched = []
+
+    class Recording(Engine):
+        def _negamax(self, board, *args):
+            searched.append(type(board))
+            return super()._negamax(board, *args)
+
+    Recording(max_depth=2).search(GameBoard.start(), 'B')
+
+    assert set(searched) == {Position}
+
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    profile = SearchProfile()
+    Engine(max_depth=3, profile=profile).search(GameBoard.start(), 'B')
+
+    registry.add_search(profile)
+    registry.count_request('makeMoveEndpoint', 200)
+    text = registry.render({'checkers_game_sessions': ("Game sessions.", 2)})
+
+    assert 'checkers_requests_total{endpoint="makeMoveEndpoint",status="200"} 1' in text
+    assert f'checkers_search_nodes_total {profile.nodes}' in text
+    assert '# TYPE checkers_game_sessions gauge\ncheckers_game_sessions 2' in text
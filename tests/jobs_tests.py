@@ -0,0 +1,137 @@
+import threading
+import time
+
+import pytest
+
+import engine
+from jobs import *
+from structure import GameBoard
+
+
+def test_queue_full_is_rejected():
+    queue = EngineJobQueue(workers=1, max_pending=1)
+    release = threading.Event()
+
+    running = queue.submit(lambda job: release.wait(), timeout=5)
+    waiting = queue.submit(lambda job: 'done', timeout=5)
+
+    with pytest.raises(QueueFull):
+        queue.submit(lambda job: None, timeout=5)
+
+    release.set()
+    assert running.result() is True
+    assert waiting.result() == 'done'
+    assert queue.stats() == {'queued': 0, 'running': 0, 'rejected': 1}
+    queue.shutdown()
+
+
+def test_expired_jobs_are_dropped():
+    queue = EngineJobQueue(workers=1, max_pending=1)
+    release = threading.Event()
+
+    queue.submit(lambda job: release.wait(), timeout=5)
+    expired = queue.submit(lambda job: 'ran', timeout=0.05)
+
+    time.sleep(0.1)
+    release.set()
+
+    with pytest.raises(DeadlineExceeded):
+        expired.result(timeout=1)
+    queue.shutdown()
+
+
+def test_cancel_stops_the_search():
+    queue = EngineJobQueue(workers=1, max_pending=0)
+
+    job = queue.submit(lambda job: engine.search(GameBoard.start(), 'B', stop=job.stop), timeout=60)
+    time.sleep(0.2)
+    job.cancel()
+
+    result = job.result(timeout=2)
+
+    assert result.best_move is not None
+    assert time.monotonic() - job.submitted < 2
+    queue.shutdown()
+
+
+def test_interactive_jobs_run_before_background_ones():
+    queue = EngineJobQueue(workers=1, max_pending=2)
+    release = threading.Event()
+    order = []
+
+    blocking = queue.submit(lambda job: release.wait(), timeout=5)
+    background = queue.submit(lambda job: order.append('background'), timeout=5, priority=BACKGROUND)
+    interactive = queue.submit(lambda job: order.append('interactive'), timeout=5, priority=INTERACTIVE)
+    assert queue.scheduler_stats()['background']['queued'] == 1
+
+    time.sleep(0.05)
+    release.set()
+    for job in (blocking, background, interactive):
+        job.result()
+
+    assert order == ['interactive', 'background']
+    stats = queue.scheduler_stats()
+    assert stats['interactive']['queued'] == stats['background']['queued'] == 0
+    assert stats['background']['wait_max'] >= stats['interactive']['wait_max'] >= 0.05
+    queue.shutdown()
+
+
+def test_searches_share_the_workers():
+    queue = EngineJobQueue(workers=1, max_pending=1, time_slice=0.05)
+
+    def analyse(job):
+        return engine.Engine(time_limit=1.0, stop=job.stop, checkpoint=job.checkpoint).search(GameBoard.start(), 'B')
+
+    def play(job):
+        return engine.Engine(max_depth=3, checkpoint=job.checkpoint).search(GameBoard.start(), 'B')
+
+    analysis = queue.submit(analyse, timeout=5, owner='analysis', priority=BACKGROUND)
+    time.sleep(0.1)
+    move = queue.submit(play, timeout=5, owner='game')
+
+    assert move.result().best_move is not None
+    assert analysis.result().best_move is not None
+    # The move was searched while the analysis waited for its worker back
+    assert move.finished < analysis.finished
+    assert move.started - move.submitted < 0.5
+    assert analysis.turns >= 2 and queue.scheduler_stats()['preempted'] >= 1
+    queue.shutdown()
+
+
+def test_games_of_the_same_priority_take_turns():
+    queue = EngineJobQueue(workers=1, max_pending=1, time_slice=0.02)
+    turns = []
+
+    def search(job):
+        for nodes in range(0, 10_000, 100):
+            time.sleep(0.002)
+            turns.append(job.owner)
+            job.checkpoint(nodes)
+
+    games = [queue.submit(search, timeout=10, owner=owner) for owner in ('a', 'b')]
+    for job in games:
+        job.result()
+
+    # Neither game waits for the other to finish
+    switches = sum(1 for previous, current in zip(turns, turns[1:]) if previous != current)
+    assert switches >= 4
+    assert all(job.turns >= 2 for job in games)
+    queue.shutdown()
+
+
+def test_node_rate_is_limited():
+    queue = EngineJobQueue(workers=2, max_pending=0, max_node_rate=20_000)
+
+    def search(job):
+        for nodes in range(1000, 21_000, 1000):
+            job.checkpoint(nodes)
+
+    started = time.monotonic()
+    searches = [queue.submit(search, timeout=5) for _ in range(2)]
+    for job in searches:
+        job.result()
+
+    # Two searches of 20000 nodes, of which the first 20000 are covered by the initial budget
+    assert time.monotonic() - started >= 0.9
+    assert queue.scheduler_stats()['nodes'] == 40_000
+    queue.shutdown()
@@ -0,0 +1,39 @@
+import bitboard
+import geometry
+from jumps import *
+
+
+def test_sequences_match_uncached_enumeration():
+    cache = JumpCache()
+
+    # A king on square 9 with red stones on 13 and 21 and a double jump over both
+    opponents = (1 << 13) | (1 << 21)
+    empty = bitboard.FULL & ~opponents
+
+    expected = jump_sequences(9, geometry.JUMPS['K'], 0, opponents, empty)
+
+    assert list(cache.sequences(9, 'K', opponents, empty)) == expected
+    assert (9, 18, 25) in expected
+
+
+def test_unrelated_squares_share_entries():
+    cache = JumpCache()
+
+    opponents = 1 << 13
+    empty = bitboard.FULL & ~opponents
+
+    cache.sequences(9, 'B', opponents, empty)
+    # A stone far outside of the region of square 9 does not change the key
+    cache.sequences(9, 'B', opponents | 1, empty & ~1)
+
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = JumpCache(capacity=2)
+
+    for square in (0, 1, 2, 0):
+        cache.sequences(square, 'B', 0, bitboard.FULL)
+
+    assert len(cache) == 2
+    assert (cache.hits, cache.misses) == (0, 4)
@@ -0,0 +1,36 @@
+from parallel import *
+from structure import GameBoard, START_BOARD
+
+
+def test_parallel_search_finds_double_jump():
+    sample_board = [[-1] * 8 for _ in range(8)]
+    sample_board[4][2] = 7
+    sample_board[5][3] = 19
+    sample_board[5][5] = 20
+    sample_board[0][2] = 3
+    sample_board[2][6] = 16
+    sample_board[7][7] = 22
+
+    gameboard = GameBoard(sample_board)
+
+    try:
+        result = parallel_search(gameboard, 'B', workers=2, max_depth=5)
+    finally:
+        shutdown_pools()
+
+    assert result.best_move.path == [(4, 2), (6, 4), (4, 6)]
+    assert result.score > 0
+
+
+def test_parallel_search_merges_shares():
+    gameboard = GameBoard([col[:] for col in START_BOARD])
+
+    try:
+        result = parallel_search(gameboard, 'B', workers=3, max_depth=4)
+    finally:
+        shutdown_pools()
+
+    assert result.depth == 4
+    assert result.best_move.path in [m.path for m in gameboard.legal_moves('B')]
+    assert len(result.pv) >= 1 and result.nodes > 0
+    assert gameboard.to_list() == START_BOARD
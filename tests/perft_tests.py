@@ -0,0 +1,50 @@
+import os
+
+import pytest
+
+from perft import *
+
+# Published node counts of the start position
+START_COUNTS = [7, 49, 302, 1469, 7361, 36768]
+
+# A run is allowed to be this much slower than its recorded baseline before it fails
+NPS_TOLERANCE = float(os.environ.get('PERFT_NPS_TOLERANCE', '0.5'))
+
+BASELINES = load_baselines()
+
+
+def test_start_position_counts():
+    board, color = board_of('start')
+
+    assert [perft(board, color, depth) for depth in range(1, 7)] == START_COUNTS
+    assert board.to_list() == START_BOARD
+
+
+def test_divide_adds_up():
+    board, color = board_of('midgame')
+
+    counts = divide(board, color, 5)
+
+    assert sum(count for _, count in counts) == perft(board, color, 5)
+    assert len(counts) == len(board.legal_moves(color))
+
+
+@pytest.mark.parametrize('name', sorted(BASELINES))
+def test_node_counts_match_baselines(name):
+    board, color = board_of(name)
+    baseline = BASELINES[name]
+
+    assert perft(board, color, baseline['depth']) == baseline['nodes']
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('name', sorted(BASELINES))
+def test_throughput_against_baselines(name):
+    board, color = board_of(name)
+    baseline = BASELINES[name]
+
+    # Best of three, to keep a single slow run from failing the check
+    nps = max(timed_perft(board, color, baseline['depth'])[1] for _ in range(3))
+
+    assert nps >= baseline['nps'] * NPS_TOLERANCE, \
+        f"{name}: {int(nps)} nodes/sec against a baseline of {baseline['nps']} nodes/sec"
@@ -0,0 +1,32 @@
+import json
+import math
+
+from selfplay import *
+
+
+def test_elo_of_even_and_lopsided_scores():
+    assert elo(5, 0, 5)[0] == 0.0
+    difference, low, high = elo(30, 10, 10)
+    assert low < difference < high and difference > 0
+    assert elo(10, 0, 0)[0] == math.inf
+
+
+def test_game_ends_on_repetition_or_ply_limit():
+    game = play_game(openings(1)[0], {'max_depth': 2}, {'max_depth': 2}, max_plies=10)
+
+    assert game['reason'] in ('plies', 'repetition', 'no moves')
+    assert len(game['moves']) <= 10
+    assert all(move['nodes'] > 0 and move['depth'] >= 1 for move in game['moves'])
+
+
+def test_match_streams_games_to_disk(tmp_path):
+    output = str(tmp_path / 'match')
+
+    report = run_match({'max_depth': 2}, {'max_depth': 1}, openings(0), workers=1, output=output, max_plies=16)
+
+    assert report['wins'] + report['draws'] + report['losses'] == 2
+    with open(output + '.jsonl') as file:
+        games = [json.loads(line) for line in file]
+    assert sorted(game['game'] for game in games) == [1, 2]
+    with open(output + '.pdn') as file:
+        assert file.read().count('[Event "Self-play"]') == 2
@@ -0,0 +1,111 @@
+import services
+from cache import ResponseCache
+from services import *
+from structure import START_BOARD, GameBoard
+
+
+def test_batch_results_in_order():
+    games = [
+        {'board': START_BOARD, 'turn': 'B'},
+        {'board': START_BOARD, 'kings': [], 'turn': 'R'},
+        {'board': START_BOARD, 'turn': 'X'},
+        {'board': START_BOARD, 'turn': 'B'},
+    ]
+
+    results = list(getPossMovesBatch(games))
+
+    assert [r['index'] for r in results] == [0, 1, 2, 3]
+    assert len(results[0]['moves']) == 7 and len(results[1]['moves']) == 7
+    assert {m['stone'] for m in results[1]['moves']} == {14, 17, 20, 23}
+    assert 'error' in results[2]
+    # The repeated position is answered from the first computation
+    assert results[3]['moves'] is results[0]['moves']
+
+
+def test_get_poss_moves_of_stone():
+    moves = getPossMoves(START_BOARD, 7, False)['moves']
+
+    assert moves == [[[4, 2], [5, 3]], [[4, 2], [3, 3]]]
+
+
+def test_get_poss_moves_and_make_move_keep_the_other_kings():
+    board = [[-1] * 8 for _ in range(8)]
+    board[1][1], board[3][5], board[4][4] = 0, 1, 12
+
+    assert len(getPossMoves(board, 0, False)['moves']) == 2
+    # Once stone 1 is known to be a king, it has to take backwards and the man can not move
+    assert getPossMoves(board, 0, False, kings=[1])['moves'] == []
+    assert getPossMoves(board, 1, True)['moves'] == [[[3, 5], [5, 3]]]
+
+    state = makeMove(board, 1, False, [[3, 5], [5, 3]], kings=[1])
+    assert 1 in state['kings']
+
+
+def test_cached_legal_moves_take_stone_ids_of_board():
+    services.response_cache.clear()
+    board = GameBoard.start()
+    swapped = GameBoard.from_bitboards(board.black, board.red, board.king_mask)
+
+    first = cachedLegalMoves(board, 'B')
+    again = cachedLegalMoves(swapped, 'B')
+
+    assert services.response_cache.hits == 1
+    assert [m.path for m in again] == [m.path for m in first]
+    assert [m.stone_id for m in again] == [swapped.stone_id_at(m.path[0]) for m in again]
+
+
+def test_cached_legal_moves_of_mirrored_position():
+    services.response_cache.clear()
+    board = GameBoard.start()
+
+    black = cachedLegalMoves(board, 'B')
+    red = cachedLegalMoves(board, 'R')
+
+    assert services.response_cache.hits == 1
+    assert sorted(m.squares for m in red) == sorted(m.squares for m in board.legal_moves('R'))
+    assert sorted(m.squares for m in red) == sorted(tuple(31 - s for s in m.squares) for m in black)
+
+
+def test_cached_search_replays_pv():
+    services.response_cache.clear()
+    board = GameBoard.start()
+
+    searched = cachedSearch(board, 'B', engine.Engine(max_depth=3))
+    cached = cachedSearch(board, 'B', engine.Engine(max_depth=3))
+
+    assert cached.depth == 3 and cached.score == searched.score
+    assert [m.path for m in cached.pv] == [m.path for m in searched.pv]
+    assert cached.best_move.stone_id == searched.best_move.stone_id
+
+
+def test_cached_searches_are_shared_by_callers_with_the_same_budget():
+    services.response_cache.clear()
+    board = GameBoard.start()
+
+    cachedSearch(board, 'B', engine.Engine(max_depth=2))
+    deeper = cachedSearch(board, 'B', engine.Engine(max_depth=4))
+    timed = cachedSearch(board, 'B', engine.Engine(time_limit=0.2))
+    assert deeper.depth == 4 and deeper.nodes > 0 and timed.nodes > 0
+    assert services.response_cache.hits == 0
+
+    # Only lookups that are answered from the cache count as hits
+    again = cachedSearch(board, 'B', engine.Engine(time_limit=0.21))
+    assert again.depth == timed.depth and [m.path for m in again.pv] == [m.path for m in timed.pv]
+    assert cachedSearch(board, 'B', engine.Engine(max_depth=4)).depth == 4
+    assert services.response_cache.hits == 2
+
+
+def test_response_cache_limits(tmp_path):
+    lru = ResponseCache(max_entries=2, ttl=60)
+    for key in (b'a', b'b', b'c'):
+        lru.put(key, key.decode())
+    assert lru.get(b'a') is None and lru.get(b'c') == 'c' and lru.evictions == 1
+
+    expired = ResponseCache(ttl=-1)
+    expired.put(b'a', 1)
+    assert expired.get(b'a') is None
+
+    path = str(tmp_path / 'cache.db')
+    ResponseCache(path=path).put(b'a', {'moves': [[1, 5]]})
+    shared = ResponseCache(path=path)
+    assert shared.get(b'a') == {'moves': [[1, 5]]} and shared.disk_hits == 1
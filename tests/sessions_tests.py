@@ -0,0 +1,50 @@
+import time
+
+import pytest
+
+import services
+from sessions import *
+from structure import GameBoard
+
+
+def test_store_evicts_least_recently_used():
+    store = SessionStore(max_sessions=2)
+    first = store.create(GameBoard.start(), 'B')
+    second = store.create(GameBoard.start(), 'B')
+
+    store.get(first.id)
+    third = store.create(GameBoard.start(), 'B')
+
+    assert len(store) == 2 and store.evicted == 1
+    assert store.get(first.id) is first and store.get(third.id) is third
+    with pytest.raises(LookupError):
+        store.get(second.id)
+
+
+def test_store_evicts_idle_sessions():
+    store = SessionStore(idle_timeout=0.05)
+    session = store.create(GameBoard.start(), 'B')
+
+    time.sleep(0.1)
+
+    with pytest.raises(LookupError):
+        store.get(session.id)
+    with pytest.raises(LookupError):
+        store.remove(session.id)
+
+
+def test_session_keeps_engine_and_expected_line():
+    services.response_cache.clear()
+    session = SessionStore().create(GameBoard.start(), 'B')
+    session.engine.max_depth = 4
+    path = [(2, 2), (3, 3)]
+
+    result = services.playMove(session.board, 'B', path, searcher=session.engine, pv=session.pv_after(path))
+    session.record(result)
+
+    assert result.depth == 4 and session.moves_played == 1
+    assert len(session.engine.tt) > 0
+    assert session.expected == result.pv[1:]
+    if session.expected:
+        assert session.pv_after(session.expected[0].path) == result.pv[2:]
+    assert session.pv_after([(0, 0), (1, 1)]) == []
@@ -1,3 +1,5 @@
+import pytest
+
 from structure import *
 
 def test_make_move_1():
@@ -115,3 +117,290 @@ def test_get_jumps_1():
     moves = gameboard._get_jumps(7)
 
     print([m.path for m in moves])
+
+
+def test_board_round_trip():
+    sample_board = [
+        [0, -1, 1, -1, -1, -1, 12, -1],
+        [-1, 2, -1, -1, -1, 14, -1, 13],
+        [3, -1, 4, -1, -1, -1, 15, -1],
+        [-1, 5, -1, -1, -1, 17, -1, 16],
+        [6, -1, 7, -1, -1, -1, 18, -1],
+        [-1, 8, -1, -1, -1, 20, -1, 19],
+        [9, -1, 10, -1, -1, -1, 21, -1],
+        [-1, 11, -1, -1, -1, 23, -1, 22]
+    ]
+
+    gameboard = GameBoard(sample_board, {7})
+
+    assert gameboard.to_list() == sample_board
+    assert gameboard.location_of(17) == (3, 5)
+    assert gameboard.stone_id_at((6, 2)) == 10
+    assert gameboard.empty_at((3, 3))
+    assert gameboard.king_mask == 1 << 10
+
+
+def test_stone_on_light_square():
+    sample_board = [[-1] * 8 for _ in range(8)]
+    sample_board[0][1] = 0
+
+    with pytest.raises(ValueError):
+        GameBoard(sample_board)
+
+
+def test_make_and_unmake_move():
+    sample_board = [
+        [0, -1, 1, -1, -1, -1, 12, -1],
+        [-1, 2, -1, -1, -1, 14, -1, 13],
+        [3, -1, 4, -1, -1, -1, 15, -1],
+        [-1, 5, -1, -1, -1, 17, -1, 16],
+        [6, -1, 7, -1, -1, -1, -1, -1],
+        [-1, 8, -1, 19, -1, 20, -1, 18],
+        [9, -1, 10, -1, -1, -1, 21, -1],
+        [-1, 11, -1, -1, -1, 23, -1, 22]
+    ]
+
+    gameboard = GameBoard(sample_board, {19})
+    state = (gameboard.black, gameboard.red, gameboard.king_mask, set(gameboard.kings))
+
+    undo = gameboard.make_move(Move(7, [(4, 2), (6, 4), (4, 6)]))
+
+    assert gameboard.stone_id_at((4, 6)) == 7
+    assert gameboard.empty_at((5, 3)) and gameboard.empty_at((5, 5))
+
+    gameboard.unmake_move(undo)
+
+    assert gameboard.to_list() == sample_board
+    assert (gameboard.black, gameboard.red, gameboard.king_mask, gameboard.kings) == state
+
+
+def test_make_move_promotes():
+    sample_board = [[-1] * 8 for _ in range(8)]
+    sample_board[2][6] = 4
+    sample_board[5][1] = 15
+
+    gameboard = GameBoard(sample_board)
+
+    undo_black = gameboard.make_move(Move(4, [(2, 6), (3, 7)]))
+    undo_red = gameboard.make_move(Move(15, [(5, 1), (4, 0)]))
+
+    assert gameboard.kings == {4, 15}
+    assert gameboard.king_mask == (1 << 29) | (1 << 2)
+
+    gameboard.unmake_move(undo_red)
+    gameboard.unmake_move(undo_black)
+
+    assert gameboard.kings == set()
+    assert gameboard.king_mask == 0
+
+
+def test_location_of_captured_stone():
+    sample_board = [
+        [0, -1, 1, -1, -1, -1, 12, -1],
+        [-1, 2, -1, -1, -1, 14, -1, 13],
+        [3, -1, 4, -1, -1, -1, 15, -1],
+        [-1, 5, -1, -1, -1, 17, -1, 16],
+        [6, -1, 7, -1, -1, -1, -1, -1],
+        [-1, 8, -1, 19, -1, 20, -1, 18],
+        [9, -1, 10, -1, -1, -1, 21, -1],
+        [-1, 11, -1, -1, -1, 23, -1, 22]
+    ]
+
+    gameboard = GameBoard(sample_board)
+
+    undo = gameboard.make_move(Move(7, [(4, 2), (6, 4), (4, 6)]))
+
+    assert gameboard.location_of(7) == (4, 6)
+    with pytest.raises(LookupError):
+        gameboard.location_of(19)
+
+    gameboard.unmake_move(undo)
+
+    assert gameboard.location_of(19) == (5, 3)
+    assert gameboard.location_of(7) == (4, 2)
+
+
+def test_legal_moves_start_position():
+    sample_board = [
+        [0, -1, 1, -1, -1, -1, 12, -1],
+        [-1, 2, -1, -1, -1, 14, -1, 13],
+        [3, -1, 4, -1, -1, -1, 15, -1],
+        [-1, 5, -1, -1, -1, 17, -1, 16],
+        [6, -1, 7, -1, -1, -1, 18, -1],
+        [-1, 8, -1, -1, -1, 20, -1, 19],
+        [9, -1, 10, -1, -1, -1, 21, -1],
+        [-1, 11, -1, -1, -1, 23, -1, 22]
+    ]
+
+    gameboard = GameBoard(sample_board)
+
+    black_moves = gameboard.legal_moves('B')
+    red_moves = gameboard.legal_moves('R')
+
+    assert len(black_moves) == 7 and len(red_moves) == 7
+    assert {m.stone_id for m in black_moves} == {1, 4, 7, 10}
+    assert not any(m.jumper for m in black_moves + red_moves)
+
+
+def test_legal_moves_forced_capture():
+    sample_board = [
+        [0, -1, 1, -1, -1, -1, 12, -1],
+        [-1, 2, -1, -1, -1, 14, -1, 13],
+        [3, -1, 4, -1, -1, -1, 15, -1],
+        [-1, 5, -1, -1, -1, 17, -1, 16],
+        [6, -1, 7, -1, -1, -1, -1, -1],
+        [-1, 8, -1, 19, -1, 20, -1, 18],
+        [9, -1, 10, -1, -1, -1, 21, -1],
+        [-1, 11, -1, -1, -1, 23, -1, 22]
+    ]
+
+    gameboard = GameBoard(sample_board)
+
+    moves = gameboard.legal_moves('B')
+
+    # Only complete jump sequences are legal: neither the first hop of stone 7 nor any plain move
+    assert sorted((m.stone_id, m.path) for m in moves) == [
+        (7, [(4, 2), (6, 4), (4, 6)]),
+        (10, [(6, 2), (4, 4)]),
+    ]
+
+
+def test_legal_moves_king_jumps_backwards():
+    sample_board = [[-1] * 8 for _ in range(8)]
+    sample_board[3][3] = 5
+    sample_board[2][2] = 14
+    sample_board[4][4] = 15
+
+    gameboard = GameBoard(sample_board, {5})
+
+    paths = sorted(m.path for m in gameboard.legal_moves('B'))
+
+    assert paths == [[(3, 3), (1, 1)], [(3, 3), (5, 5)]]
+
+
+def test_hash_follows_moves():
+    sample_board = [
+        [0, -1, 1, -1, -1, -1, 12, -1],
+        [-1, 2, -1, -1, -1, 14, -1, 13],
+        [3, -1, 4, -1, -1, -1, 15, -1],
+        [-1, 5, -1, -1, -1, 17, -1, 16],
+        [6, -1, 7, -1, -1, -1, -1, -1],
+        [-1, 8, -1, 19, -1, 20, -1, 18],
+        [9, -1, 10, -1, -1, -1, 21, -1],
+        [-1, 11, -1, -1, -1, 23, -1, 22]
+    ]
+
+    gameboard = GameBoard(sample_board)
+    initial_hash = gameboard.hash
+
+    undo = gameboard.make_move(Move(7, [(4, 2), (6, 4), (4, 6)]))
+
+    assert gameboard.hash != initial_hash
+    assert gameboard.hash == GameBoard(gameboard.to_list()).hash
+
+    gameboard.unmake_move(undo)
+
+    assert gameboard.hash == initial_hash
+    assert gameboard.key('B') != gameboard.key('R')
+
+
+def test_mirrored_position_shares_canonical_key():
+    gameboard, color = GameBoard.from_fen('W:W18,K27,32:BK1,5,14')
+    mirrored = gameboard.mirrored()
+
+    assert mirrored.to_fen('B') == 'B:W19,28,K32:B1,K6,15'
+    assert mirrored.hash == gameboard.mirror_hash and mirrored.mirror_hash == gameboard.hash
+    assert gameboard.canonical_key(color)[0] == mirrored.canonical_key('B')[0]
+    assert gameboard.canonical_key(color)[1] != mirrored.canonical_key('B')[1]
+    assert gameboard.canonical_bytes(color)[0] == mirrored.canonical_bytes('B')[0]
+
+    undo = gameboard.make_move(gameboard.legal_moves(color)[0])
+    assert gameboard.mirror_hash == gameboard.mirrored().hash
+    gameboard.unmake_move(undo)
+    assert gameboard.mirror_hash == mirrored.hash
+
+
+def test_position_follows_board_without_ids():
+    gameboard, color = GameBoard.from_fen('B:W18,22,K27:B9,K14,15')
+    position = gameboard.position()
+
+    assert type(position) is Position
+    assert [m.key for m in position.legal_moves(color)] == [m.key for m in gameboard.legal_moves(color)]
+    assert {m.stone_id for m in position.legal_moves(color)} == {-1}
+
+    move = position.legal_moves(color)[0]
+    assert gameboard.move_of(move).stone_id == gameboard.stone_id_at(move.path[0])
+
+    undo = position.make_move(move)
+    gameboard.make_move(gameboard.move_of(move))
+    assert (position.black, position.red, position.king_mask) == (gameboard.black, gameboard.red, gameboard.king_mask)
+    assert (position.hash, position.mirror_hash) == (gameboard.hash, gameboard.mirror_hash)
+
+    position.unmake_move(undo)
+    assert position.to_fen(color) == 'B:W18,22,K27:B9,K14,15'
+    assert position.hash == Position.from_fen('B:W18,22,K27:B9,K14,15')[0].hash
+
+
+def test_fen_round_trip():
+    gameboard, color = GameBoard.from_fen('W:W18,K27,32:BK1,5,14')
+
+    assert color == 'R'
+    assert gameboard.stone_id_at((0, 0)) in BLACK and gameboard.stone_id_at((0, 0)) in gameboard.kings
+    assert gameboard.stone_id_at((2, 4)) in RED
+    assert gameboard.to_fen(color) == 'W:W18,K27,32:BK1,5,14'
+
+    with pytest.raises(ValueError):
+        GameBoard.from_fen('B:W18:X5')
+
+
+def test_bytes_round_trip():
+    gameboard = GameBoard(START_BOARD, {7, 20})
+
+    data = gameboard.to_bytes('R')
+    unpacked, color = GameBoard.from_bytes(data)
+
+    assert len(data) == 16
+    assert color == 'R'
+    assert (unpacked.black, unpacked.red, unpacked.king_mask) == \
+           (gameboard.black, gameboard.red, gameboard.king_mask)
+    assert unpacked.to_bytes('R') == data
+
+
+def test_pdn_moves():
+    gameboard = GameBoard.start()
+
+    assert sorted(m.to_pdn() for m in gameboard.legal_moves('B')) == \
+           ['10-13', '10-14', '11-14', '11-15', '12-15', '12-16', '9-13']
+    assert path_from_pdn('9x18x27') == [(0, 2), (2, 4), (4, 6)]
+
+
+def test_jumpers_and_steppers():
+    gameboard, color = GameBoard.from_fen('B:W13:B9,1')
+
+    assert gameboard.jumpers('B') == 1 << 8
+    # The stone on 9 is blocked by the red stone it can jump
+    assert gameboard.steppers('B') == 1 << 0
+    assert gameboard.jumpers('R') == 0
+    assert {m.stone_id for m in gameboard.legal_moves('B')} == {gameboard.stone_id_at((0, 2))}
+
+
+def test_move_packs_captures_and_promotion():
+    jump = Move(7, [(4, 2), (6, 4), (4, 6)])
+    assert jump.jumper and jump.squares == (10, 19, 26)
+    assert jump.get_conquered_stones() == {(5, 3), (5, 5)}
+    assert jump.captured == (1 << 14) | (1 << 22)
+    assert jump.to_list() == [[4, 2], [6, 4], [4, 6]] and jump.to_pdn() == '11x20x27'
+    assert not hasattr(jump, '__dict__')
+
+    gameboard, color = GameBoard.from_fen('B:WK6:B25')
+    promoting = [m for m in gameboard.legal_moves('B')]
+    assert all(m.promotes for m in promoting)
+    assert promoting[0] == Move.of_squares(gameboard.stone_id_at(promoting[0].path[0]), promoting[0].squares, True)
+    # A king that reaches the far row is not promoted again
+    assert not any(m.promotes for m in gameboard.legal_moves('R'))
+
+    # A move built from its path is the legal move, whether or not that one promotes
+    gameboard, color = GameBoard.from_fen('B:W1:B25')
+    built = Move(0, gameboard.legal_moves('B')[0].path)
+    assert built == gameboard.legal_moves('B')[0] and built in gameboard.legal_moves('B')
+    assert built in set(gameboard.legal_moves('B'))
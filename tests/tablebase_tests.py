@@ -0,0 +1,69 @@
+import pytest
+
+import engine
+import tablebase
+from structure import GameBoard, opponent
+
+
+@pytest.fixture(scope='module')
+def endgame(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('tablebase') / 'endgame.tb')
+    tablebase.build(path, max_pieces=2)
+    opened = tablebase.Tablebase(path)
+    yield opened
+    opened.close()
+
+
+def test_ranks_are_distinct_and_in_range():
+    material = (1, 1, 0, 1)
+    ranks = {tablebase.rank(*position) for position in tablebase._positions(material)}
+
+    assert len(ranks) == len(list(tablebase._positions(material)))
+    assert max(ranks) < tablebase.class_size(material)
+
+
+def test_outcomes_follow_from_moves(endgame):
+    assert endgame.max_pieces == 2
+
+    for material in tablebase.materials(2):
+        for black, red, king_mask in list(tablebase._positions(material))[::7]:
+            board = GameBoard.from_bitboards(black, red, king_mask)
+            for color in ('B', 'R'):
+                value, distance = endgame.probe(board, color)
+                children = []
+                for move in board.legal_moves(color):
+                    undo = board.make_move(move)
+                    children.append(endgame.probe(board, opponent(color)))
+                    board.unmake_move(undo)
+
+                if not children:
+                    assert (value, distance) == (tablebase.LOSS, 0)
+                elif value == tablebase.WIN:
+                    assert (tablebase.LOSS, distance - 1) in children
+                elif value == tablebase.LOSS:
+                    assert all(child[0] == tablebase.WIN and child[1] < distance for child in children)
+                else:
+                    assert tablebase.LOSS not in (child[0] for child in children)
+                    assert not all(child[0] == tablebase.WIN for child in children)
+
+
+def test_engine_scores_won_endgame_from_tablebase(endgame):
+    # The first black king against a red man that black wins, but not straight away
+    board, color = next(
+        (board, 'B') for board in (GameBoard.from_bitboards(*position)
+                                   for position in tablebase._positions((0, 1, 1, 0)))
+        if endgame.probe(board, 'B')[0] == tablebase.WIN and endgame.probe(board, 'B')[1] >= 3)
+    value, distance = endgame.probe(board, color)
+
+    result = engine.Engine(max_depth=2, tablebase=endgame).search(board, color)
+
+    assert result.score == engine.WIN - 1 - (distance - 1)
+    assert result.best_move.path == endgame.best_move(board, color).path
+
+
+def test_men_on_their_promotion_row_are_not_covered(endgame):
+    # A black man on the top row against a red king, as the API accepts it
+    board, color = GameBoard.from_fen('W:WK6:B30')
+
+    assert endgame.probe(board, 'B') is None and endgame.probe(board, 'R') is None
+    assert engine.Engine(max_depth=3, tablebase=endgame).search(board, color).best_move is not None
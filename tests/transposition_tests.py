@@ -0,0 +1,43 @@
+from transposition import *
+
+
+def test_memory_cap():
+    table = TranspositionTable(max_bytes=1000)
+
+    assert table.size_bytes <= 1000
+    assert table.slots == 32
+
+
+def test_store_and_probe():
+    table = TranspositionTable(max_bytes=1024)
+
+    table.store(0x1234_5678_9ABC_DEF0, 5, -42, LOWER, 3)
+
+    assert table.probe(0x1234_5678_9ABC_DEF0) == (5, -42, LOWER, 3)
+    assert table.probe(0x0FED_CBA9_8765_4321) is None
+    assert (table.probes, table.hits) == (2, 1)
+
+
+def test_deep_entries_survive_shallow_ones():
+    table = TranspositionTable(max_bytes=64)
+
+    # With two buckets every even key lands in the same one
+    table.store(2, 9, 100, EXACT)
+    table.store(4, 1, 200, EXACT)
+    table.store(6, 2, 300, UPPER)
+
+    assert table.probe(2) == (9, 100, EXACT, NO_MOVE)
+    assert table.probe(4) is None
+    assert table.probe(6) == (2, 300, UPPER, NO_MOVE)
+
+    table.store(8, 12, 400, EXACT)
+
+    assert table.probe(8) == (12, 400, EXACT, NO_MOVE)
+    assert table.probe(2) == (9, 100, EXACT, NO_MOVE)
+
+
+def test_mirror_move():
+    # 11-15 from square 10 to 14 is 22-18 from 21 to 17 on the rotated board
+    assert mirror_move(10 | 14 << 5) == 21 | 17 << 5
+    assert mirror_move(mirror_move(10 | 14 << 5)) == 10 | 14 << 5
+    assert mirror_move(NO_MOVE) == NO_MOVE
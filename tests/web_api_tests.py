@@ -0,0 +1,50 @@
+import time
+
+import services
+import web_api
+
+
+def test_move_past_the_deadline_is_not_played(monkeypatch):
+    monkeypatch.setattr(web_api, 'REQUEST_DEADLINE', 0.3)
+    play_move = services.playMove
+
+    def slow_play_move(*args, **kwargs):
+        time.sleep(0.4)
+        return play_move(*args, **kwargs)
+
+    monkeypatch.setattr(services, 'playMove', slow_play_move)
+    client = web_api.app.test_client()
+    game = client.post('/games', json={}).get_json()
+
+    response = client.post(f"/games/{game['id']}/move", json={'move': '9-13'})
+
+    assert response.status_code == 503
+    assert client.get(f"/games/{game['id']}").get_json()['movesPlayed'] == 0
+
+
+def test_move_waiting_for_another_one_is_not_played(monkeypatch):
+    monkeypatch.setattr(web_api, 'REQUEST_DEADLINE', 0.3)
+    client = web_api.app.test_client()
+    game = client.post('/games', json={}).get_json()
+
+    session = web_api.game_sessions.get(game['id'])
+    with session.lock:
+        response = client.post(f"/games/{game['id']}/move", json={'move': '9-13'})
+
+    assert response.status_code == 503
+    assert web_api.engine_jobs.stats()['queued'] == 0
+    assert client.get(f"/games/{game['id']}").get_json()['movesPlayed'] == 0
+
+
+def test_malformed_moves_are_rejected():
+    client = web_api.app.test_client()
+    game = client.post('/games', json={}).get_json()
+
+    for move in (5, [5, 6], [[2, 2]], [[2, 2], [3, 'x']]):
+        response = client.post(f"/games/{game['id']}/move", json={'move': move})
+        assert response.status_code == 400 and 'error' in response.get_json()
+
+    response = client.get('/makeMove', json={'board': game['board'], 'stone': {'id': 7, 'isKing': False},
+                                              'move': {'from': [4, 2]}})
+    assert response.status_code == 400
+    assert client.get(f"/games/{game['id']}").get_json()['movesPlayed'] == 0
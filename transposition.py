@@ -0,0 +1,126 @@
+"""
+A fixed-size transposition table for the search.
+
+The table is a pair of flat arrays of 64-bit words (keys and packed entries) whose size is derived from a memory cap,
+so it never grows past the memory it was given. Slots are grouped into buckets of two: the first slot of a bucket
+keeps the deepest entry seen for it and the second is always replaced, so deep results survive while recent shallow
+ones are still kept.
+
+Positions are stored under Position.canonical_key(), which a position shares with its mirror, so best moves are kept
+as their origin and final squares (the low 10 bits of Move.key) rather than as an index into the position's move list:
+the squares of a move of the mirror are turned into those of the position with mirror_move().
+"""
+from __future__ import annotations
+
+from array import array
+
+EXACT = 1
+LOWER = 2  # the score is a lower bound (the search failed high)
+UPPER = 3  # the score is an upper bound (the search failed low)
+
+# Origin and final square 31, which no move has, and which is left as it is by mirror_move()
+NO_MOVE = 0x3FF
+
+# The bytes taken by one slot: a 64-bit key and a 64-bit packed entry
+SLOT_BYTES = 16
+
+DEFAULT_MAX_BYTES = 8 * 1024 * 1024
+
+_SCORE_OFFSET = 1 << 23
+_SCORE_SHIFT = 20
+_DEPTH_SHIFT = 12
+_BOUND_SHIFT = 10
+
+
+def mirror_move(move: int) -> int:
+    """
+    Turns the origin and final squares of a move into those of the same move on the board rotated by 180 degrees.
+    """
+    # 31 - square flips the 5 bits of each square
+    return move if move == NO_MOVE else move ^ 0x3FF
+
+
+class TranspositionTable:
+    """
+    Stores, per position key, the depth a position was searched to, its score and bound type and the origin and final
+    squares of its best move.
+    """
+    max_bytes: int
+    probes: int
+    hits: int
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        slots = 2
+        while slots * 2 * SLOT_BYTES <= max_bytes:
+            slots *= 2
+
+        self.max_bytes = max_bytes
+        self._mask = slots // 2 - 1
+        self._keys = array('Q', bytes(8 * slots))
+        self._entries = array('Q', bytes(8 * slots))
+
+        self.probes = 0
+        self.hits = 0
+
+    def __len__(self) -> int:
+        """
+        The number of slots in use.
+        """
+        return sum(1 for entry in self._entries if entry)
+
+    @property
+    def slots(self) -> int:
+        return len(self._keys)
+
+    @property
+    def size_bytes(self) -> int:
+        return self.slots * SLOT_BYTES
+
+    def clear(self):
+        self._keys = array('Q', bytes(8 * self.slots))
+        self._entries = array('Q', bytes(8 * self.slots))
+        self.probes = 0
+        self.hits = 0
+
+    def probe(self, key: int) -> tuple[int, int, int, int] | None:
+        """
+        Returns the (depth, score, bound, move) stored for the key, or None if it is not in the table. The move is
+        NO_MOVE when no best move is known.
+        """
+        self.probes += 1
+        slot = (key & self._mask) << 1
+        keys = self._keys
+
+        if keys[slot] == key:
+            entry = self._entries[slot]
+        elif keys[slot + 1] == key:
+            entry = self._entries[slot + 1]
+        else:
+            return None
+
+        if not entry:
+            return None
+
+        self.hits += 1
+        return ((entry >> _DEPTH_SHIFT) & 0xFF, (entry >> _SCORE_SHIFT) - _SCORE_OFFSET,
+                (entry >> _BOUND_SHIFT) & 0x3, entry & 0x3FF)
+
+    def store(self, key: int, depth: int, score: int, bound: int, move: int = NO_MOVE):
+        slot = (key & self._mask) << 1
+        keys = self._keys
+        entries = self._entries
+
+        entry = ((score + _SCORE_OFFSET) << _SCORE_SHIFT) | (min(depth, 0xFF) << _DEPTH_SHIFT) | \
+            (bound << _BOUND_SHIFT) | (move & 0x3FF)
+
+        deepest = entries[slot]
+        if keys[slot] == key or not deepest or depth >= (deepest >> _DEPTH_SHIFT) & 0xFF:
+            if keys[slot] != key and deepest:
+                # The entry that is pushed out of the depth-preferred slot gets a second life in the other one
+                keys[slot + 1] = keys[slot]
+                entries[slot + 1] = deepest
+            keys[slot] = key
+            entries[slot] = entry
+        else:
+            keys[slot + 1] = key
+            entries[slot + 1] = entry
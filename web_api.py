@@ -1,40 +1,485 @@
-from flask import Flask, request
+import json
+import queue
+import threading
+import uuid
 
+from flask import Flask, Response, request, stream_with_context
+
+import instrumentation
+import jobs
 import services
+import sessions
+from structure import GameBoard, colorOf, path_from_list, path_from_pdn
 
 app = Flask(__name__)
 
+# Searches run on a bounded pool of engine workers; requests beyond its queue are turned away with a 429. The moves of
+# games are searched ahead of analyses, and the nodes searched by all of them per second can be capped
+ENGINE_WORKERS = 4
+MAX_PENDING_JOBS = 16
+ENGINE_NODE_RATE = None
+engine_jobs = jobs.EngineJobQueue(ENGINE_WORKERS, MAX_PENDING_JOBS, max_node_rate=ENGINE_NODE_RATE)
+
+# How long, in seconds, a request may take from the moment it is queued until its answer is ready
+REQUEST_DEADLINE = services.SEARCH_TIME_LIMIT + 1.0
+
+# How long, in seconds, a request waits for a job it stopped at its deadline to end
+JOB_STOP_TIMEOUT = 1.0
+
+# Games kept on the server, and how long, in seconds, one is kept once its client stops playing
+MAX_SESSIONS = 1000
+SESSION_IDLE_TIMEOUT = 30 * 60
+game_sessions = sessions.SessionStore(MAX_SESSIONS, SESSION_IDLE_TIMEOUT)
+
+# The analyses that are running, by id, so that a client can stop one from another request
+running_analyses = {}
+running_analyses_lock = threading.Lock()
+
+# Batches with more games than this are streamed back as JSON lines
+BATCH_STREAM_THRESHOLD = 32
+
+# The compact position formats, negotiated through the Content-Type and Accept headers
+FEN_MIMETYPE = 'application/x-pdn-fen'
+BINARY_MIMETYPE = 'application/x-checkers-position'
+
+
+def compactPosition():
+    """
+    Returns the (gameboard, side to move) of a request whose body is a position in a compact format, or None when the
+    body is JSON.
+    """
+    if request.mimetype == FEN_MIMETYPE:
+        return GameBoard.from_fen(request.get_data(as_text=True))
+    if request.mimetype == BINARY_MIMETYPE:
+        return GameBoard.from_bytes(request.get_data())
+    return None
+
+
+def debugRequested() -> bool:
+    return request.args.get('debug') in ('1', 'true')
+
+
+@app.after_request
+def countRequest(response):
+    instrumentation.REGISTRY.count_request(request.endpoint or 'unknown', response.status_code)
+    return response
+
+
+def runEngineJob(fn, owner):
+    """
+    Runs fn(job) on the engine job queue, as an interactive job of the owner (the game it plays in), and waits for its
+    result within REQUEST_DEADLINE. Returns the result, or an error response: 429 when the queue is full, 503 when the
+    deadline passes and 400 for a ValueError of the job.
+
+    The job is cancelled whenever the handler stops waiting for it, so that its search does not outlive the request.
+    At the deadline, the handler waits for the cancelled job to end: a job that got its answer in the meantime (e.g.
+    played its move) still returns it, so that an error always means the job did nothing.
+    """
+    try:
+        job = engine_jobs.submit(fn, REQUEST_DEADLINE, owner, jobs.INTERACTIVE)
+    except jobs.QueueFull as e:
+        return {'error': str(e)}, 429, {'Retry-After': '1'}
+
+    try:
+        try:
+            return job.result()
+        except jobs.DeadlineExceeded:
+            job.cancel()
+            return job.result(JOB_STOP_TIMEOUT)
+    except (jobs.DeadlineExceeded, jobs.JobCancelled) as e:
+        return {'error': str(e)}, 503
+    except ValueError as e:
+        return {'error': str(e)}, 400
+    finally:
+        job.cancel()
+
+
+def stateResponse(gameboard, color, result, profile=None):
+    """
+    Answers with the position after a move in the format the client accepts: JSON by default, or the compact FEN or
+    binary position with the engine's move and score in the X-Engine-Move and X-Engine-Score headers. A JSON answer
+    holds the profile of the search in a 'debug' block when one is given.
+    """
+    mimetype = request.accept_mimetypes.best_match(['application/json', FEN_MIMETYPE, BINARY_MIMETYPE])
+
+    if mimetype not in (FEN_MIMETYPE, BINARY_MIMETYPE):
+        state = services.gameState(gameboard, result)
+        if profile is not None and debugRequested():
+            state['debug'] = profile.to_dict()
+        return state
+
+    headers = {'X-Engine-Score': str(result.score)}
+    if result.best_move is not None:
+        headers['X-Engine-Move'] = result.best_move.to_pdn()
+
+    if mimetype == FEN_MIMETYPE:
+        return Response(gameboard.to_fen(color), mimetype=FEN_MIMETYPE, headers=headers)
+    return Response(gameboard.to_bytes(color), mimetype=BINARY_MIMETYPE, headers=headers)
+
 
 @app.route("/getPossMoves", methods=['GET'])
 def getPossMovesEndpoint():
     """
-    Expects a JSON body consisting of: the gameboard, the player_id, whether the player is a king
+    Expects a JSON body consisting of: the gameboard, the player_id, whether the player is a king, and optionally the
+    ids of the other 'kings' on the board
+
+    Alternatively the body can be a position in PDN FEN (application/x-pdn-fen) or packed binary
+    (application/x-checkers-position) form, in which case the moves of the side to move are returned, or only those
+    of the stone given by the 'stone' query parameter.
 
     :return:
     """
+    try:
+        position = compactPosition()
+    except ValueError as e:
+        return {'error': str(e)}, 400
+
+    if position is not None:
+        gameboard, color = position
+        return services.legalMoves(gameboard, color, request.args.get('stone', type=int))
+
     json_dict = request.get_json()
 
     board = json_dict['board']
     stone = json_dict['stone']  # this contains the id of the stone and whether it is a king or not
 
-    poss_moves = services.getPossMoves(board, stone['id'], stone['isKing'])
+    poss_moves = services.getPossMoves(board, stone['id'], stone['isKing'], json_dict.get('kings'))
 
     return poss_moves
 
 
+@app.route("/getPossMovesBatch", methods=['GET', 'POST'])
+def getPossMovesBatchEndpoint():
+    """
+    Expects a JSON body with a list of 'games', each consisting of: the gameboard, the ids of its kings and the side to
+    move ('B' or 'R').
+
+    :return: the legal moves of every game. Large batches are streamed as one JSON line per game, in the same order.
+    """
+    json_dict = request.get_json()
+
+    games = json_dict['games']
+    results = services.getPossMovesBatch(games)
+
+    if len(games) > BATCH_STREAM_THRESHOLD:
+        lines = (json.dumps(result) + '\n' for result in results)
+        return Response(stream_with_context(lines), mimetype='application/x-ndjson')
+
+    return {'results': list(results)}
+
+
 @app.route("/makeMove", methods=['GET'])
 def makeMoveEndpoint():
     """
-    Expects a JSON body consisting of: the gameboard, the player_id, whether the player is a king
+    Expects a JSON body consisting of: the gameboard, the player_id, whether the player is a king, and optionally the
+    ids of the other 'kings' on the board
+
+    Alternatively the body can be a position in PDN FEN or packed binary form (see getPossMovesEndpoint), with the
+    move of the side to move in PDN notation in the 'move' query parameter. The response is a compact position too
+    when the Accept header asks for one. With ?debug=1, a JSON response holds the profile of the engine's search.
 
     :return:
     """
-    json_dict = request.get_json()
+    try:
+        position = compactPosition()
+
+        if position is not None:
+            gameboard, color = position
+            if 'move' not in request.args:
+                raise ValueError("The 'move' query parameter is missing.")
+            path = path_from_pdn(request.args['move'])
+            stone_id = None
+        else:
+            json_dict = request.get_json()
+
+            board = json_dict['board']
+            stone = json_dict['stone']  # this contains the id of the stone and whether it is a king or not
+            path = path_from_list(json_dict['move'])
+
+            gameboard = GameBoard(board, services.kingsOf(stone['id'], stone['isKing'], json_dict.get('kings')))
+            color = colorOf(stone['id'])
+            stone_id = stone['id']
+    except ValueError as e:
+        return {'error': str(e)}, 400
+
+    profile = services.newProfile(debugRequested())
+
+    def play(job):
+        # The search gets whatever is left of the deadline once the job leaves the queue, minus a margin to answer
+        time_limit = min(services.SEARCH_TIME_LIMIT, job.remaining() * 0.9)
+        return services.playMove(gameboard, color, path, stone_id, time_limit=time_limit, stop=job.stop,
+                                 profile=profile, checkpoint=job.checkpoint)
+
+    # Stateless games are told apart by their client
+    result = runEngineJob(play, request.remote_addr)
+    if isinstance(result, tuple):
+        return result
+
+    return stateResponse(gameboard, color, result, profile)
+
+
+def sessionState(session, result=None):
+    state = services.gameState(session.board, result)
+    state['id'] = session.id
+    state['color'] = session.color
+    state['movesPlayed'] = session.moves_played
+    return state
+
+
+def requestPosition():
+    """
+    Returns the (gameboard, side to move) of a request whose body is a compact position, or JSON with the 'board', the
+    ids of its 'kings' and the side to move as 'turn'.
+    """
+    position = compactPosition()
+    if position is None:
+        json_dict = request.get_json()
+        position = GameBoard(json_dict['board'], set(json_dict.get('kings') or [])), json_dict['turn']
+    if position[1] not in ('B', 'R'):
+        raise ValueError(f"{position[1]} is not a side to move, expected 'B' or 'R'.")
+    return position
+
+
+@app.route("/analyze", methods=['GET', 'POST'])
+def analyzeEndpoint():
+    """
+    Expects the position as for the endgame endpoint. The 'time' (in seconds, at most services.ANALYSIS_TIME_LIMIT)
+    and 'depth' query parameters bound the search.
+
+    :return: a stream with the best move, score, PV, depth, nodes and nps of every completed depth, as server-sent
+    events when the client accepts text/event-stream and as JSON lines otherwise. The first message holds the id of
+    the analysis, which stops when the client disconnects or sends DELETE /analyze/<id>. The last one is marked done.
+    """
+    try:
+        gameboard, color = requestPosition()
+        time_limit = min(request.args.get('time', services.ANALYSIS_TIME_LIMIT, type=float),
+                         services.ANALYSIS_TIME_LIMIT)
+        max_depth = request.args.get('depth', services.engine.MAX_DEPTH, type=int)
+    except (KeyError, TypeError, ValueError) as e:
+        return {'error': str(e)}, 400
+
+    updates = queue.Queue()
+
+    def analyze(job):
+        try:
+            result = services.analyzePosition(gameboard, color, lambda it: updates.put(('iteration', it.to_dict())),
+                                              time_limit, max_depth, job.stop, job.checkpoint)
+            updates.put(('done', result.to_dict()))
+        except Exception as e:
+            updates.put(('error', {'error': str(e)}))
+
+    analysis_id = uuid.uuid4().hex
+    try:
+        job = engine_jobs.submit(analyze, time_limit + 1.0, analysis_id, jobs.BACKGROUND)
+    except jobs.QueueFull as e:
+        return {'error': str(e)}, 429, {'Retry-After': '1'}
+
+    with running_analyses_lock:
+        running_analyses[analysis_id] = job
+
+    server_sent = request.accept_mimetypes.best_match(['application/x-ndjson', 'text/event-stream']) == \
+        'text/event-stream'
+
+    def message(event, data):
+        if server_sent:
+            return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        return json.dumps({'event': event, **data}) + '\n'
+
+    def stream():
+        # Closing the response, e.g. when the client disconnects, raises GeneratorExit here and cancels the search
+        try:
+            yield message('start', {'id': analysis_id})
+            while True:
+                try:
+                    event, data = updates.get(timeout=max(job.remaining(), 0.1))
+                except queue.Empty:
+                    yield message('error', {'error': "The analysis did not finish before its deadline."})
+                    return
+                yield message(event, data)
+                if event != 'iteration':
+                    return
+        finally:
+            job.cancel()
+            with running_analyses_lock:
+                running_analyses.pop(analysis_id, None)
+
+    return Response(stream_with_context(stream()),
+                    mimetype='text/event-stream' if server_sent else 'application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache'})
+
+
+@app.route("/analyze/<analysis_id>", methods=['DELETE'])
+def stopAnalysisEndpoint(analysis_id):
+    with running_analyses_lock:
+        job = running_analyses.get(analysis_id)
+    if job is None:
+        return {'error': f"There is no running analysis with id {analysis_id}."}, 404
+    job.cancel()
+    return '', 204
+
+
+@app.route("/games", methods=['POST'])
+def createGameEndpoint():
+    """
+    Starts a game kept on the server. The JSON body is optional and may hold the 'board', the ids of its 'kings' and
+    the 'color' the client plays ('B' by default), which has to move first. Without a board the game starts from the
+    initial position.
+
+    :return: the id of the game, to be used in its URL, and its state
+    """
+    json_dict = request.get_json(silent=True) or {}
+
+    try:
+        color = json_dict.get('color', 'B')
+        if color not in ('B', 'R'):
+            raise ValueError(f"{color} is not a side, expected 'B' or 'R'.")
+        if 'board' in json_dict:
+            gameboard = GameBoard(json_dict['board'], set(json_dict.get('kings') or []))
+        else:
+            gameboard = GameBoard.start()
+    except ValueError as e:
+        return {'error': str(e)}, 400
+
+    session = game_sessions.create(gameboard, color)
+    return sessionState(session), 201
+
+
+@app.route("/games/<game_id>", methods=['GET'])
+def getGameEndpoint(game_id):
+    try:
+        session = game_sessions.get(game_id)
+    except LookupError as e:
+        return {'error': str(e)}, 404
+
+    with session.lock:
+        return sessionState(session)
 
-    board = json_dict['board']
-    stone = json_dict['stone']  # this contains the id of the stone and whether it is a king or not
-    move = json_dict['move']
 
-    updated_state = services.makeMove(board, stone['id'], stone['isKing'], move)
+@app.route("/games/<game_id>", methods=['DELETE'])
+def deleteGameEndpoint(game_id):
+    try:
+        game_sessions.remove(game_id)
+    except LookupError as e:
+        return {'error': str(e)}, 404
+    return '', 204
 
-    return updated_state
+
+@app.route("/games/<game_id>/move", methods=['POST'])
+def gameMoveEndpoint(game_id):
+    """
+    Expects a JSON body with the client's 'move', either as a path of [col, row] pairs or in PDN notation. The engine
+    answers it on the same board, reusing its transposition table and the line it expected from earlier moves.
+
+    :return: the state of the game after both moves, with the engine's search result (and its profile with
+    ?debug=1)
+    """
+    try:
+        session = game_sessions.get(game_id)
+    except LookupError as e:
+        return {'error': str(e)}, 404
+
+    json_dict = request.get_json(silent=True) or {}
+    try:
+        move = json_dict.get('move')
+        if move is None:
+            raise ValueError("The 'move' is missing.")
+        path = path_from_pdn(move) if isinstance(move, str) else path_from_list(move)
+    except ValueError as e:
+        return {'error': str(e)}, 400
+
+    profile = services.newProfile(debugRequested())
+
+    def play(job):
+        time_limit = min(services.SEARCH_TIME_LIMIT, job.remaining() * 0.9)
+        # A failed or cancelled move must leave the game as it was, so the board is only swapped in once both moves
+        # are played and the request still waits for them
+        gameboard = session.board.copy()
+        result = services.playMove(gameboard, session.color, path, time_limit=time_limit, stop=job.stop,
+                                   searcher=session.engine, pv=session.pv_after(path), profile=profile,
+                                   checkpoint=job.checkpoint)
+        if job.stop.is_set():
+            raise jobs.JobCancelled("The move was stopped before it was played.")
+        session.board = gameboard
+        session.record(result)
+        return result
+
+    # The moves of a game are played one at a time; the next one waits here rather than on an engine worker
+    if not session.lock.acquire(timeout=REQUEST_DEADLINE):
+        return {'error': "Another move of the game is still being played."}, 503
+    try:
+        result = runEngineJob(play, session.id)
+    finally:
+        session.lock.release()
+    if isinstance(result, tuple):
+        return result
+
+    state = sessionState(session, result)
+    if profile is not None and debugRequested():
+        state['debug'] = profile.to_dict()
+    return state
+
+
+@app.route("/endgame", methods=['GET', 'POST'])
+def endgameEndpoint():
+    """
+    Expects a position in PDN FEN or packed binary form (see getPossMovesEndpoint), or a JSON body with the 'board', the
+    ids of its 'kings' and the side to move as 'turn'.
+
+    :return: the outcome of the position according to the endgame tablebase, its distance in plies and the best move
+    """
+    try:
+        gameboard, color = requestPosition()
+    except (KeyError, TypeError, ValueError) as e:
+        return {'error': str(e)}, 400
+
+    try:
+        return services.endgameState(gameboard, color)
+    except LookupError as e:
+        return {'error': str(e)}, 404
+
+
+@app.route("/cacheStats", methods=['GET'])
+def cacheStatsEndpoint():
+    """
+    :return: the size and hit/miss counters of the response cache of this process
+    """
+    return services.response_cache.stats()
+
+
+@app.route("/queueStats", methods=['GET'])
+def queueStatsEndpoint():
+    """
+    :return: the state of the engine job queue of this process: the jobs waiting and running, the jobs turned away,
+    and per priority the jobs waiting and how long jobs waited for a worker
+    """
+    return {**engine_jobs.stats(), **engine_jobs.scheduler_stats()}
+
+
+@app.route("/metrics", methods=['GET'])
+def metricsEndpoint():
+    """
+    :return: the metrics of this process in the Prometheus text format: the requests, the totals of the profiled
+    searches (every search when instrumentation.ENABLED is set) and the state of the job queue, cache and sessions
+    """
+    queue_stats = engine_jobs.stats()
+    scheduler_stats = engine_jobs.scheduler_stats()
+    cache_stats = services.response_cache.stats()
+    gauges = {
+        'checkers_engine_jobs_queued': ("Engine jobs waiting for a worker.", queue_stats['queued']),
+        'checkers_engine_jobs_running': ("Engine jobs being worked on.", queue_stats['running']),
+        'checkers_engine_jobs_rejected': ("Engine jobs turned away since the start.", queue_stats['rejected']),
+        'checkers_engine_nodes': ("Nodes searched by engine jobs since the start.", scheduler_stats['nodes']),
+        'checkers_engine_jobs_preempted': ("Times a search handed its worker over to another job since the start.",
+                                           scheduler_stats['preempted']),
+        'checkers_response_cache_entries': ("Entries of the response cache.", cache_stats['entries']),
+        'checkers_response_cache_hits': ("Response cache hits since the start.", cache_stats['hits']),
+        'checkers_response_cache_misses': ("Response cache misses since the start.", cache_stats['misses']),
+        'checkers_game_sessions': ("Game sessions kept on the server.", len(game_sessions)),
+    }
+    for name in jobs.PRIORITIES.values():
+        gauges[f'checkers_engine_jobs_queued_{name}'] = (f"{name.capitalize()} engine jobs waiting for a worker.",
+                                                         scheduler_stats[name]['queued'])
+        gauges[f'checkers_engine_job_wait_p95_seconds_{name}'] = (
+            f"95th percentile of the latest waits of {name} engine jobs for a worker.",
+            round(scheduler_stats[name]['wait_p95'], 6))
+    return Response(instrumentation.REGISTRY.render(gauges), mimetype='text/plain; version=0.0.4')
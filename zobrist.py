@@ -0,0 +1,56 @@
+"""
+Zobrist keys for checkers positions.
+
+A position's hash is the XOR of one random 64-bit key per occupied square, chosen by the kind of stone standing on it
+(black man, red man, black king or red king). The keys come from a fixed seed, so hashes are stable across processes
+and can be stored on disk.
+
+The hash of the mirrored position (rotated by 180 degrees with the colours swapped, see bitboard.mirror()) is kept
+alongside with MIRROR_KEYS, which are the keys of the mirrored kind on the mirrored square.
+"""
+from __future__ import annotations
+
+import random
+
+import bitboard
+
+BLACK_MAN = 0
+RED_MAN = 1
+BLACK_KING = 2
+RED_KING = 3
+
+_rng = random.Random(0x636865636B657273)
+
+# KEYS[kind][square]
+KEYS: tuple[tuple[int, ...], ...] = tuple(tuple(_rng.getrandbits(64) for _ in range(32)) for _ in range(4))
+
+# MIRROR_KEYS[kind][square] is the key of the stone that the kind and square turn into in the mirrored position
+MIRROR_KEYS: tuple[tuple[int, ...], ...] = tuple(
+    tuple(KEYS[kind ^ 1][31 - square] for square in range(32)) for kind in range(4)
+)
+
+# XORed into the hash of a position when red is the side to move
+RED_TO_MOVE = _rng.getrandbits(64)
+
+
+def kind_of(color: str, is_king: bool) -> int:
+    if color == 'B':
+        return BLACK_KING if is_king else BLACK_MAN
+    return RED_KING if is_king else RED_MAN
+
+
+def hash_of(black: int, red: int, king_mask: int) -> int:
+    """
+    Computes the hash of the position given by its bitboards from scratch.
+    """
+    h = 0
+    for kind, bb in ((BLACK_MAN, black & ~king_mask), (RED_MAN, red & ~king_mask),
+                     (BLACK_KING, black & king_mask), (RED_KING, red & king_mask)):
+        keys = KEYS[kind]
+        for square in bitboard.squares_of(bb):
+            h ^= keys[square]
+    return h
+
+
+def side_key(color: str) -> int:
+    return RED_TO_MOVE if color == 'R' else 0